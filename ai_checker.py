@@ -1,71 +1,197 @@
-import joblib
 import os
-import re
 import string
-from sklearn.pipeline import Pipeline
-from pythainlp.tokenize import word_tokenize
-from pythainlp.util import normalize
-from pythainlp.corpus.common import thai_stopwords
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import language_id
+import metrics
+import thai_tokenizer
+from result_cache import file_fingerprint, get_cache
 
-THAI_STOPWORDS = set(thai_stopwords())
+# joblib/sklearn, numpy and pythainlp are imported on first use so that
+# importing this module stays cheap; call warm_up() to pay the cost early.
 
 model_path = "models/ai_model.pkl"
-if not os.path.exists(model_path):
-    raise FileNotFoundError(f"❌ Model file not found: {model_path}")
+# "auto" maps models/ai_model.compact (see compact_model.py) when it was
+# exported from the current pickle; "pickle" always unpickles the model
+MODEL_FORMAT = os.environ.get("TAUTHY_MODEL_FORMAT", "auto")
 
-model_data = joblib.load(model_path)
-vectorizer = model_data['vectorizer']
-model = model_data['model']
+# Bump when clean_text changes what the model sees, to invalidate cached results
+CLEAN_VERSION = "1"
+
+vectorizer = None
+model = None
+_model_lock = threading.Lock()
+_thai_stopwords = None
+
+def load_model():
+    """Load the vectorizer and classifier once, on first use."""
+    global vectorizer, model
+    with _model_lock:
+        if model is None:
+            import compact_model
+
+            compact_path = compact_model.path_for(model_path)
+            if MODEL_FORMAT != "pickle" and compact_model.is_fresh(compact_path, model_path):
+                vectorizer, model = compact_model.load(compact_path)
+            else:
+                import joblib
+
+                if MODEL_FORMAT != "pickle" and os.path.exists(compact_path):
+                    print(f"{compact_path} is older than {model_path}; loading the pickle "
+                          f"(run: python trainer/trainer.py --export-compact)")
+                if not os.path.exists(model_path):
+                    raise FileNotFoundError(f"❌ Model file not found: {model_path}")
+
+                model_data = joblib.load(model_path)
+                vectorizer = model_data['vectorizer']
+                model = model_data['model']
+    return vectorizer, model
+
+def reload_model():
+    """Drop the loaded model so the next prediction reads the file again."""
+    global vectorizer, model
+    with _model_lock:
+        vectorizer = None
+        model = None
+
+def get_thai_stopwords():
+    global _thai_stopwords
+    if _thai_stopwords is None:
+        from pythainlp.corpus.common import thai_stopwords
+        _thai_stopwords = set(thai_stopwords())
+    return _thai_stopwords
+
+def warm_up():
+    """Load the model and the Thai tokenizer dictionary ahead of the first prediction."""
+    load_model()
+    language_id.warm_up()
+    clean_text("ทดสอบการตัดคำภาษาไทย")
 
 def is_thai(text: str) -> bool:
-    return any('\u0E00' <= ch <= '\u0E7F' for ch in text)
+    return language_id.has_thai(text)
 
 def clean_text(text: str) -> str:
-    text = normalize(text.strip())
-    text = re.sub(r"http\S+", "", text)
-    text = re.sub(r"\d+", "", text)
-    text = re.sub(r"[^\w\s]", "", text)
-    text = re.sub(r"\s+", " ", text)
-    text = text.lower().strip()
+    paragraphs = thai_tokenizer.normalize_paragraphs(text)
+    text = " ".join(paragraphs)
 
     if is_thai(text):
-        tokens = word_tokenize(text, engine="newmm")
-        tokens = [t for t in tokens if t not in THAI_STOPWORDS and len(t.strip()) > 1]
+        stopwords = get_thai_stopwords()
+        tokens = thai_tokenizer.tokenize(paragraphs)
+        tokens = [t for t in tokens if t not in stopwords and len(t.strip()) > 1]
     else:
         tokens = text.split()
         tokens = [t for t in tokens if t not in string.punctuation]
 
     return " ".join(tokens)
 
-def predict_text(text: str):
-    cleaned = clean_text(text)
+MIN_TOKENS = 5
+
+def _undecided():
+    return {
+        "label": "undecided",
+        "confidence": 0.0,
+        "details": {}
+    }
+
+def _to_percentages(raw_probs, classes):
+    import numpy as np
+
+    # Normalize and convert to percentage, one row per text
+    probs = raw_probs / raw_probs.sum(axis=1, keepdims=True)
+    percent = np.round(probs * 100, 2)
 
-    if len(cleaned.split()) < 5:
-        return {
-            "label": "undecided",
-            "confidence": 0.0,
-            "details": {}
+    # Adjust each row's total to exactly 100% on its top class
+    rows = np.arange(len(percent))
+    top = percent.argmax(axis=1)
+    diff = 100.0 - percent.sum(axis=1)
+    percent[rows, top] = np.round(percent[rows, top] + diff, 2)
+    top = percent.argmax(axis=1)
+
+    return [
+        {
+            "label": str(classes[t]),
+            "confidence": float(row[t]),
+            "details": {str(cls): float(p) for cls, p in zip(classes, row)}
         }
+        for row, t in zip(percent, top)
+    ]
 
-    X = vectorizer.transform([cleaned])
-    raw_probs = model.predict_proba(X)[0]
-    classes = model.classes_
+def _score_cleaned(cleaned):
+    results = [_undecided() if len(c.split()) < MIN_TOKENS else None for c in cleaned]
+    keep = [i for i, r in enumerate(results) if r is None]
 
-    # Normalize and convert to percentage
-    total = sum(raw_probs)
-    probs = [p / total for p in raw_probs]
-    results_percent = {cls: round(p * 100, 2) for cls, p in zip(classes, probs)}
+    if keep:
+        vectorizer, model = load_model()
 
-    # Adjust total to exactly 100%
-    diff = 100.0 - sum(results_percent.values())
-    top_cls = max(results_percent, key=results_percent.get)
-    results_percent[top_cls] = round(results_percent[top_cls] + diff, 2)
+        # One sparse matrix and one predict_proba call for the whole batch
+        with metrics.span("ml.transform", texts=len(keep)):
+            X = vectorizer.transform([cleaned[i] for i in keep])
+        with metrics.span("ml.predict_proba", texts=len(keep)):
+            scored = _to_percentages(model.predict_proba(X), model.classes_)
+        for i, result in zip(keep, scored):
+            results[i] = result
 
-    top_label = max(results_percent, key=results_percent.get)
-    top_conf = results_percent[top_label]
+    return results
 
-    return {
-        "label": top_label,
-        "confidence": top_conf,
-        "details": results_percent
-    }
+def predict_texts(texts, batch_size=256, workers=1):
+    """Score texts in batches, yielding one result per text in input order.
+
+    With workers > 1 the cleaning/tokenisation step runs in a process pool.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        it = iter(texts)
+        while True:
+            batch = list(islice(it, batch_size))
+            if not batch:
+                break
+            with metrics.span("ml.clean", texts=len(batch)):
+                if executor is not None:
+                    chunksize = max(1, len(batch) // (workers * 4))
+                    cleaned = list(executor.map(clean_text, batch, chunksize=chunksize))
+                else:
+                    cleaned = [clean_text(t) for t in batch]
+            yield from _score_cleaned(cleaned)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+def weighted_document_score(results, weights):
+    """Combine per-part results (pages, segments) into one document result.
+
+    Each part's probabilities count in proportion to its weight, usually its
+    length; undecided parts are left out.
+    """
+    import numpy as np
+
+    parts = [(r, w) for r, w in zip(results, weights) if r["label"] != "undecided" and w > 0]
+    if not parts:
+        return _undecided()
+
+    classes = sorted(parts[0][0]["details"])
+    probs = np.array([[r["details"][c] for c in classes] for r, _ in parts])
+    w = np.array([w for _, w in parts], dtype=float)
+    return _to_percentages((w @ probs)[None, :], classes)[0]
+
+def model_version():
+    """Identifies the model file and cleaning rules behind a cached result."""
+    # The compact file gives the same results as its pickle, so the pickle
+    # identifies both; a compact file shipped without one identifies itself
+    import compact_model
+
+    source = model_path if os.path.exists(model_path) else compact_model.path_for(model_path)
+    return f"{file_fingerprint(source)}:{CLEAN_VERSION}:{thai_tokenizer.ENGINE}"
+
+@metrics.timed("ml.predict_text")
+def predict_text(text: str, use_cache=True):
+    if not use_cache:
+        return next(predict_texts([text]))
+
+    cache = get_cache()
+    version = model_version()
+    result = cache.get("ml", version, text)
+    if result is None:
+        result = next(predict_texts([text]))
+        cache.put("ml", version, text, result)
+    return result
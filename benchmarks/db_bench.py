@@ -0,0 +1,195 @@
+"""History database benchmark: connection-per-call vs the persistent WAL connection.
+
+Concurrent writers save analyses and feedback while readers list one user's
+history, the way several app windows (or app instances) share the database.
+"legacy" replays the old access pattern - connect, rollback journal, commit,
+close on every call - and "pooled" goes through database.py as it is now.
+
+    python benchmarks/db_bench.py --writers 4 --readers 2 --ops 500 --mode processes
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import database  # noqa: E402
+
+SAMPLE_TEXT = "ปัญญาประดิษฐ์เปลี่ยนวิธีการเขียน " * 40
+USERS = 20
+
+
+class LegacyStore:
+    """The pre-WAL access pattern: a fresh connection per call."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=database.BUSY_TIMEOUT)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def save_input(self, user_id, text, ai, human):
+        conn = self._connect()
+        hs_id = str(uuid.uuid4())
+        conn.execute('''
+            INSERT INTO history (hs_id, user_id, hs_input_text, hs_result_ai, hs_result_human)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (hs_id, user_id, text, ai, human))
+        conn.commit()
+        conn.close()
+        return hs_id
+
+    def update_feedback(self, hs_id, feedback):
+        conn = self._connect()
+        conn.execute('''
+            UPDATE history SET hs_user_feedback = ?, hs_feedback_at = CURRENT_TIMESTAMP
+            WHERE hs_id = ?
+        ''', (feedback, hs_id))
+        conn.commit()
+        conn.close()
+
+    def get_user_history(self, user_id):
+        conn = self._connect()
+        rows = conn.execute('''
+            SELECT * FROM history WHERE user_id = ? ORDER BY hs_created_at DESC
+        ''', (user_id,)).fetchall()
+        conn.close()
+        return [dict(r) for r in rows]
+
+
+class PooledStore:
+    """database.py with its thread-local connection."""
+
+    def __init__(self, path):
+        database.DB_NAME = path
+
+    def save_input(self, user_id, text, ai, human):
+        return database.save_input(user_id, text, ai, human)
+
+    def update_feedback(self, hs_id, feedback):
+        database.update_feedback(hs_id, feedback)
+
+    def get_user_history(self, user_id):
+        return database.get_user_history(user_id)
+
+
+STORES = {"legacy": LegacyStore, "pooled": PooledStore}
+
+
+def prepare(path, store, rows):
+    """Create the schema and seed `rows` history entries."""
+    if store == "legacy":
+        # The old init_db: base tables only, default rollback journal, no indexes
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        database._migration_base_tables(conn.cursor())
+        conn.execute("ALTER TABLE history ADD COLUMN hs_feedback_at DATETIME")
+        conn.commit()
+    else:
+        database.DB_NAME = path
+        database.init_db()
+        conn = database.get_db_connection()
+
+    with conn:
+        conn.executemany('''
+            INSERT INTO history (hs_id, user_id, hs_input_text, hs_result_ai, hs_result_human)
+            VALUES (?, ?, ?, ?, ?)
+        ''', ((str(uuid.uuid4()), f"user-{i % USERS}", SAMPLE_TEXT, 0.5, 0.5) for i in range(rows)))
+
+    if store == "legacy":
+        conn.close()
+    else:
+        database.close_db_connection()
+
+
+def run_client(store, path, role, index, ops):
+    """One writer or reader; returns (latencies, errors)."""
+    db = STORES[store](path)
+    user_id = f"user-{index % USERS}"
+    latencies, errors = [], 0
+
+    for i in range(ops):
+        started = time.perf_counter()
+        try:
+            if role == "writer":
+                hs_id = db.save_input(user_id, SAMPLE_TEXT, 0.7, 0.3)
+                db.update_feedback(hs_id, "ai" if i % 2 else "human")
+            else:
+                db.get_user_history(user_id)
+        except sqlite3.OperationalError:
+            # "database is locked" once the busy timeout runs out
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+
+    return latencies, errors
+
+
+def _client_entry(args):
+    return args[2], run_client(*args)
+
+
+def run(store, mode, writers, readers, ops, seed_rows, directory):
+    path = os.path.join(directory, f"{store}-{mode}.db")
+    prepare(path, store, seed_rows)
+
+    jobs = [(store, path, "writer", i, ops) for i in range(writers)]
+    jobs += [(store, path, "reader", i, ops) for i in range(readers)]
+
+    started = time.perf_counter()
+    if mode == "threads":
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(_client_entry, jobs))
+    else:
+        with multiprocessing.get_context("spawn").Pool(len(jobs)) as pool:
+            results = pool.map(_client_entry, jobs)
+    elapsed = time.perf_counter() - started
+
+    report = {}
+    for role in ("writer", "reader"):
+        latencies = sorted(t for r, (lat, _) in results if r == role for t in lat)
+        errors = sum(e for r, (_, e) in results if r == role)
+        if not latencies:
+            continue
+        report[role] = {
+            "ops_per_s": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            "errors": errors,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent access to the history database.")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--ops", type=int, default=200, help="operations per client")
+    parser.add_argument("--seed-rows", type=int, default=5000, help="history rows created before the run")
+    parser.add_argument("--mode", choices=["threads", "processes"], default="threads")
+    parser.add_argument("--store", nargs="+", choices=sorted(STORES), default=["legacy", "pooled"])
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.ops} ops each, "
+          f"{args.seed_rows} seeded rows, {args.mode}\n")
+    print(f"{'store':<8} {'role':<7} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for store in args.store:
+            report = run(store, args.mode, args.writers, args.readers, args.ops, args.seed_rows, directory)
+            for role, r in report.items():
+                print(f"{store:<8} {role:<7} {r['ops_per_s']:>9.0f} {r['p50_ms']:>8.2f} "
+                      f"{r['p95_ms']:>8.2f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Stand-in for the Ollama HTTP API, for tests and benchmarks.
+
+Serves /api/generate and /api/chat with the same JSON and NDJSON-streaming
+shapes as the real server, with configurable latency and injected failures,
+so the Ollama client can be exercised without a GPU or a downloaded model.
+
+Optionally it models the two costs that dominate time-to-first-token on a
+real server: loading the model (paid again once keep_alive has expired) and
+prompt evaluation, which with --prefix-cache is only charged for the part of
+the prompt after the longest prefix shared with a recently evaluated one.
+
+    python benchmarks/fake_ollama.py --port 11435 --first-token-delay 0.5
+    python benchmarks/fake_ollama.py --prefill-per-char 0.0001 --prefix-cache --load-delay 3
+    OLLAMA_URL=http://127.0.0.1:11435 python main.py
+"""
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = json.dumps({
+    "ai": 72.5,
+    "human": 27.5,
+    "reason": "Uniform sentence structure (Point 1) and overly formal vocabulary (Point 2).",
+}, indent=2)
+
+DEFAULT_KEEP_ALIVE = 300.0
+
+
+def parse_keep_alive(value, default=DEFAULT_KEEP_ALIVE):
+    """Seconds for an Ollama keep_alive value ("5m", "1h30m", "10s", 300, -1); None = forever."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return None if value < 0 else float(value)
+    value = str(value).strip()
+    if value.lstrip("-").replace(".", "", 1).isdigit():
+        return parse_keep_alive(float(value))
+    if value.startswith("-"):
+        return None
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return default
+    return sum(float(n) * units[u] for n, u in parts)
+
+
+def render_prompt(payload):
+    """The text the model evaluates, with a chat-template-like role framing."""
+    if "messages" in payload:
+        return "".join(f"<|{m.get('role', 'user')}|>\n{m.get('content', '')}\n"
+                       for m in payload["messages"]) + "<|assistant|>\n"
+    system = payload.get("system")
+    prompt = payload.get("prompt", "")
+    return f"<|system|>\n{system}\n<|user|>\n{prompt}\n" if system else prompt
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+
+        if self.path not in ("/api/generate", "/api/chat"):
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        chat = self.path == "/api/chat"
+
+        with fake.lock:
+            fake.requests.append(payload)
+            fail = fake.fail_first > 0
+            if fail:
+                fake.fail_first -= 1
+        if fail:
+            self._send_json(503, {"error": "injected failure"})
+            return
+
+        model = payload.get("model", "")
+        tokens = re.findall(r"\S+\s*|\s+", fake.response)
+        num_predict = (payload.get("options") or {}).get("num_predict")
+        if num_predict is not None and num_predict >= 0:
+            tokens = tokens[:num_predict]
+        # Prompt processing grows with the part of the prompt not already cached
+        load, evaluated = fake.admit(render_prompt(payload), payload.get("keep_alive"))
+        time.sleep(load + fake.first_token_delay + fake.prefill_per_char * evaluated)
+
+        def body(text, done):
+            if chat:
+                return {"model": model, "message": {"role": "assistant", "content": text}, "done": done}
+            return {"model": model, "response": text, "done": done}
+
+        if not payload.get("stream", True):
+            time.sleep(fake.token_delay * len(tokens))
+            self._send_json(200, body("".join(tokens), True))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(fake.token_delay)
+                line = json.dumps(body(token, False)) + "\n"
+                self._write_chunk(line.encode("utf-8"))
+            self._write_chunk((json.dumps(body("", True)) + "\n").encode("utf-8"))
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-stream (cancelled analysis)
+            self.close_connection = True
+
+
+class FakeOllamaServer:
+    """Threaded fake Ollama server; use as a context manager.
+
+    `first_token_delay` and `token_delay` are in seconds; `prefill_per_char`
+    adds that many seconds per evaluated prompt character before the first
+    token. With `prefix_cache`, the last `cache_slots` prompts are kept and
+    only the characters after the longest shared prefix are evaluated.
+    `load_delay` is charged when the model is not loaded: on the first
+    request and after the request's keep_alive (or `default_keep_alive`
+    seconds when it sends none) has run out. `fail_first`
+    makes the first N requests answer HTTP 503 to exercise retries.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, response=DEFAULT_RESPONSE,
+                 first_token_delay=0.0, token_delay=0.0, fail_first=0, prefill_per_char=0.0,
+                 prefix_cache=False, cache_slots=1, load_delay=0.0, default_keep_alive=DEFAULT_KEEP_ALIVE):
+        self.response = response
+        self.first_token_delay = first_token_delay
+        self.prefill_per_char = prefill_per_char
+        self.token_delay = token_delay
+        self.fail_first = fail_first
+        self.prefix_cache = prefix_cache
+        self.cache_slots = cache_slots
+        self.load_delay = load_delay
+        self.default_keep_alive = default_keep_alive
+        self.requests = []
+        self.connections = 0
+        self.loads = 0
+        self.evaluated_chars = 0
+        self.cached_chars = 0
+        self.lock = threading.Lock()
+        self._cache = []
+        self._loaded_until = 0.0
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self._thread = None
+
+    def admit(self, prompt, keep_alive):
+        """Account for one request; returns (load seconds, characters to evaluate)."""
+        with self.lock:
+            now = time.monotonic()
+            load = 0.0
+            if now >= self._loaded_until:
+                load = self.load_delay
+                self.loads += 1
+                self._cache = []
+            ttl = parse_keep_alive(keep_alive, self.default_keep_alive)
+            self._loaded_until = float("inf") if ttl is None else now + load + ttl
+
+            shared = 0
+            if self.prefix_cache and self._cache:
+                best = max(range(len(self._cache)),
+                           key=lambda i: len(os.path.commonprefix([self._cache[i], prompt])))
+                shared = len(os.path.commonprefix([self._cache[best], prompt]))
+                # The slot with the most reuse is overwritten, as a server slot would be
+                self._cache.pop(best)
+            if self.prefix_cache:
+                self._cache.append(prompt)
+                del self._cache[:-self.cache_slots]
+            self.evaluated_chars += len(prompt) - shared
+            self.cached_chars += shared
+            return load, len(prompt) - shared
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between tokens")
+    parser.add_argument("--prefill-per-char", type=float, default=0.0,
+                        help="seconds of prompt processing per prompt character")
+    parser.add_argument("--prefix-cache", action="store_true",
+                        help="only evaluate the prompt after the longest prefix shared with a cached prompt")
+    parser.add_argument("--cache-slots", type=int, default=1, help="prompts kept for --prefix-cache")
+    parser.add_argument("--load-delay", type=float, default=0.0,
+                        help="seconds to load the model when it is not resident")
+    parser.add_argument("--fail-first", type=int, default=0, help="answer the first N requests with HTTP 503")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(args.host, args.port, first_token_delay=args.first_token_delay,
+                              token_delay=args.token_delay, fail_first=args.fail_first,
+                              prefill_per_char=args.prefill_per_char, prefix_cache=args.prefix_cache,
+                              cache_slots=args.cache_slots, load_delay=args.load_delay)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
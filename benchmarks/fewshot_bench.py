@@ -0,0 +1,134 @@
+"""Few-shot selection benchmark: random reference examples vs nearest neighbours.
+
+For a sample of target texts, compares three ways of filling the prompt:
+
+    random-20   the original selection: 20 random examples per class, full length
+    random-k    k random examples per class, fitted to the token budget
+    nearest-k   the k most similar examples per class from the few-shot index
+
+and reports prompt size, selection time and, with --ollama, generation
+latency and how often each mode agrees with random-20 on the label. Without
+a real server, --fake runs against benchmarks/fake_ollama.py with prompt
+processing time proportional to prompt length (so agreement is meaningless
+there; only latency is).
+
+    python fewshot_index.py   # build the index first
+    python benchmarks/fewshot_bench.py --texts 50 --fake
+    python benchmarks/fewshot_bench.py --texts 50 --ollama http://localhost:11434
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fewshot_index  # noqa: E402
+import ollama_checker  # noqa: E402
+from ref_index import get_index  # noqa: E402
+
+
+def sample_targets(n, seed):
+    """n random training rows whose language has enough examples for every mode."""
+    index = get_index()
+    counts = index.counts()
+    rows = [(label, lang, offset) for label, lang, offset in index.rows()
+            if lang != "unknown" and min(counts.get((lang, "ai"), 0), counts.get((lang, "human"), 0)) > 20]
+    picked = random.Random(seed).sample(rows, min(n, len(rows)))
+    texts = index.read_texts([offset for _, _, offset in picked])
+    return [(lang, text) for (_, lang, _), text in zip(picked, texts)]
+
+
+def select(mode, text, lang, fewshot):
+    if mode == "random-20":
+        return ollama_checker.filter_by_language(lang)
+    if mode == "random-k":
+        ai, human = ollama_checker.filter_by_language(lang, n_each=fewshot_index.K)
+        examples = {"ai": ai, "human": human}
+    else:
+        examples = fewshot.nearest(text, lang)
+    examples = fewshot_index.fit_to_budget(examples)
+    return examples["ai"], examples["human"]
+
+
+def label_of(result):
+    if result["ai"] + result["human"] == 0:
+        return None
+    return "ai" if result["ai"] >= result["human"] else "human"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare few-shot example selection strategies.")
+    parser.add_argument("--texts", type=int, default=50, help="target texts sampled from the training data")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--ollama", metavar="URL", help="also time generation against this Ollama server")
+    parser.add_argument("--fake", action="store_true", help="time generation against an in-process fake server")
+    parser.add_argument("--prefill-per-char", type=float, default=0.0001,
+                        help="fake server prompt processing, seconds per character")
+    args = parser.parse_args()
+
+    fewshot = fewshot_index.get_fewshot_index()
+    if fewshot is None:
+        sys.exit("Build the few-shot index first: python fewshot_index.py")
+
+    server = None
+    client = None
+    if args.fake:
+        from fake_ollama import FakeOllamaServer
+        server = FakeOllamaServer(prefill_per_char=args.prefill_per_char).start()
+        args.ollama = server.url
+    if args.ollama:
+        from ollama_client import OllamaClient
+        client = OllamaClient(base_url=args.ollama)
+
+    # build_prompt prints the examples; keep the report readable
+    real_stdout = sys.stdout
+    targets = sample_targets(args.texts, args.seed)
+    modes = ["random-20", "random-k", "nearest-k"]
+    stats = {m: {"chars": [], "tokens": [], "select": [], "generate": [], "labels": []} for m in modes}
+
+    for lang, text in targets:
+        for mode in modes:
+            started = time.perf_counter()
+            ai_examples, human_examples = select(mode, text, lang, fewshot)
+            stats[mode]["select"].append(time.perf_counter() - started)
+
+            sys.stdout = open(os.devnull, "w")
+            try:
+                prompt = ollama_checker.build_prompt(text, ai_examples, human_examples)
+            finally:
+                sys.stdout.close()
+                sys.stdout = real_stdout
+            stats[mode]["chars"].append(len(prompt))
+            stats[mode]["tokens"].append(fewshot_index.estimate_tokens(prompt))
+
+            if client is not None:
+                started = time.perf_counter()
+                raw = client.generate(prompt)
+                stats[mode]["generate"].append(time.perf_counter() - started)
+                stats[mode]["labels"].append(label_of(ollama_checker.parse_response(raw)))
+
+    print(f"{len(targets)} target texts, k={fewshot_index.K}, budget={fewshot_index.TOKEN_BUDGET} tokens\n")
+    print(f"{'mode':<10} {'prompt chars':>13} {'~tokens':>8} {'select ms':>10} {'generate s':>11} {'agreement':>10}")
+    baseline = stats["random-20"]["labels"]
+    for mode in modes:
+        s = stats[mode]
+        generate = f"{statistics.median(s['generate']):>11.2f}" if s["generate"] else f"{'-':>11}"
+        if s["labels"]:
+            pairs = [(a, b) for a, b in zip(s["labels"], baseline) if a and b]
+            agreement = f"{sum(a == b for a, b in pairs) / len(pairs):>10.1%}" if pairs else f"{'-':>10}"
+        else:
+            agreement = f"{'-':>10}"
+        print(f"{mode:<10} {statistics.mean(s['chars']):>13.0f} {statistics.mean(s['tokens']):>8.0f} "
+              f"{statistics.median(s['select']) * 1000:>10.1f} {generate} {agreement}")
+
+    if server is not None:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
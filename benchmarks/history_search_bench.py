@@ -0,0 +1,133 @@
+"""History search benchmark: FTS5 query latency on a large history table.
+
+Builds a database of synthetic Thai/English analyses through the normal
+schema (so the triggers tokenise every row), then times ranked, paginated
+searches for common, rare and multi-word queries. --like adds the naive
+LIKE '%...%' scan for comparison.
+
+    python benchmarks/history_search_bench.py --rows 1000000 --db /tmp/history-1m.db
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import database  # noqa: E402
+
+ENGLISH = ("model", "essay", "student", "research", "language", "data", "writing", "history")
+BATCH = 5000
+
+
+def vocabulary(size, seed):
+    from pythainlp.corpus.common import thai_words
+
+    words = sorted(w for w in thai_words() if " " not in w and 2 <= len(w) <= 8)
+    return random.Random(seed).sample(words, size)
+
+
+def build(path, rows, users, words_per_row, seed):
+    database.DB_NAME = path
+    conn = database.get_db_connection()
+    existing = conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+    if existing >= rows:
+        return existing, None
+
+    rng = random.Random(seed + existing)
+    vocab = vocabulary(5000, seed)
+    # Zipf-like: a few words are everywhere, most are rare
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+
+    started = time.perf_counter()
+    for start in range(existing, rows, BATCH):
+        batch = []
+        for i in range(start, min(start + BATCH, rows)):
+            words = rng.choices(vocab, weights, k=words_per_row)
+            if rng.random() < 0.2:
+                words += rng.choices(ENGLISH, k=3)
+            text = "".join(words) if rng.random() < 0.5 else " ".join(words)
+            batch.append((str(uuid.uuid4()), f"user-{i % users}", text, text[:database.PREVIEW_CHARS]))
+        # Indexed the way save_input does it
+        index_rows = [database.search_index_row(hs_id, user_id, text) for hs_id, user_id, text, _ in batch]
+        with conn:
+            conn.executemany('''
+                INSERT INTO history (hs_id, user_id, hs_input_text, hs_preview, hs_result_ai, hs_result_human)
+                VALUES (?, ?, ?, ?, 0.5, 0.5)
+            ''', batch)
+            conn.executemany('''
+                INSERT INTO history_fts (hs_id, user_id, tokens, subwords) VALUES (?, ?, ?, ?)
+            ''', index_rows)
+        done = min(start + BATCH, rows)
+        rate = (done - existing) / (time.perf_counter() - started)
+        print(f"\r  inserted {done}/{rows} rows ({rate:.0f} rows/s)", end="", flush=True)
+    print()
+    return rows, time.perf_counter() - started
+
+
+def like_search(user_id, word, limit):
+    conn = database.get_db_connection()
+    return conn.execute('''
+        SELECT hs_id FROM history WHERE user_id = ? AND hs_input_text LIKE ?
+        ORDER BY hs_created_at DESC LIMIT ?
+    ''', (user_id, f"%{word}%", limit)).fetchall()
+
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return sorted(times), len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full-text search over history.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--words", type=int, default=40, help="words per synthetic entry")
+    parser.add_argument("--db", default=None, help="database path; reused if it already has enough rows")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--like", action="store_true", help="also time a LIKE scan")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(ROOT_DIR, "db", f"history_bench_{args.rows}.db")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    rows, build_time = build(path, args.rows, args.users, args.words, args.seed)
+    if build_time:
+        print(f"Built {rows} rows in {build_time:.0f}s")
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"{rows} history rows, {args.users} users, database {size_mb:.0f} MB\n")
+
+    vocab = vocabulary(5000, args.seed)
+    queries = {
+        "common word": vocab[0],
+        "mid word": vocab[200],
+        "rare word": vocab[4000],
+        "two words": f"{vocab[1]} {vocab[50]}",
+        "english": "essay",
+    }
+    user_id = "user-7"
+
+    print(f"{'query':<12} {'page':>5} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, query in queries.items():
+        for page in (0, 4):
+            offset = page * database.HISTORY_PAGE_SIZE
+            times, hits = timed(lambda: database.search_history(user_id, query, offset=offset), args.repeats)
+            print(f"{name:<12} {page + 1:>5} {hits:>5} {statistics.median(times) * 1000:>8.2f} "
+                  f"{times[int(len(times) * 0.95) - 1] * 1000:>8.2f}")
+        if args.like:
+            word = query.split()[0]
+            times, hits = timed(lambda: like_search(user_id, word, database.HISTORY_PAGE_SIZE), max(1, args.repeats // 5))
+            print(f"{name + ' LIKE':<12} {1:>5} {hits:>5} {statistics.median(times) * 1000:>8.2f} "
+                  f"{times[-1] * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
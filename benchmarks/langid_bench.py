@@ -0,0 +1,93 @@
+"""Language identification benchmark: langdetect vs language_id on the training corpus.
+
+Runs over the first --texts rows of the training CSV (the head that the
+reference index tags) and reports throughput, how many texts language_id
+had to hand to langdetect, agreement with plain langdetect, and how many
+texts plain (unseeded) langdetect labels differently on a second run.
+
+    python benchmarks/langid_bench.py --texts 5000
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import language_id  # noqa: E402
+from ref_index import DETECT_CHARS, get_index  # noqa: E402
+
+
+def plain_langdetect(text):
+    """The detector ollama_checker used before language_id: unseeded, prob >= 0.9."""
+    from langdetect import detect_langs
+
+    try:
+        langs = detect_langs(text)
+        if langs and langs[0].prob >= 0.9:
+            return langs[0].lang
+    except Exception:
+        pass
+    return "unknown"
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare language identification on the training corpus.")
+    parser.add_argument("--texts", type=int, default=5000)
+    args = parser.parse_args()
+
+    index = get_index()
+    offsets = [offset for _, _, offset in index.rows()][:args.texts]
+    texts = [t[:DETECT_CHARS] for t in index.read_texts(offsets)]
+
+    language_id.warm_up()
+    plain_langdetect("warm up")
+
+    baseline, t_plain = timed(lambda: [plain_langdetect(t) for t in texts])
+    second, _ = timed(lambda: [plain_langdetect(t) for t in texts])
+
+    fallbacks = Counter()
+    langdetect = language_id._langdetect
+
+    def counting(text):
+        fallbacks["n"] += 1
+        return langdetect(text)
+
+    language_id._langdetect = counting
+    try:
+        language_id._cache.clear()
+        single, t_single = timed(lambda: [language_id.detect(t) for t in texts])
+        language_id._cache.clear()
+        batch, t_batch = timed(language_id.detect_many, texts)
+        _, t_cached = timed(language_id.detect_many, texts)
+    finally:
+        language_id._langdetect = langdetect
+
+    n = len(texts)
+    print(f"{n} texts, first {DETECT_CHARS} chars each\n")
+    print(f"{'detector':<24} {'texts/s':>10} {'total s':>9}")
+    for name, seconds in [("langdetect", t_plain), ("language_id.detect", t_single),
+                          ("language_id.detect_many", t_batch), ("detect_many, cached", t_cached)]:
+        print(f"{name:<24} {n / seconds:>10.0f} {seconds:>9.2f}")
+
+    agree = sum(a == b for a, b in zip(baseline, batch))
+    print(f"\nsent to langdetect: {fallbacks['n'] // 2} ({fallbacks['n'] / 2 / n:.1%})")
+    print(f"agreement with langdetect: {agree / n:.2%}")
+    print(f"single == batch: {single == batch}")
+    print(f"langdetect changed its answer on a second run: {sum(a != b for a, b in zip(baseline, second))} texts")
+    print("labels:", dict(Counter(batch)), "langdetect:", dict(Counter(baseline)))
+    disagreements = Counter((a, b) for a, b in zip(baseline, batch) if a != b)
+    if disagreements:
+        print("langdetect -> language_id:", dict(disagreements.most_common(8)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Model loading benchmark: the pickled model vs. its compact, memory-mapped copy.
+
+For each format a fresh interpreter (run in the current directory, which
+needs models/ai_model.pkl and, for the compact format, models/ai_model.compact
+from `python trainer/trainer.py --export-compact`) reports the time to load
+the model, the time to the first prediction, its memory split into private
+(anonymous) pages and file-backed pages that other processes share, and the
+throughput of uncached predictions. Finally both models score the same
+texts in this process and their probabilities are compared bit for bit.
+
+    python benchmarks/model_load_bench.py --texts 2000
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import ai_checker
+ai_checker.load_model()
+loaded = time.perf_counter()
+ai_checker.predict_text(sys.argv[1], use_cache=False)
+first = time.perf_counter()
+
+def status(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return None
+
+texts = json.loads(sys.stdin.read())
+throughput_started = time.perf_counter()
+for _ in ai_checker.predict_texts(texts):
+    pass
+elapsed = time.perf_counter() - throughput_started
+print(json.dumps({
+    "type": type(ai_checker.vectorizer).__name__,
+    "load_s": loaded - started,
+    "first_prediction_s": first - started,
+    "rss_anon_mb": status("RssAnon"),
+    "rss_file_mb": status("RssFile"),
+    "texts_per_s": len(texts) / elapsed if elapsed else None,
+}))
+"""
+
+
+def load_texts(csv_path, n):
+    csv.field_size_limit(sys.maxsize)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return [row["text"] for _, row in zip(range(n), csv.DictReader(f)) if row.get("text")]
+
+
+def probe(model_format, texts):
+    env = dict(os.environ, TAUTHY_MODEL_FORMAT=model_format,
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT_DIR, os.environ.get("PYTHONPATH")])))
+    proc = subprocess.run([sys.executable, "-c", PROBE, texts[0]], input=json.dumps(texts),
+                          env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(proc.stderr.strip())
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(texts):
+    import joblib
+    import ai_checker
+    import compact_model
+
+    cleaned = [ai_checker.clean_text(t) for t in texts]
+    pickled = joblib.load(ai_checker.model_path)
+    vectorizer, model = compact_model.load(compact_model.path_for(ai_checker.model_path))
+    expected = pickled["model"].predict_proba(pickled["vectorizer"].transform(cleaned))
+    actual = model.predict_proba(vectorizer.transform(cleaned))
+    return int(np.sum(np.any(expected != actual, axis=1))), float(np.abs(expected - actual).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare loading the pickled and the compact model.")
+    parser.add_argument("--csv", default="data/train.csv", help="texts to score")
+    parser.add_argument("--texts", type=int, default=1000)
+    args = parser.parse_args()
+
+    texts = load_texts(args.csv, args.texts)
+    print(f"{'format':<8} {'loaded as':<20} {'load ms':>9} {'first ms':>9} {'private MB':>11} "
+          f"{'shared MB':>10} {'texts/s':>8}")
+    for model_format in ("pickle", "auto"):
+        r = probe(model_format, texts)
+        print(f"{model_format:<8} {r['type']:<20} {r['load_s'] * 1000:>9.1f} {r['first_prediction_s'] * 1000:>9.1f} "
+              f"{r['rss_anon_mb']:>11.1f} {r['rss_file_mb']:>10.1f} {r['texts_per_s']:>8.0f}")
+
+    differing, max_diff = compare(texts)
+    print(f"\nProbabilities differing from the pickle: {differing} of {len(texts)} texts (max |diff| {max_diff:.1e})")
+
+
+if __name__ == "__main__":
+    main()
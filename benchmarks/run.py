@@ -0,0 +1,432 @@
+"""End-to-end benchmark suite, headless and without a real LLM.
+
+Everything runs in a throw-away workspace: a synthetic Thai/English corpus
+is generated, a model is trained on it, and the history database, result
+cache and reference index live there too, so nothing under the repository
+(or a running app's data) is touched. Ollama is replaced by the in-process
+fake server from benchmarks/fake_ollama.py.
+
+Groups:
+
+    clean_text    ai_checker.clean_text by script and text length
+    predict_text  ai_checker.predict_text (uncached) by script and length
+    ollama        query_ollama end to end, blocking and streaming
+    database      save_input, get_user_history and get_history_page by table size
+    trainer       trainer.train_model on synthetic corpora
+
+Results are written as JSON; `compare` prints the change per case and
+exits with status 1 when a case got slower than the threshold allows.
+
+    python benchmarks/run.py run --out before.json
+    python benchmarks/run.py run --out after.json
+    python benchmarks/run.py compare before.json after.json --threshold 0.15
+
+    python benchmarks/run.py run --quick --only clean_text predict_text
+    python benchmarks/run.py run --full          # adds 1M history rows and 200k training rows
+"""
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "trainer"))
+sys.path.insert(0, BENCH_DIR)
+
+GROUPS = ("clean_text", "predict_text", "ollama", "database", "trainer")
+SCRIPTS = ("en", "th", "mixed")
+
+ENGLISH = """
+the of and to in is that for it as was with be by on not he this are or his from at which
+but have an they you were her she there been one all we their has would when if so no out
+model data system language research results analysis process study approach method value
+however therefore furthermore additionally overall moreover significant various important
+honestly really pretty gonna stuff thing guess kinda yeah maybe actually anyway literally
+""".split()
+
+# Model trained once per run for predict_text and query_ollama
+MODEL_ROWS = 2000
+SEED_TEXTS = 500
+DB_USERS = 100
+DB_BATCH = 5000
+
+
+# --- synthetic data --------------------------------------------------------
+
+def _thai_vocabulary(size=3000, seed=0):
+    from pythainlp.corpus.common import thai_words
+
+    words = sorted(w for w in thai_words() if " " not in w and 2 <= len(w) <= 8)
+    return random.Random(seed).sample(words, min(size, len(words)))
+
+
+class Corpus:
+    """Deterministic generator of labelled Thai, English and mixed texts.
+
+    AI and human texts draw from overlapping but differently weighted
+    halves of each vocabulary, so a classifier has something to learn.
+    """
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.vocab = {"en": ENGLISH, "th": _thai_vocabulary(seed=seed)}
+
+    def _word(self, script, label):
+        words = self.vocab[script]
+        half = len(words) // 2
+        if (self.rng.random() < 0.7) == (label == "ai"):
+            return words[self.rng.randrange(half)]
+        return words[half + self.rng.randrange(len(words) - half)]
+
+    def text(self, script, chars, label="ai"):
+        parts = []
+        length = 0
+        while length < chars:
+            lang = script if script != "mixed" else self.rng.choice(("en", "th"))
+            word = self._word(lang, label)
+            # Thai is mostly written without spaces between words
+            sep = "" if lang == "th" and self.rng.random() < 0.7 else " "
+            parts.append(word + sep)
+            length += len(word) + len(sep)
+        return "".join(parts)[:chars].strip()
+
+    def rows(self, n, chars=(200, 800)):
+        for i in range(n):
+            label = ("ai", "human")[i % 2]
+            script = ("en", "th")[(i // 2) % 2]
+            yield self.text(script, self.rng.randint(*chars), label), label
+
+    def write_csv(self, path, n):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["text", "label"])
+            writer.writerows(self.rows(n))
+
+
+# --- measurement -----------------------------------------------------------
+
+def measure(fn, repeats, setup=None, warmup=1):
+    """Seconds for each of `repeats` calls, after `warmup` untimed ones."""
+    times = []
+    for i in range(warmup + repeats):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        if i >= warmup:
+            times.append(time.perf_counter() - started)
+    return times
+
+
+def summarise(group, params, times):
+    ms = sorted(t * 1000 for t in times)
+    return {
+        "group": group,
+        "params": params,
+        "runs": len(ms),
+        "median_ms": round(statistics.median(ms), 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))], 4),
+        "min_ms": round(ms[0], 4),
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _clear_memo():
+    import thai_tokenizer
+
+    thai_tokenizer._memo.clear()
+
+
+# --- groups ----------------------------------------------------------------
+
+def bench_clean_text(ctx):
+    import ai_checker
+
+    ai_checker.clean_text("warm up ทดสอบ")
+    for script in SCRIPTS:
+        for chars in ctx.lengths:
+            text = ctx.corpus.text(script, chars)
+            times = measure(lambda: ai_checker.clean_text(text), ctx.repeats, setup=_clear_memo)
+            yield f"clean_text/{script}/{chars}", summarise("clean_text", {"script": script, "chars": chars}, times)
+
+
+def bench_predict_text(ctx):
+    import ai_checker
+
+    ai_checker.predict_text("warm up the model", use_cache=False)
+    for script in SCRIPTS:
+        for chars in ctx.lengths:
+            text = ctx.corpus.text(script, chars)
+            times = measure(lambda: ai_checker.predict_text(text, use_cache=False), ctx.repeats, setup=_clear_memo)
+            yield f"predict_text/{script}/{chars}", summarise("predict_text", {"script": script, "chars": chars}, times)
+
+
+def bench_ollama(ctx):
+    import ollama_checker
+    import ollama_client
+    from fake_ollama import FakeOllamaServer
+
+    server = FakeOllamaServer(first_token_delay=ctx.args.ollama_latency, token_delay=ctx.args.token_delay,
+                              prefill_per_char=ctx.args.prefill_per_char, prefix_cache=True).start()
+    previous = ollama_client._client
+    ollama_client._client = ollama_client.OllamaClient(base_url=server.url)
+    try:
+        texts = [ctx.corpus.text(script, 600) for script in ("en", "th") for _ in range(ctx.repeats)]
+        for mode, on_token in (("blocking", None), ("streaming", lambda chunk: None)):
+            queue = itertools.cycle(texts)
+
+            def run():
+                with quiet():
+                    result = ollama_checker.query_ollama(next(queue), on_token=on_token, use_cache=False)
+                if result["ai"] + result["human"] == 0:
+                    raise RuntimeError(f"query_ollama failed: {result['reason']}")
+
+            times = measure(run, len(texts))
+            params = {"mode": mode, "first_token_delay": ctx.args.ollama_latency,
+                      "token_delay": ctx.args.token_delay, "prefill_per_char": ctx.args.prefill_per_char}
+            yield f"ollama/query_ollama/{mode}", summarise("ollama", params, times)
+    finally:
+        ollama_client._client.close()
+        ollama_client._client = previous
+        server.stop()
+
+
+def _seed_history(conn, rows, corpus):
+    """Insert rows through the normal schema, bypassing save_input for speed."""
+    import database
+
+    pool = [corpus.text(("en", "th")[i % 2], 300) for i in range(SEED_TEXTS)]
+    existing = conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+    for start in range(existing, rows, DB_BATCH):
+        batch = []
+        for i in range(start, min(start + DB_BATCH, rows)):
+            text = pool[i % len(pool)]
+            batch.append((str(uuid.uuid4()), f"user-{i % DB_USERS}", text, text[:database.PREVIEW_CHARS]))
+        with conn:
+            conn.executemany('''
+                INSERT INTO history (hs_id, user_id, hs_input_text, hs_preview, hs_result_ai, hs_result_human)
+                VALUES (?, ?, ?, ?, 0.5, 0.5)
+            ''', batch)
+
+
+def bench_database(ctx):
+    import database
+
+    for rows in ctx.db_rows:
+        database.close_db_connection()
+        database.DB_NAME = os.path.join(ctx.workspace, "db", f"history-{rows}.db")
+        conn = database.get_db_connection()
+        started = time.perf_counter()
+        _seed_history(conn, rows, ctx.corpus)
+        print(f"  seeded {rows} history rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        text = ctx.corpus.text("th", 500)
+        params = {"rows": rows, "users": DB_USERS}
+        times = measure(lambda: database.save_input("user-0", text, 0.6, 0.4), ctx.repeats * 4)
+        yield f"database/save_input/{rows}", summarise("database", params, times)
+
+        times = measure(lambda: database.get_user_history("user-1"), ctx.repeats)
+        yield f"database/get_user_history/{rows}", summarise("database", params, times)
+
+        times = measure(lambda: database.get_history_page("user-1"), ctx.repeats * 4)
+        yield f"database/get_history_page/{rows}", summarise("database", params, times)
+    database.close_db_connection()
+
+
+def bench_trainer(ctx):
+    import trainer
+
+    for rows in ctx.train_rows:
+        csv_path = os.path.join(ctx.workspace, "data", f"synthetic-{rows}.csv")
+        ctx.corpus.write_csv(csv_path, rows)
+        out = os.path.join(ctx.workspace, "models", f"bench-{rows}.pkl")
+        with quiet():
+            times = measure(lambda: trainer.train_model(csv_path, out), max(1, ctx.repeats // 2))
+        yield f"trainer/train_model/{rows}", summarise("trainer", {"rows": rows}, times)
+
+
+BENCHES = {
+    "clean_text": bench_clean_text,
+    "predict_text": bench_predict_text,
+    "ollama": bench_ollama,
+    "database": bench_database,
+    "trainer": bench_trainer,
+}
+
+
+# --- run / compare ---------------------------------------------------------
+
+class Context:
+    def __init__(self, args, workspace):
+        self.args = args
+        self.workspace = workspace
+        self.corpus = Corpus(seed=args.seed)
+        self.repeats = args.repeats or (3 if args.quick else 10)
+        self.lengths = [100, 1000] if args.quick else [100, 1000, 10000]
+        self.db_rows = [10_000] if args.quick else [10_000, 100_000]
+        self.train_rows = [2_000] if args.quick else [2_000, 20_000]
+        if args.full:
+            self.db_rows.append(1_000_000)
+            self.train_rows.append(200_000)
+
+
+def prepare_workspace(workspace, corpus):
+    """Training data and a trained model at the relative paths the app uses."""
+    import trainer
+
+    for sub in ("data", "models", "db"):
+        os.makedirs(os.path.join(workspace, sub), exist_ok=True)
+    corpus.write_csv(os.path.join(workspace, "data", "train.csv"), MODEL_ROWS)
+    with quiet():
+        trainer.train_model(os.path.join(workspace, "data", "train.csv"),
+                            os.path.join(workspace, "models", "ai_model.pkl"))
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                             capture_output=True, text=True, timeout=10)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR,
+                               capture_output=True, text=True, timeout=30)
+        return out.stdout.strip() + ("+dirty" if dirty.stdout.strip() else "")
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(args):
+    groups = args.only or list(GROUPS)
+    workspace = tempfile.mkdtemp(prefix="tauthy-bench-")
+    cwd = os.getcwd()
+    out = os.path.abspath(args.out) if args.out else None
+    results = {}
+    started = time.time()
+    try:
+        os.chdir(workspace)
+        ctx = Context(args, workspace)
+        print(f"workspace {workspace}", file=sys.stderr)
+        prepare_workspace(workspace, ctx.corpus)
+        for group in groups:
+            print(f"[{group}]", file=sys.stderr)
+            for name, result in BENCHES[group](ctx):
+                results[name] = result
+                print(f"  {name:<40} median {result['median_ms']:>10.3f} ms   p95 {result['p95_ms']:>10.3f} ms",
+                      file=sys.stderr)
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"workspace kept: {workspace}", file=sys.stderr)
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+            "duration_s": round(time.time() - started, 1),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+            "full": args.full,
+            "repeats": args.repeats,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if out is None:
+        results_dir = os.path.join(BENCH_DIR, "results")
+        os.makedirs(results_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started))
+        out = os.path.join(results_dir, f"{stamp}-{report['meta']['commit'] or 'nogit'}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"results written to {out}")
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        cand = json.load(f)
+
+    print(f"baseline  {base['meta'].get('commit')}  {base['meta'].get('timestamp')}")
+    print(f"candidate {cand['meta'].get('commit')}  {cand['meta'].get('timestamp')}\n")
+    print(f"{'case':<42} {'baseline ms':>12} {'candidate ms':>13} {'change':>8}")
+
+    regressions = []
+    names = list(base["results"]) + [n for n in cand["results"] if n not in base["results"]]
+    for name in names:
+        old = base["results"].get(name)
+        new = cand["results"].get(name)
+        if old is None or new is None:
+            print(f"{name:<42} {old['median_ms'] if old else '-':>12} {new['median_ms'] if new else '-':>13} "
+                  f"{'only in ' + ('baseline' if old else 'candidate'):>8}")
+            continue
+        a, b = old["median_ms"], new["median_ms"]
+        change = (b - a) / a if a else 0.0
+        flag = ""
+        # Both relative and absolute: sub-millisecond cases are mostly noise
+        if change > args.threshold and b - a > args.min_ms:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -args.threshold and a - b > args.min_ms:
+            flag = "  faster"
+        print(f"{name:<42} {a:>12.3f} {b:>13.3f} {change:>+8.1%}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+        return 1
+    print("\nno regressions")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tauthy benchmark suite.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="run the suite and write JSON results")
+    p.add_argument("--only", nargs="+", choices=GROUPS, help="groups to run (default: all)")
+    p.add_argument("--quick", action="store_true", help="fewer sizes and repeats, for a smoke run")
+    p.add_argument("--full", action="store_true", help="also 1M history rows and 200k training rows")
+    p.add_argument("--repeats", type=int, default=None, help="timed repetitions per case")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", help="JSON file (default: benchmarks/results/<time>-<commit>.json)")
+    p.add_argument("--keep", action="store_true", help="keep the temporary workspace")
+    p.add_argument("--ollama-latency", type=float, default=0.05, help="fake server seconds before the first token")
+    p.add_argument("--token-delay", type=float, default=0.002, help="fake server seconds between tokens")
+    p.add_argument("--prefill-per-char", type=float, default=0.0, help="fake server seconds per prompt character")
+
+    p = sub.add_parser("compare", help="compare two result files")
+    p.add_argument("baseline")
+    p.add_argument("candidate")
+    p.add_argument("--threshold", type=float, default=0.15, help="relative slowdown counted as a regression")
+    p.add_argument("--min-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
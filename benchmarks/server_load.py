@@ -0,0 +1,174 @@
+"""Load generator for inference_server.py: throughput and tail latency by concurrency.
+
+Each level runs --requests /v1/predict calls from that many client threads,
+each with its own keep-alive connection, and reports requests per second,
+p50/p95/p99 latency, 503 (back-pressure) answers and the server's mean
+batch size. Unless --url is given, a server is started in a subprocess from
+the current directory (which needs models/ai_model.pkl), once per batching
+setting, so results with and without micro-batching can be compared.
+
+    python benchmarks/server_load.py --levels 1 4 16 64 --requests 2000
+    python benchmarks/server_load.py --max-batch 1 32 --csv data/train.csv
+    python benchmarks/server_load.py --url http://127.0.0.1:8765
+"""
+import argparse
+import csv
+import http.client
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_texts(csv_path, n, seed):
+    if csv_path:
+        csv.field_size_limit(sys.maxsize)
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            texts = [row["text"] for row in csv.DictReader(f) if row.get("text")]
+        random.Random(seed).shuffle(texts)
+        return texts[:n]
+    from run import Corpus
+
+    corpus = Corpus(seed)
+    return [text for text, _ in corpus.rows(n)]
+
+
+def start_server(max_batch, max_wait_ms, queue):
+    cmd = [sys.executable, os.path.join(ROOT_DIR, "inference_server.py"), "--port", "0",
+           "--max-batch", str(max_batch), "--max-wait-ms", str(max_wait_ms), "--queue", str(queue), "--no-cache"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, env=dict(os.environ, PYTHONUNBUFFERED="1"))
+    for line in proc.stdout:
+        match = re.search(r"listening on (http://\S+)", line)
+        if match:
+            return proc, match.group(1)
+    proc.wait()
+    sys.exit(f"inference server exited with status {proc.returncode}")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def server_batch_stats(url):
+    """(batches, texts) scored so far, from the server's /metrics."""
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=10)
+    conn.request("GET", "/metrics")
+    body = conn.getresponse().read().decode("utf-8")
+    conn.close()
+    count = re.search(r'tauthy_value_count\{name="server.batch_size"\} (\S+)', body)
+    total = re.search(r'tauthy_value_sum\{name="server.batch_size"\} (\S+)', body)
+    return (float(count.group(1)) if count else 0.0), (float(total.group(1)) if total else 0.0)
+
+
+def run_level(url, texts, concurrency, requests):
+    parsed = urlparse(url)
+    latencies = []
+    rejected = [0]
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client(seed):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=120)
+        mine = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            # bytes, so http.client sends headers and body in one packet
+            body = json.dumps({"text": rng.choice(texts)}).encode("utf-8")
+            started = time.perf_counter()
+            try:
+                conn.request("POST", "/v1/predict", body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=120)
+                status = None
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status == 200:
+                    mine.append(elapsed)
+                elif status == 503:
+                    rejected[0] += 1
+                else:
+                    errors[0] += 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    return wall, sorted(latencies), rejected[0], errors[0]
+
+
+def pct(values, p):
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the inference server.")
+    parser.add_argument("--url", help="existing server; by default one is started per --max-batch value")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--requests", type=int, default=1000, help="requests per level")
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[1, 32],
+                        help="server batch sizes to compare (1 = no batching)")
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--queue", type=int, default=1024)
+    parser.add_argument("--csv", help="take texts from this CSV's text column instead of synthetic ones")
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = load_texts(args.csv, args.texts, args.seed)
+    settings = [None] if args.url else args.max_batch
+
+    print(f"{'max batch':>9} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'503':>5} {'errors':>6} {'batch':>6}")
+    for max_batch in settings:
+        proc = None
+        url = args.url
+        if url is None:
+            proc, url = start_server(max_batch, args.max_wait_ms, args.queue)
+        try:
+            # Warm the server's connection handling and first batch
+            run_level(url, texts, 2, 20)
+            for level in args.levels:
+                before = server_batch_stats(url)
+                wall, latencies, rejected, errors = run_level(url, texts, level, args.requests)
+                after = server_batch_stats(url)
+                batches = after[0] - before[0]
+                mean_batch = (after[1] - before[1]) / batches if batches else float("nan")
+                ms = [x * 1000 for x in latencies]
+                label = max_batch if max_batch is not None else "-"
+                print(f"{label:>9} {level:>7} {len(latencies) / wall:>8.0f} {pct(ms, 50):>8.1f} "
+                      f"{pct(ms, 95):>8.1f} {pct(ms, 99):>8.1f} {rejected:>5} {errors:>6} {mean_batch:>6.1f}")
+        finally:
+            if proc is not None:
+                stop_server(proc)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Startup benchmark: time-to-login-window and time-to-first-prediction.
+
+Each scenario runs in a fresh interpreter with `-X importtime`, so the
+numbers include interpreter start-up and every import the app pays for.
+The slowest imports (cumulative) are listed under each scenario.
+
+    python benchmarks/startup_bench.py --runs 5 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_TEXT = (
+    "Artificial intelligence has transformed the way people write, study and work. "
+    "ปัญญาประดิษฐ์เปลี่ยนวิธีการเขียน การเรียน และการทำงานของผู้คนอย่างมาก"
+)
+
+SCENARIOS = {
+    # Interpreter start -> login window painted
+    "login_window": """
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtWidgets import QApplication
+import main
+app = QApplication([])
+window = main.LoginWindow()
+window.show()
+app.processEvents()
+""",
+    # Interpreter start -> main window constructed (what the login click pays)
+    "main_window": """
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtWidgets import QApplication
+app = QApplication([])
+from mainapp import MainAppWindow
+window = MainAppWindow("benchmark")
+window.show()
+app.processEvents()
+""",
+    # Interpreter start -> first predict_text result
+    "first_prediction": f"""
+from ai_checker import predict_text
+predict_text({SAMPLE_TEXT!r})
+""",
+}
+
+
+def _parse_importtime(stderr, top):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Only top-level imports, so nested packages are not counted twice
+        if name[1:].startswith(" "):
+            continue
+        imports.append((int(cumulative_us) / 1000, name.strip()))
+    imports.sort(reverse=True)
+    return imports[:top]
+
+
+def run_scenario(code, cwd=ROOT_DIR, top=8):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT_DIR, os.environ.get("PYTHONPATH")])))
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "scenario failed")
+    return elapsed, _parse_importtime(proc.stderr, top)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Tauthy start-up latency.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="scenario to run (default: all)")
+    parser.add_argument("--cwd", default=ROOT_DIR,
+                        help="directory holding models/, db/ and qss/ (default: repository root)")
+    parser.add_argument("--json", dest="json_path", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        times = []
+        slowest = []
+        for _ in range(args.runs):
+            try:
+                elapsed, slowest = run_scenario(SCENARIOS[name], cwd=args.cwd)
+            except RuntimeError as e:
+                print(f"{name}: failed ({e})")
+                break
+            times.append(elapsed)
+        if not times:
+            continue
+
+        results[name] = {
+            "runs": len(times),
+            "median_s": statistics.median(times),
+            "min_s": min(times),
+            "max_s": max(times),
+            "slowest_imports_ms": slowest,
+        }
+        print(f"{name}: median {statistics.median(times) * 1000:.0f} ms "
+              f"(min {min(times) * 1000:.0f}, max {max(times) * 1000:.0f}, {len(times)} runs)")
+        for ms, module in slowest:
+            print(f"   {ms:8.1f} ms  {module}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compare Thai tokenizer engines on our corpus.
+
+For every engine: throughput on individual documents (serial, memo
+cleared), throughput on one long concatenated document (chunked across the
+process pool) and agreement with the first engine listed.
+
+    python benchmarks/tokenizer_bench.py --csv data/train.csv --limit 2000 \\
+        --engines newmm newmm-custom longest
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import language_id  # noqa: E402
+import thai_tokenizer  # noqa: E402
+
+
+def load_thai_texts(csv_path, limit):
+    csv.field_size_limit(sys.maxsize)
+    texts = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            text = row.get("text") or ""
+            if language_id.has_thai(text):
+                texts.append(text)
+                if len(texts) >= limit:
+                    break
+    return texts
+
+
+def run_engine(engine, docs, long_doc, workers):
+    thai_tokenizer._memo.clear()
+    started = time.perf_counter()
+    tokens = [thai_tokenizer.tokenize(d, engine=engine, workers=1) for d in docs]
+    serial = time.perf_counter() - started
+
+    thai_tokenizer._memo.clear()
+    started = time.perf_counter()
+    thai_tokenizer.tokenize(long_doc, engine=engine, workers=workers)
+    parallel = time.perf_counter() - started
+
+    return tokens, serial, parallel
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Thai tokenizer engines.")
+    parser.add_argument("--csv", default=os.path.join(ROOT_DIR, "data", "train.csv"))
+    parser.add_argument("--limit", type=int, default=1000, help="number of Thai documents to use")
+    parser.add_argument("--engines", nargs="+", default=["newmm", "newmm-custom", "longest"])
+    parser.add_argument("--workers", type=int, default=thai_tokenizer.WORKERS)
+    args = parser.parse_args()
+
+    texts = load_thai_texts(args.csv, args.limit)
+    if not texts:
+        sys.exit(f"No Thai documents found in {args.csv}")
+
+    docs = [thai_tokenizer.normalize_paragraphs(t) for t in texts]
+    long_doc = [p for d in docs for p in d]
+    chars = sum(len(p) for d in docs for p in d)
+    print(f"{len(docs)} Thai documents, {chars} characters after normalisation\n")
+
+    # Warm the pool and dictionaries so start-up cost is not billed to the first engine
+    thai_tokenizer.tokenize(long_doc[:50], workers=args.workers)
+
+    baseline = None
+    print(f"{'engine':<14} {'serial chars/s':>15} {'pooled chars/s':>15} {'same tokens':>12} {'jaccard':>8}")
+    for engine in args.engines:
+        try:
+            tokens, serial, parallel = run_engine(engine, docs, long_doc, args.workers)
+        except Exception as e:
+            print(f"{engine:<14} failed: {e}")
+            continue
+
+        if baseline is None:
+            baseline = tokens
+        same = sum(a == b for a, b in zip(tokens, baseline)) / len(tokens)
+        jac = sum(jaccard(a, b) for a, b in zip(tokens, baseline)) / len(tokens)
+        print(f"{engine:<14} {chars / serial:>15.0f} {chars / parallel:>15.0f} {same:>11.1%} {jac:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Time-to-first-token benchmark: prompt layout, keep-alive and warm-up.
+
+Replays a sequence of analyses the way one app session would send them and
+measures the time until the first streamed token, for three setups:
+
+    legacy   the previous request: one /api/generate prompt with the varying
+             examples between the introduction and the instructions, no
+             keep_alive and no warm-up call
+    prefix   /api/chat with the instructions as a fixed system message,
+             keep_alive and the start-up warm-up call; examples as selected
+             for each text (nearest when the few-shot index is built)
+    pinned   as prefix, with the pinned example set of each language
+
+By default every setup runs against its own in-process fake server
+(benchmarks/fake_ollama.py) that charges model loading and prompt
+evaluation, the latter only for the part of the prompt that is not a prefix
+of a recently evaluated one. --idle pauses between analyses longer than the
+server's default keep-alive, as a user reading results would.
+
+    python benchmarks/ttft_bench.py --texts 30
+    python benchmarks/ttft_bench.py --texts 30 --idle 0.5 --server-keep-alive 0.3
+    python benchmarks/ttft_bench.py --texts 30 --ollama http://localhost:11434
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ollama_checker  # noqa: E402
+from fewshot_bench import sample_targets  # noqa: E402
+from ollama_client import KEEP_ALIVE, OllamaClient  # noqa: E402
+
+SETUPS = ("legacy", "prefix", "pinned")
+INSTRUCTIONS_MARK = "==================\nANALYSIS INSTRUCTIONS"
+
+
+def legacy_prompt(text, ai_examples, human_examples):
+    """The request as it was laid out before the system prompt split."""
+    intro, instructions = ollama_checker.SYSTEM_PROMPT.split(INSTRUCTIONS_MARK, 1)
+    user = ollama_checker.build_user_message(text, ai_examples, human_examples)
+    examples, target = user.split("==================\nTARGET TEXT", 1)
+    return (intro + examples + INSTRUCTIONS_MARK + instructions + "\n\n"
+            + "==================\nTARGET TEXT" + target)
+
+
+def examples_for(setup, text, lang):
+    if setup == "pinned":
+        ai, human = ollama_checker.pinned_examples(lang)
+        return list(ai), list(human)
+    mode = ollama_checker.FEWSHOT_MODE
+    ollama_checker.FEWSHOT_MODE = "nearest"
+    try:
+        return ollama_checker.select_examples(text, lang)
+    finally:
+        ollama_checker.FEWSHOT_MODE = mode
+
+
+def first_token(stream):
+    """Seconds until the stream yields, then drain it."""
+    started = time.perf_counter()
+    ttft = None
+    for _ in stream:
+        if ttft is None:
+            ttft = time.perf_counter() - started
+    return ttft if ttft is not None else time.perf_counter() - started
+
+
+def run_setup(setup, targets, url, idle):
+    client = OllamaClient(base_url=url, keep_alive=None if setup == "legacy" else KEEP_ALIVE)
+    try:
+        return _replay(client, setup, targets, idle)
+    finally:
+        client.close()
+
+
+def _replay(client, setup, targets, idle):
+    if setup != "legacy":
+        started = time.perf_counter()
+        client.chat([{"role": "system", "content": ollama_checker.SYSTEM_PROMPT}], options={"num_predict": 1})
+        warm_up = time.perf_counter() - started
+    else:
+        warm_up = 0.0
+
+    ttfts = []
+    for i, (lang, text) in enumerate(targets):
+        if i and idle:
+            time.sleep(idle)
+        # build_user_message prints the examples
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai_examples, human_examples = examples_for(setup, text, lang)
+            if setup == "legacy":
+                stream = client.stream_generate(legacy_prompt(text, ai_examples, human_examples))
+            else:
+                stream = client.stream_chat(ollama_checker.build_messages(text, ai_examples, human_examples))
+        ttfts.append(first_token(stream))
+    return warm_up, ttfts
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first token for each prompt layout.")
+    parser.add_argument("--texts", type=int, default=30, help="analyses per setup")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--lang", help="only use target texts in this language")
+    parser.add_argument("--ollama", metavar="URL", help="measure against this Ollama server instead of a fake one")
+    parser.add_argument("--idle", type=float, default=0.0, help="seconds between analyses")
+    parser.add_argument("--prefill-per-char", type=float, default=0.0002,
+                        help="fake server prompt evaluation, seconds per uncached character")
+    parser.add_argument("--load-delay", type=float, default=2.0, help="fake server model load, seconds")
+    parser.add_argument("--server-keep-alive", type=float, default=300.0,
+                        help="fake server keep-alive, seconds, for requests that send none")
+    parser.add_argument("--cache-slots", type=int, default=4, help="fake server prompt cache slots")
+    args = parser.parse_args()
+
+    targets = sample_targets(args.texts * 4 if args.lang else args.texts, args.seed)
+    if args.lang:
+        targets = [t for t in targets if t[0] == args.lang][:args.texts]
+    if not targets:
+        sys.exit("No target texts; check the training data and --lang")
+
+    from fake_ollama import FakeOllamaServer
+
+    print(f"{len(targets)} analyses per setup, languages: {', '.join(sorted({lang for lang, _ in targets}))}\n")
+    print(f"{'setup':<8} {'warm-up s':>10} {'first s':>8} {'p50 s':>7} {'p95 s':>7} {'mean s':>7} "
+          f"{'loads':>6} {'evaluated':>10} {'cached':>8}")
+    for setup in SETUPS:
+        server = None
+        url = args.ollama
+        if url is None:
+            server = FakeOllamaServer(prefill_per_char=args.prefill_per_char, prefix_cache=True,
+                                      cache_slots=args.cache_slots, load_delay=args.load_delay,
+                                      default_keep_alive=args.server_keep_alive).start()
+            url = server.url
+        try:
+            warm_up, ttfts = run_setup(setup, targets, url, args.idle)
+        finally:
+            if server is not None:
+                server.stop()
+
+        rest = ttfts[1:] or ttfts
+        line = (f"{setup:<8} {warm_up:>10.2f} {ttfts[0]:>8.2f} {statistics.median(rest):>7.3f} "
+                f"{percentile(rest, 95):>7.3f} {statistics.mean(ttfts):>7.3f}")
+        if server is not None:
+            total = server.evaluated_chars + server.cached_chars
+            line += f" {server.loads:>6} {server.evaluated_chars:>10} {server.cached_chars / total:>8.0%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+OUTPUT_FIELDS = ["row", "id", "label", "confidence", "ai", "human"]
+
+
+def _is_jsonl(path):
+    return path.endswith((".jsonl", ".ndjson"))
+
+
+def read_rows(path, text_field="text", id_field=None):
+    """Stream (row_number, id, text) from a CSV or JSONL file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if _is_jsonl(path):
+            for i, line in enumerate(f):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                yield i, record.get(id_field) if id_field else None, record.get(text_field) or ""
+        else:
+            csv.field_size_limit(sys.maxsize)
+            reader = csv.DictReader(f)
+            if text_field not in (reader.fieldnames or []):
+                raise ValueError(f"Input must contain a '{text_field}' column.")
+            for i, record in enumerate(reader):
+                yield i, record.get(id_field) if id_field else None, record.get(text_field) or ""
+
+
+def _score_batch(batch):
+    from ai_checker import predict_texts
+
+    rows, ids, texts = zip(*batch)
+    results = predict_texts(texts, batch_size=len(texts))
+    return [
+        {
+            "row": row,
+            "id": row_id,
+            "label": res["label"],
+            "confidence": res["confidence"],
+            "ai": res["details"].get("ai"),
+            "human": res["details"].get("human"),
+        }
+        for row, row_id, res in zip(rows, ids, results)
+    ]
+
+
+class _Writer:
+    def __init__(self, path):
+        self.jsonl = _is_jsonl(path)
+        self.f = open(path, "w", newline="", encoding="utf-8")
+        if not self.jsonl:
+            self.csv = csv.DictWriter(self.f, fieldnames=OUTPUT_FIELDS)
+            self.csv.writeheader()
+
+    def write(self, records):
+        if self.jsonl:
+            self.f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        else:
+            self.csv.writerows(records)
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+def bulk_score(input_path, output_path, text_field="text", id_field=None,
+               batch_size=512, workers=None):
+    """Score every row of input_path with a process pool, writing results as they finish."""
+    workers = workers or os.cpu_count() or 1
+    rows = read_rows(input_path, text_field, id_field)
+    writer = _Writer(output_path)
+
+    labels = Counter()
+    total = 0
+    started = time.time()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep only a few batches in flight so memory stays flat on huge inputs
+            pending = deque()
+            while True:
+                while len(pending) < workers * 2:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    pending.append(executor.submit(_score_batch, batch))
+                if not pending:
+                    break
+
+                records = pending.popleft().result()
+                writer.write(records)
+                total += len(records)
+                labels.update(r["label"] for r in records)
+
+                elapsed = time.time() - started
+                print(f"\rScored {total} rows ({total / elapsed:.0f} rows/sec)", end="", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.time() - started
+    print(file=sys.stderr)
+    print(f"Results saved to: {output_path}")
+    print(f"Total rows: {total} in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/sec, {workers} workers)")
+    print("Label distribution:")
+    for label in ["ai", "human", "undecided"]:
+        print(f"   - {label.upper()}: {labels.get(label, 0)} rows")
+
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV or JSONL file with the AI text classifier.")
+    parser.add_argument("input", help="input .csv or .jsonl file")
+    parser.add_argument("output", help="output .csv or .jsonl file")
+    parser.add_argument("--text-field", default="text", help="column/field holding the text (default: text)")
+    parser.add_argument("--id-field", default=None, help="column/field copied to the output as 'id'")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    bulk_score(args.input, args.output, args.text_field, args.id_field, args.batch_size, args.workers)
@@ -0,0 +1,226 @@
+import json
+import os
+from collections import namedtuple
+import language_id
+
+# Decides whether an analysis needs the LLM after the TF-IDF model has
+# scored it. Ollama only runs when the model is unsure; texts the model is
+# confident about, or that are too short for either to judge, skip it.
+#
+# Thresholds can differ per language. data/cascade.json (optional):
+#     {"default": {"confidence": 90, "min_chars": 40},
+#      "th": {"confidence": 85}}
+# Languages fall back to "default"; missing keys fall back to the settings below.
+# Tune them with the offline evaluation:
+#     python cascade.py data/test.csv --confidence 80 85 90 95
+
+ENABLED = os.environ.get("TAUTHY_CASCADE", "1") != "0"
+POLICY_PATH = os.environ.get("TAUTHY_CASCADE_POLICY", "data/cascade.json")
+# Model confidence (%) at which the LLM is skipped
+CONFIDENCE = float(os.environ.get("TAUTHY_CASCADE_CONFIDENCE", 90))
+# Texts shorter than this never go to the LLM
+MIN_CHARS = int(os.environ.get("TAUTHY_CASCADE_MIN_CHARS", 40))
+
+# History status of the LLM stage
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+SKIPPED_CONFIDENT = "skipped:confident"
+SKIPPED_SHORT = "skipped:too_short"
+
+Policy = namedtuple("Policy", "confidence min_chars")
+# run_llm: bool; reason: why, also the history status when skipped
+Decision = namedtuple("Decision", "run_llm reason lang")
+
+_policies = None
+_policies_stamp = None
+
+
+def load_policies(path=POLICY_PATH):
+    """{lang: Policy} from the policy file; "default" is always present."""
+    global _policies, _policies_stamp
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        stamp = None
+    if _policies is not None and stamp == _policies_stamp:
+        return _policies
+
+    raw = {}
+    if stamp is not None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except ValueError as e:
+            print(f"Ignoring invalid cascade policy {path}: {e}")
+
+    base = {"confidence": CONFIDENCE, "min_chars": MIN_CHARS, **raw.get("default", {})}
+    policies = {"default": Policy(float(base["confidence"]), int(base["min_chars"]))}
+    for lang, values in raw.items():
+        if lang != "default":
+            merged = {**base, **values}
+            policies[lang] = Policy(float(merged["confidence"]), int(merged["min_chars"]))
+    _policies, _policies_stamp = policies, stamp
+    return policies
+
+
+def policy_for(lang, policies=None):
+    policies = policies or load_policies()
+    return policies.get(lang, policies["default"])
+
+
+def decide(ml_result, text, policy=None, lang=None):
+    """Whether the LLM should look at text, given the model's result for it."""
+    lang = lang or language_id.detect(text)
+    if not ENABLED:
+        return Decision(True, "cascade disabled", lang)
+    policy = policy or policy_for(lang)
+
+    if len(text.strip()) < policy.min_chars:
+        return Decision(False, SKIPPED_SHORT, lang)
+    if ml_result["label"] == "undecided":
+        # Too few tokens for the model, but long enough for the LLM to judge
+        return Decision(True, "undecided", lang)
+    if ml_result["confidence"] >= policy.confidence:
+        return Decision(False, SKIPPED_CONFIDENT, lang)
+    return Decision(True, "uncertain", lang)
+
+
+# ---------------------------------------------------------------------------
+# Offline evaluation
+# ---------------------------------------------------------------------------
+
+def _llm_label(result):
+    if not result or result["ai"] + result["human"] == 0:
+        return None
+    return "ai" if result["ai"] >= result["human"] else "human"
+
+
+def evaluate(rows, confidences, min_chars, llm_labels):
+    """Accuracy and LLM share per language and confidence threshold.
+
+    rows are (text, label, lang, ml_result); llm_labels[i] is the LLM's
+    label for row i or None when unknown. Where the cascade would call the
+    LLM but its label is unknown, the model's label stands in, and the
+    number of such rows is reported.
+    """
+    report = []
+    langs = sorted({lang for _, _, lang, _ in rows})
+    for lang in ["all"] + langs:
+        idx = [i for i, r in enumerate(rows) if lang == "all" or r[2] == lang]
+        if not idx:
+            continue
+        ml_correct = sum(rows[i][3]["label"] == rows[i][1] for i in idx)
+        known = [i for i in idx if llm_labels[i] is not None]
+        for confidence in confidences:
+            policy = Policy(confidence, min_chars)
+            llm_calls = 0
+            missing = 0
+            correct = 0
+            skipped_correct = 0
+            skipped = 0
+            for i in idx:
+                text, label, row_lang, ml = rows[i]
+                decision = decide(ml, text, policy, row_lang)
+                if decision.run_llm:
+                    llm_calls += 1
+                    predicted = llm_labels[i]
+                    if predicted is None:
+                        missing += 1
+                        predicted = ml["label"]
+                else:
+                    skipped += 1
+                    predicted = ml["label"]
+                    skipped_correct += predicted == label
+                correct += predicted == label
+            report.append({
+                "lang": lang,
+                "confidence": confidence,
+                "rows": len(idx),
+                "llm_share": llm_calls / len(idx),
+                "avoided": 1 - llm_calls / len(idx),
+                "accuracy": correct / len(idx),
+                "skipped_accuracy": skipped_correct / skipped if skipped else None,
+                "ml_accuracy": ml_correct / len(idx),
+                "llm_accuracy": (sum(llm_labels[i] == rows[i][1] for i in known) / len(known)) if known else None,
+                "llm_missing": missing,
+            })
+    return report
+
+
+def _read_labelled(path, limit):
+    import csv
+    import sys
+
+    csv.field_size_limit(sys.maxsize)
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            text, label = row.get("text") or "", (row.get("label") or "").strip()
+            if text.strip() and label:
+                rows.append((text, label))
+                if limit and len(rows) >= limit:
+                    break
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Replay labelled data through the cascade: accuracy vs. LLM calls avoided.")
+    parser.add_argument("csv", help="CSV with text and label columns (held-out data, not train.csv)")
+    parser.add_argument("--confidence", type=float, nargs="+", default=[70, 80, 85, 90, 95, 99],
+                        help="model confidence thresholds to compare")
+    parser.add_argument("--min-chars", type=int, default=MIN_CHARS)
+    parser.add_argument("--limit", type=int, default=None, help="only the first N rows")
+    parser.add_argument("--ollama", action="store_true",
+                        help="query Ollama for rows without a cached LLM result (slow)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    import ai_checker
+    import ollama_checker
+    from result_cache import get_cache
+
+    labelled = _read_labelled(args.csv, args.limit)
+    texts = [t for t, _ in labelled]
+    ml_results = list(ai_checker.predict_texts(texts))
+    langs = language_id.detect_many(texts)
+    rows = [(t, label, lang, ml) for (t, label), lang, ml in zip(labelled, langs, ml_results)]
+
+    # Only rows some threshold would send to the LLM need its verdict; the
+    # strictest threshold sends the most
+    strictest = Policy(max(args.confidence), args.min_chars)
+    cache = get_cache()
+    llm_labels = []
+    for i, (text, _, lang, ml) in enumerate(rows):
+        result = None
+        if decide(ml, text, strictest, lang).run_llm:
+            result = cache.get("ollama", ollama_checker.prompt_version(), text)
+            if result is None and args.ollama:
+                try:
+                    result = ollama_checker.query_ollama(text)
+                except ValueError:
+                    result = None
+                print(f"\r  LLM {i + 1}/{len(rows)}", end="", flush=True)
+        llm_labels.append(_llm_label(result))
+    if args.ollama:
+        print()
+
+    report = evaluate(rows, args.confidence, args.min_chars, llm_labels)
+    print(f"{len(rows)} rows from {args.csv}, min_chars={args.min_chars}\n")
+    print(f"{'lang':<8} {'conf':>5} {'rows':>6} {'LLM calls':>10} {'avoided':>8} {'accuracy':>9} "
+          f"{'skipped acc':>12} {'ML only':>8} {'LLM only':>9} {'no LLM':>7}")
+    for r in report:
+        skipped = f"{r['skipped_accuracy']:.1%}" if r["skipped_accuracy"] is not None else "-"
+        llm = f"{r['llm_accuracy']:.1%}" if r["llm_accuracy"] is not None else "-"
+        print(f"{r['lang']:<8} {r['confidence']:>5.0f} {r['rows']:>6} {r['llm_share']:>10.1%} {r['avoided']:>8.1%} "
+              f"{r['accuracy']:>9.1%} {skipped:>12} {r['ml_accuracy']:>8.1%} {llm:>9} {r['llm_missing']:>7}")
+    if any(r["llm_missing"] for r in report):
+        print("\n'no LLM': rows sent to the LLM without a cached verdict, counted with the model's label; "
+              "rerun with --ollama to fill them in.")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,402 @@
+import json
+import mmap
+import os
+import re
+import zlib
+from collections import Counter
+from hashlib import blake2b
+import numpy as np
+
+# Memory-mappable form of models/ai_model.pkl, written by the trainer.
+#
+# The pickle holds a TfidfVectorizer whose vocabulary is a Python dict with
+# one entry per term; unpickling it is slow and every process gets its own
+# copy. The compact file instead stores the vocabulary as a string table
+# ordered by the CRC-32 of each term, with the sorted hashes and column
+# numbers beside it, plus the idf and classifier weights as raw arrays. A
+# term is found with a binary search over the hashes and a byte comparison
+# against the table (terms with equal hashes sit next to each other). The
+# file is opened with mmap, so loading takes milliseconds and processes
+# share its pages.
+#
+# Transform and predict_proba repeat scikit-learn's arithmetic step for step,
+# so probabilities are bit-identical to the pickled model's.
+#
+#     python trainer/trainer.py --export-compact     # convert an existing model
+
+MAGIC = b"TAUTHYM1"
+FORMAT_VERSION = 1
+ALIGN = 64
+SUFFIX = ".compact"
+
+
+def path_for(model_path):
+    """Where the compact form of a pickled model lives: models/ai_model.compact."""
+    return os.path.splitext(model_path)[0] + SUFFIX
+
+
+def _param_repr(value):
+    # Functions by name; their repr includes an address that differs per process
+    if callable(value) and hasattr(value, "__qualname__"):
+        return f"{getattr(value, '__module__', '')}.{value.__qualname__}"
+    return repr(value)
+
+
+def vocabulary_key(vectorizer):
+    """Hash of a vectorizer's vocabulary and idf weights, for indexes built with it.
+
+    A vectorizer without a vocabulary (HashingVectorizer) is stateless, so
+    its class and parameters identify it.
+    """
+    key = getattr(vectorizer, "vocabulary_key", None)
+    if key is None and not hasattr(vectorizer, "vocabulary_"):
+        params = sorted((name, _param_repr(value)) for name, value in vectorizer.get_params().items())
+        h = blake2b(digest_size=16)
+        h.update(json.dumps([type(vectorizer).__name__, params]).encode("utf-8"))
+        key = h.hexdigest()
+    elif key is None:
+        # Terms in column order, which is cheap to rebuild from the dict
+        terms = [None] * len(vectorizer.vocabulary_)
+        for term, column in vectorizer.vocabulary_.items():
+            terms[column] = term
+        h = blake2b(digest_size=16)
+        h.update("\0".join(terms).encode("utf-8"))
+        idf = getattr(vectorizer, "idf_", None)
+        if idf is not None:
+            h.update(np.ascontiguousarray(idf, dtype=np.float64).tobytes())
+        key = h.hexdigest()
+    return key
+
+
+def _term_hashes(terms):
+    return np.fromiter(map(zlib.crc32, terms), dtype=np.uint32, count=len(terms))
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _vectorizer_spec(vectorizer):
+    """Settings the compact vectorizer needs; ValueError for what it cannot reproduce."""
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+    if not isinstance(vectorizer, CountVectorizer):
+        # HashingVectorizer has no vocabulary: its pickle is already small
+        raise ValueError(f"{type(vectorizer).__name__} has no vocabulary to compact")
+    if vectorizer.analyzer != "word" or vectorizer.tokenizer is not None or vectorizer.preprocessor is not None:
+        raise ValueError("only the built-in word analyzer is supported")
+    if vectorizer.input != "content" or vectorizer.strip_accents is not None:
+        raise ValueError("input must be 'content' and strip_accents None")
+    if re.compile(vectorizer.token_pattern).groups > 1:
+        raise ValueError("token_pattern has more than one capturing group")
+
+    stop_words = vectorizer.get_stop_words()
+    spec = {
+        "lowercase": bool(vectorizer.lowercase),
+        "token_pattern": vectorizer.token_pattern,
+        "ngram_range": list(vectorizer.ngram_range),
+        "stop_words": sorted(stop_words) if stop_words is not None else None,
+        "binary": bool(vectorizer.binary),
+        "dtype": np.dtype(vectorizer.dtype).str,
+        "tfidf": isinstance(vectorizer, TfidfVectorizer),
+    }
+    arrays = {}
+    if spec["tfidf"]:
+        if vectorizer.norm not in (None, "l1", "l2"):
+            raise ValueError(f"unsupported norm {vectorizer.norm!r}")
+        spec.update(norm=vectorizer.norm, sublinear_tf=bool(vectorizer.sublinear_tf),
+                    use_idf=bool(vectorizer.use_idf))
+        if vectorizer.use_idf:
+            arrays["idf"] = np.asarray(vectorizer.idf_, dtype=np.float64)
+    return spec, arrays
+
+
+def _model_spec(model):
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+    from sklearn.naive_bayes import MultinomialNB
+
+    classes = [str(c) for c in model.classes_]
+    if len(classes) != 2:
+        raise ValueError("only two-class models are supported")
+    if isinstance(model, LogisticRegression) or (isinstance(model, SGDClassifier) and model.loss == "log_loss"):
+        # Binary: predict_proba is expit of one decision function
+        return {"kind": "linear", "classes": classes}, {
+            "coef": np.ascontiguousarray(model.coef_.T, dtype=np.float64),
+            "intercept": np.asarray(model.intercept_, dtype=np.float64),
+        }
+    if isinstance(model, MultinomialNB):
+        return {"kind": "multinomial_nb", "classes": classes}, {
+            "feature_log_prob": np.ascontiguousarray(model.feature_log_prob_, dtype=np.float64),
+            "class_log_prior": np.asarray(model.class_log_prior_, dtype=np.float64),
+        }
+    raise ValueError(f"{type(model).__name__} is not supported")
+
+
+def _vocabulary_table(vocabulary):
+    """Terms, hashes and columns, ordered by hash."""
+    terms = [t.encode("utf-8") for t in vocabulary]
+    columns = np.fromiter(vocabulary.values(), dtype=np.int32, count=len(terms))
+    hashes = _term_hashes(terms)
+    order = np.argsort(hashes, kind="stable")
+    hashes = hashes[order]
+
+    ordered = [terms[i] for i in order]
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in ordered], out=offsets[1:])
+    blob = np.frombuffer(b"".join(ordered), dtype=np.uint8)
+    return {"term_hashes": hashes, "term_columns": columns[order], "term_offsets": offsets, "terms": blob}
+
+
+def export(model_data, path, source=None):
+    """Write model_data ({'vectorizer', 'model', ...}) as a compact model file.
+
+    `source` is the pickle it was made from; the loader only trusts the
+    compact file while that pickle is unchanged. Raises ValueError when the
+    model cannot be reproduced exactly.
+    """
+    from result_cache import file_fingerprint
+
+    vectorizer = model_data["vectorizer"]
+    vectorizer_spec, arrays = _vectorizer_spec(vectorizer)
+    model_spec, model_arrays = _model_spec(model_data["model"])
+    table = _vocabulary_table(vectorizer.vocabulary_)
+    arrays.update(model_arrays)
+    arrays.update(table)
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "source": file_fingerprint(source) if source else None,
+        "n_features": len(vectorizer.vocabulary_),
+        "vocabulary_key": vocabulary_key(vectorizer),
+        "model_version": model_data.get("version", 0),
+        "vectorizer": vectorizer_spec,
+        "model": model_spec,
+        "arrays": layout,
+    }).encode("utf-8")
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        data_start = -(-f.tell() // ALIGN) * ALIGN
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    # Readers that already mapped the old file keep it until they reload
+    os.replace(tmp_path, path)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Load
+# ---------------------------------------------------------------------------
+
+def read_header(path):
+    """The file's header, or None when it is missing or not a compact model."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            size = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(size))
+    except (OSError, ValueError):
+        return None
+    if header.get("format") != FORMAT_VERSION:
+        return None
+    header["data_start"] = -(-(len(MAGIC) + 8 + size) // ALIGN) * ALIGN
+    return header
+
+
+def is_fresh(path, source):
+    """Whether the compact file at path was exported from source as it is now.
+
+    With no source file at all, the compact file stands on its own.
+    """
+    from result_cache import file_fingerprint
+
+    header = read_header(path)
+    if header is None:
+        return False
+    fingerprint = file_fingerprint(source)
+    return fingerprint == "missing" or header["source"] == fingerprint
+
+
+class CompactVectorizer:
+    """TfidfVectorizer.transform over the compact vocabulary table."""
+
+    def __init__(self, header, buffer, arrays):
+        spec = header["vectorizer"]
+        self.n_features = header["n_features"]
+        self.vocabulary_key = header["vocabulary_key"]
+        self.lowercase = spec["lowercase"]
+        self.ngram_range = tuple(spec["ngram_range"])
+        self.stop_words = frozenset(spec["stop_words"]) if spec["stop_words"] is not None else None
+        self.binary = spec["binary"]
+        self.dtype = np.dtype(spec["dtype"])
+        self.tfidf = spec["tfidf"]
+        self.norm = spec.get("norm")
+        self.sublinear_tf = spec.get("sublinear_tf", False)
+        self.idf_ = arrays.get("idf")
+        self._findall = re.compile(spec["token_pattern"]).findall
+        self._buffer = buffer
+        self._terms_start = header["data_start"] + header["arrays"]["terms"]["offset"]
+        self._hashes = arrays["term_hashes"]
+        self._columns = arrays["term_columns"]
+        self._offsets = arrays["term_offsets"]
+
+    def _analyze(self, doc):
+        # CountVectorizer's word analyzer: preprocess, tokenize, stop words, n-grams
+        if self.lowercase:
+            doc = doc.lower()
+        tokens = self._findall(doc)
+        if self.stop_words is not None:
+            tokens = [w for w in tokens if w not in self.stop_words]
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        original = tokens
+        if min_n == 1:
+            tokens = list(original)
+            min_n += 1
+        else:
+            tokens = []
+        for n in range(min_n, min(max_n + 1, len(original) + 1)):
+            for i in range(len(original) - n + 1):
+                tokens.append(" ".join(original[i:i + n]))
+        return tokens
+
+    def _term(self, i):
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._buffer[self._terms_start + start:self._terms_start + end]
+
+    def lookup(self, terms):
+        """Column of each term, -1 for terms not in the vocabulary."""
+        encoded = [t.encode("utf-8") for t in terms]
+        hashes = _term_hashes(encoded)
+        columns = np.full(len(encoded), -1, dtype=np.int64)
+        if not len(self._hashes) or not len(encoded):
+            return columns
+
+        pos = np.minimum(np.searchsorted(self._hashes, hashes), len(self._hashes) - 1)
+        found = np.flatnonzero(self._hashes[pos] == hashes)
+        base = self._terms_start
+        starts = (base + self._offsets[pos[found]]).tolist()
+        ends = (base + self._offsets[pos[found] + 1]).tolist()
+        same = np.array([self._buffer[a:b] == encoded[i] for i, a, b in zip(found.tolist(), starts, ends)],
+                        dtype=bool)
+        columns[found[same]] = self._columns[pos[found[same]]]
+
+        # The first term with this hash was a different one: try the rest of its run
+        for i in found[~same].tolist():
+            p = pos[i] + 1
+            while p < len(self._hashes) and self._hashes[p] == hashes[i]:
+                if self._term(p) == encoded[i]:
+                    columns[i] = self._columns[p]
+                    break
+                p += 1
+        return columns
+
+    def transform(self, raw_documents):
+        import scipy.sparse as sp
+
+        counts = [Counter(self._analyze(doc)) for doc in raw_documents]
+        # One lookup for every (document, term) pair of the batch
+        columns = self.lookup([term for doc_counts in counts for term in doc_counts])
+        values = np.fromiter((n for doc_counts in counts for n in doc_counts.values()),
+                             dtype=np.int64, count=len(columns))
+        rows = np.repeat(np.arange(len(counts)), [len(doc_counts) for doc_counts in counts])
+        known = columns >= 0
+
+        indptr = np.zeros(len(counts) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(rows[known], minlength=len(counts)), out=indptr[1:])
+        X = sp.csr_matrix(
+            (values[known].astype(self.dtype), columns[known].astype(np.int32), indptr),
+            shape=(len(counts), self.n_features),
+        )
+        X.sort_indices()
+        if self.binary:
+            X.data.fill(1)
+        if self.tfidf:
+            X = self._tfidf(X)
+        return X
+
+    def _tfidf(self, X):
+        # TfidfTransformer.transform followed by sklearn's row normalisation;
+        # the per-row sum runs left to right like sklearn's, so results match bit for bit
+        if X.dtype not in (np.float64, np.float32):
+            X = X.astype(np.float64)
+        if self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        if self.idf_ is not None:
+            X.data *= self.idf_[X.indices]
+        if self.norm is not None:
+            parts = np.abs(X.data) if self.norm == "l1" else X.data * X.data
+            for row in range(X.shape[0]):
+                start, end = X.indptr[row], X.indptr[row + 1]
+                if start == end:
+                    continue
+                total = np.cumsum(parts[start:end])[-1]
+                if total == 0.0:
+                    continue
+                X.data[start:end] /= np.sqrt(total) if self.norm == "l2" else total
+        return X
+
+
+class CompactClassifier:
+    """predict_proba of the exported LogisticRegression/SGDClassifier or MultinomialNB."""
+
+    def __init__(self, header, arrays):
+        spec = header["model"]
+        self.kind = spec["kind"]
+        self.classes_ = np.array(spec["classes"])
+        self.version = header["model_version"]
+        self._arrays = arrays
+
+    def predict_proba(self, X):
+        if self.kind == "linear":
+            from scipy.special import expit
+
+            prob = (X @ self._arrays["coef"] + self._arrays["intercept"]).reshape(-1)
+            prob = expit(prob, out=prob)
+            return np.stack([1 - prob, prob], axis=1)
+
+        # MultinomialNB: joint log likelihood, normalised with sklearn's logsumexp
+        jll = X @ self._arrays["feature_log_prob"].T + self._arrays["class_log_prior"]
+        top = jll.max(axis=1, keepdims=True)
+        is_top = jll == top
+        rest = np.where(is_top, -np.inf, jll)
+        m = is_top.sum(axis=1, keepdims=True, dtype=jll.dtype)
+        s = np.exp(rest - np.where(np.isfinite(top), top, 0)).sum(axis=1, keepdims=True)
+        s = np.where(s == 0, s, s / m)
+        log_prob_x = np.log1p(s) + np.log(m) + top
+        return np.exp(jll - log_prob_x)
+
+
+def load(path):
+    """Map a compact model file; returns (vectorizer, model) like the pickle's."""
+    header = read_header(path)
+    if header is None:
+        raise ValueError(f"{path} is not a compact model file (format {FORMAT_VERSION})")
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                     offset=header["data_start"] + spec["offset"]).reshape(spec["shape"])
+
+    return CompactVectorizer(header, buffer, arrays), CompactClassifier(header, arrays)
@@ -1,29 +1,296 @@
-import pandas as pd
+import argparse
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from metrics import peak_memory_mb  # noqa: E402
+
+# Streams a labelled CSV in chunks: drops rows without text or a valid label,
+# strips the text, then drops exact duplicates (same text after lowercasing
+# and collapsing whitespace) and, optionally, near-duplicates found with
+# MinHash signatures over character shingles and LSH banding. The first
+# occurrence of a text is kept, whichever label the copies carry. Other
+# columns are passed through unchanged.
+#
+#     python csv_management/clean_csv.py                        # data/train.csv -> data/train_cleaned.csv
+#     python csv_management/clean_csv.py --workers 4 --threshold 0.85
+#     python csv_management/clean_csv.py --no-near-dup          # exact duplicates only
+
+LABELS = ["ai", "human"]
+CHUNKSIZE = 50000
+# Estimated Jaccard similarity of shingle sets at which a text is a near-duplicate
+THRESHOLD = 0.8
+NUM_PERM = 64
+SHINGLE_CHARS = 5
+
+_MERSENNE = np.uint64((1 << 31) - 1)
+_SIGNATURE_BATCH = 256
+
+
+def normalize(texts):
+    """Lowercased texts with runs of whitespace collapsed, for comparing content."""
+    return texts.str.lower().str.replace(r"\s+", " ", regex=True)
+
+
+def content_hashes(texts, normalized=False):
+    """64-bit hash per text after normalize() (skipped when the texts already are)."""
+    if not normalized:
+        texts = normalize(texts)
+    return pd.util.hash_pandas_object(texts, index=False).to_numpy()
+
+
+def _permutations(num_perm, seed=1):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, int(_MERSENNE), size=num_perm).astype(np.uint64)
+    b = rng.randint(0, int(_MERSENNE), size=num_perm).astype(np.uint64)
+    return a[:, None], b[:, None]
+
+
+def _signature(text, a, b, shingle_chars):
+    cp = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32).astype(np.uint64)
+    if len(cp) == 0:
+        return np.full(len(a), int(_MERSENNE), dtype=np.uint32)
+    k = min(shingle_chars, len(cp))
+    # Polynomial hash of every k-character window, reduced below the prime
+    h = np.zeros(len(cp) - k + 1, dtype=np.uint64)
+    for j in range(k):
+        h = h * np.uint64(1000003) + cp[j:len(cp) - k + 1 + j]
+    shingles = np.unique(h % _MERSENNE)
+
+    signature = np.full(len(a), int(_MERSENNE), dtype=np.uint64)
+    # Bounded temporaries for very long texts
+    for start in range(0, len(shingles), 8192):
+        part = shingles[None, start:start + 8192]
+        signature = np.minimum(signature, ((a * part + b) % _MERSENNE).min(axis=1))
+    return signature.astype(np.uint32)
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, shingle_chars=SHINGLE_CHARS):
+    """(len(texts), num_perm) MinHash signatures of the texts' character shingles."""
+    a, b = _permutations(num_perm)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for i, text in enumerate(texts):
+        signatures[i] = _signature(text, a, b, shingle_chars)
+    return signatures
+
+
+def lsh_bands(num_perm, threshold):
+    """Bands for LSH banding of num_perm signatures.
+
+    Candidates are verified against the signatures afterwards, so the band
+    count is chosen for an LSH threshold a little below `threshold`, which
+    trades a few more checks for fewer missed duplicates.
+    """
+    target = max(threshold - 0.1, 0.05)
+    options = [b for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda b: abs((1 / b) ** (b / num_perm) - target))
+
+
+class NearDuplicateIndex:
+    """LSH index over MinHash signatures of every text added so far.
+
+    Only texts that were first to have some band hash can be a candidate
+    later, so only their signatures are kept, in one array that grows by
+    doubling.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, threshold=THRESHOLD):
+        self.num_perm = num_perm
+        self.threshold = threshold
+        self.bands = lsh_bands(num_perm, threshold)
+        self.rows = num_perm // self.bands
+        # Per band: sorted band hashes, and the stored signature of the first text that had each one
+        self._keys = [np.empty(0, dtype=np.uint64) for _ in range(self.bands)]
+        self._owners = [np.empty(0, dtype=np.int64) for _ in range(self.bands)]
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._stored = 0
+        self._mix = np.random.RandomState(2).randint(1, 2 ** 62, size=self.rows, dtype=np.int64).astype(np.uint64) | 1
+
+    def _band_hashes(self, signatures):
+        bands = signatures.astype(np.uint64).reshape(len(signatures), self.bands, self.rows)
+        return (bands * self._mix).sum(axis=2)
+
+    def _store(self, signatures):
+        """Keep signatures; returns their row numbers in the stored array."""
+        end = self._stored + len(signatures)
+        if end > len(self._signatures):
+            grown = np.empty((max(end, 2 * len(self._signatures)), self.num_perm), dtype=np.uint32)
+            grown[:self._stored] = self._signatures[:self._stored]
+            self._signatures = grown
+        self._signatures[self._stored:end] = signatures
+        slots = np.arange(self._stored, end)
+        self._stored = end
+        return slots
+
+    def add(self, signatures):
+        """Index a chunk of signatures; True for each one that near-duplicates an earlier text."""
+        n = len(signatures)
+        band_hashes = self._band_hashes(signatures)
+        # For each text and band, the stored signature of the earlier text that
+        # first had the same band hash, or -1
+        candidates = np.full((n, self.bands), -1, dtype=np.int64)
+        owner = np.zeros(n, dtype=bool)
+        bands = []
+
+        for band in range(self.bands):
+            keys = band_hashes[:, band]
+            owners = self._owners[band]
+            if len(owners):
+                pos = np.minimum(np.searchsorted(self._keys[band], keys), len(owners) - 1)
+                seen = self._keys[band][pos] == keys
+                candidates[seen, band] = owners[pos[seen]]
+
+            # Earlier texts of the same chunk; these are always first with their band hash
+            codes, uniques = pd.factorize(keys)
+            _, first = np.unique(codes, return_index=True)
+            first_in_chunk = first[codes]
+            within = (candidates[:, band] < 0) & (first_in_chunk < np.arange(n))
+            new = candidates[first, band] < 0
+            owner[first[new]] = True
+            bands.append((within, first_in_chunk, uniques, first, new))
+
+        slots = np.full(n, -1, dtype=np.int64)
+        slots[owner] = self._store(signatures[owner])
+
+        for band, (within, first_in_chunk, uniques, first, new) in enumerate(bands):
+            candidates[within, band] = slots[first_in_chunk[within]]
+
+            # Remember the first text for each new band hash
+            new_keys = uniques.astype(np.uint64)[new] if len(uniques) else np.empty(0, dtype=np.uint64)
+            merged_keys = np.concatenate([self._keys[band], new_keys])
+            merged_owners = np.concatenate([self._owners[band], slots[first[new]]])
+            order = np.argsort(merged_keys, kind="stable")
+            self._keys[band] = merged_keys[order]
+            self._owners[band] = merged_owners[order]
+
+        # Verify candidates band by band, skipping texts already found to be duplicates
+        duplicate = np.zeros(n, dtype=bool)
+        for band in range(self.bands):
+            rows = np.nonzero((candidates[:, band] >= 0) & ~duplicate)[0]
+            if len(rows):
+                others = self._signatures[candidates[rows, band]]
+                similarity = (signatures[rows] == others).mean(axis=1)
+                duplicate[rows[similarity >= self.threshold]] = True
+        return duplicate
+
+
+class SeenHashes:
+    """Set of 64-bit content hashes kept as one sorted array."""
+
+    def __init__(self):
+        self._hashes = np.empty(0, dtype=np.uint64)
+
+    def add(self, hashes):
+        """Add a chunk of hashes; True for each one seen before (earlier chunk or row)."""
+        pos = np.minimum(np.searchsorted(self._hashes, hashes), max(len(self._hashes) - 1, 0))
+        seen = self._hashes[pos] == hashes if len(self._hashes) else np.zeros(len(hashes), dtype=bool)
+        seen |= pd.Series(hashes).duplicated().to_numpy()
+        self._hashes = np.sort(np.concatenate([self._hashes, np.unique(hashes[~seen])]), kind="stable")
+        return seen
+
+
+def _signature_batches(executor, texts, num_perm, shingle_chars):
+    batches = [texts[i:i + _SIGNATURE_BATCH] for i in range(0, len(texts), _SIGNATURE_BATCH)]
+    if executor is None:
+        parts = [minhash_signatures(batch, num_perm, shingle_chars) for batch in batches]
+    else:
+        parts = list(executor.map(minhash_signatures, batches, [num_perm] * len(batches),
+                                  [shingle_chars] * len(batches)))
+    return np.concatenate(parts) if parts else np.empty((0, num_perm), dtype=np.uint32)
+
 
-def clean_csv(input_path, output_path):
+def clean_csv(input_path, output_path, chunksize=CHUNKSIZE, near_dup=True, threshold=THRESHOLD,
+              num_perm=NUM_PERM, shingle_chars=SHINGLE_CHARS, workers=1):
+    """Stream input_path to output_path without invalid rows and duplicates; returns the statistics."""
     try:
-        df = pd.read_csv(input_path)
+        started = time.time()
+        stats = {"read": 0, "invalid": 0, "kept": 0,
+                 "exact": dict.fromkeys(LABELS, 0), "near": dict.fromkeys(LABELS, 0)}
+        exact_index = SeenHashes()
+        near_index = NearDuplicateIndex(num_perm, threshold) if near_dup else None
+        executor = ProcessPoolExecutor(max_workers=workers) if near_dup and workers > 1 else None
 
-        df.dropna(subset=["text", "label"], inplace=True)
+        tmp_path = output_path + ".tmp"
+        try:
+            with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+                header = True
+                # Every column is kept as text; only text and label are checked
+                for chunk in pd.read_csv(input_path, chunksize=chunksize, dtype=str,
+                                         keep_default_na=False, na_values=[""]):
+                    if not {"text", "label"} <= set(chunk.columns):
+                        raise ValueError("CSV must contain 'text' and 'label' columns.")
+                    rows = len(chunk)
+                    stats["read"] += rows
+                    chunk = chunk.dropna(subset=["text", "label"])
+                    chunk = chunk[chunk["label"].isin(LABELS)]
+                    chunk = chunk.assign(text=chunk["text"].str.strip())
+                    chunk = chunk[chunk["text"].str.len() > 0]
+                    stats["invalid"] += rows - len(chunk)
 
-        df = df[df["text"].apply(lambda x: isinstance(x, str))]
+                    normalized = normalize(chunk["text"])
+                    exact = exact_index.add(content_hashes(normalized, normalized=True))
+                    for label, count in chunk["label"][exact].value_counts().items():
+                        stats["exact"][label] += int(count)
+                    chunk, normalized = chunk[~exact], normalized[~exact]
 
-        df = df[df["label"].isin(["ai", "human"])]
+                    if near_index is not None and len(chunk):
+                        near = near_index.add(_signature_batches(executor, normalized.tolist(), num_perm, shingle_chars))
+                        for label, count in chunk["label"][near].value_counts().items():
+                            stats["near"][label] += int(count)
+                        chunk = chunk[~near]
 
-        df["text"] = df["text"].apply(lambda x: x.strip())
+                    chunk.to_csv(out, header=header, index=False)
+                    header = False
+                    stats["kept"] += len(chunk)
+                    elapsed = time.time() - started
+                    print(f"\r  {stats['read']} rows read, {stats['kept']} kept, "
+                          f"{stats['read'] / max(elapsed, 1e-9):.0f} rows/sec", end="", flush=True)
+            os.replace(tmp_path, output_path)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        print()
 
-        df.to_csv(output_path, index=False)
+        stats["seconds"] = time.time() - started
+        stats["peak_mb"] = peak_memory_mb()
         print(f"Cleaned data saved to: {output_path}")
-        print(f"Remaining rows: {len(df)}")
+        print(f"Remaining rows: {stats['kept']} of {stats['read']} "
+              f"({stats['read'] / max(stats['seconds'], 1e-9):.0f} rows/sec)")
+        print(f"Dropped without text or a valid label: {stats['invalid']}")
+        print("Duplicates dropped:")
+        for label in LABELS:
+            near_count = stats["near"][label] if near_dup else "-"
+            print(f"   - {label.upper()}: {stats['exact'][label]} exact, {near_count} near")
+        if stats["peak_mb"] is not None:
+            print(f"Peak memory: {stats['peak_mb']:.0f} MB")
+        return stats
 
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    INPUT_PATH = os.path.join(ROOT_DIR, "data", "train.csv")
+    OUTPUT_PATH = os.path.join(ROOT_DIR, "data", "train_cleaned.csv")
 
-    INPUT_PATH = os.path.join(BASE_DIR, "data", "train.csv")
-    OUTPUT_PATH = os.path.join(BASE_DIR, "data", "train_cleaned.csv")
+    parser = argparse.ArgumentParser(description="Clean and deduplicate a labelled CSV, streaming it in chunks.")
+    parser.add_argument("input", nargs="?", default=INPUT_PATH)
+    parser.add_argument("output", nargs="?", default=OUTPUT_PATH)
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="rows read at a time")
+    parser.add_argument("--no-near-dup", action="store_true", help="only drop exact duplicates")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="shingle similarity at which texts count as near-duplicates")
+    parser.add_argument("--num-perm", type=int, default=NUM_PERM, help="MinHash permutations per text")
+    parser.add_argument("--shingle", type=int, default=SHINGLE_CHARS, help="characters per shingle")
+    parser.add_argument("--workers", type=int, default=1, help="processes computing MinHash signatures")
+    args = parser.parse_args()
 
-    clean_csv(INPUT_PATH, OUTPUT_PATH)
+    clean_csv(args.input, args.output, args.chunksize, not args.no_near_dup, args.threshold,
+              args.num_perm, args.shingle, args.workers)
@@ -1,23 +1,56 @@
+import argparse
+import os
+import sys
+import time
 import pandas as pd
+from clean_csv import CHUNKSIZE, LABELS, SeenHashes, content_hashes
 
-def count_labels(csv_path):
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from metrics import peak_memory_mb  # noqa: E402
+
+def count_labels(csv_path, chunksize=CHUNKSIZE):
+    """Count rows per label in chunks, along with exact duplicate texts per label."""
     try:
-        df = pd.read_csv(csv_path)
+        started = time.time()
+        total = 0
+        label_counts = pd.Series(dtype="int64")
+        duplicate_counts = pd.Series(dtype="int64")
+        seen = SeenHashes()
+
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str):
+            if 'label' not in chunk.columns:
+                raise ValueError("CSV must contain a 'label' column.")
 
-        if 'label' not in df.columns:
-            raise ValueError("CSV must contain a 'label' column.")
+            total += len(chunk)
+            label_counts = label_counts.add(chunk['label'].value_counts(), fill_value=0)
 
-        label_counts = df['label'].value_counts()
+            if 'text' in chunk.columns:
+                chunk = chunk.dropna(subset=['text'])
+                duplicate = seen.add(content_hashes(chunk['text'].str.strip()))
+                duplicate_counts = duplicate_counts.add(chunk['label'][duplicate].value_counts(), fill_value=0)
+
+        elapsed = time.time() - started
 
         print("Label distribution:")
-        for label in ['ai', 'human']:
-            count = label_counts.get(label, 0)
-            print(f"   - {label.upper()}: {count} rows")
+        for label in LABELS:
+            count = int(label_counts.get(label, 0))
+            duplicates = int(duplicate_counts.get(label, 0))
+            print(f"   - {label.upper()}: {count} rows ({duplicates} exact duplicates)")
 
-        print(f"Total rows: {len(df)}")
+        print(f"Total rows: {total} ({total / max(elapsed, 1e-9):.0f} rows/sec)")
+        peak_mb = peak_memory_mb()
+        if peak_mb is not None:
+            print(f"Peak memory: {peak_mb:.0f} MB")
 
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    count_labels("data/train.csv") 
+    parser = argparse.ArgumentParser(description="Count rows and duplicate texts per label, streaming the CSV.")
+    parser.add_argument("csv_path", nargs="?", default="data/train.csv")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="rows read at a time")
+    args = parser.parse_args()
+
+    count_labels(args.csv_path, args.chunksize)
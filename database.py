@@ -1,20 +1,124 @@
+import os
 import sqlite3
+import threading
+import time
 import uuid
 import bcrypt
 from datetime import datetime
+import metrics
 DB_NAME = "db/data_database.db"
 
+# Characters of input text stored separately for list views
+PREVIEW_CHARS = 120
+HISTORY_PAGE_SIZE = 200
+
+# bcrypt work factor for new and rehashed passwords; each +1 doubles the time.
+# Pick one for your hardware with: python database.py --calibrate-bcrypt
+BCRYPT_ROUNDS = int(os.environ.get("TAUTHY_BCRYPT_ROUNDS", 12))
+
+# Wait this long for another writer (thread or app instance) to release the lock
+BUSY_TIMEOUT = 10.0
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",       # readers never block the writer
+    "PRAGMA synchronous = NORMAL",     # fsync at checkpoints, not on every commit
+    "PRAGMA cache_size = -32000",      # 32 MB page cache
+    "PRAGMA mmap_size = 268435456",    # map up to 256 MB of the file
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Thai vowel and tone marks are category Mn; without M* the default
+# unicode61 tokenizer would split words at every mark
+FTS_TOKENIZER = "unicode61 categories 'L* N* Co M*'"
+_FTS_INSERT = "INSERT INTO history_fts (hs_id, user_id, tokens, subwords) VALUES (?, ?, ?, ?)"
+# Shorter Thai word suffixes are too common to be worth indexing
+SUBWORD_MIN_CHARS = 2
+
+_local = threading.local()
+_migrated = set()
+_migrate_lock = threading.Lock()
+
 def get_db_connection():
-    """Connect to the SQLite database."""
-    conn = sqlite3.connect(DB_NAME)
+    """Return this thread's persistent connection to the SQLite database."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == DB_NAME:
+        return conn
+
+    conn = sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT)
     conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+
+    with _migrate_lock:
+        if DB_NAME not in _migrated:
+            migrate(conn)
+            _migrated.add(DB_NAME)
+
+    _local.conn = conn
+    _local.path = DB_NAME
     return conn
 
-def init_db():
-    """Initialize the database and create tables if they don't exist."""
-    conn = get_db_connection()
-    cur = conn.cursor()
+def close_db_connection():
+    """Close this thread's connection (it is reopened on next use)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def search_tokens(text):
+    """Space-separated word tokens for the full-text index.
+
+    Uses the same pythainlp normalisation and tokenizer as ai_checker, but
+    keeps vowel and tone marks, digits and stopwords, which matter for
+    finding a specific entry. Punctuation is left for FTS5 to drop.
+    """
+    from pythainlp.util import normalize
+    from thai_tokenizer import tokenize
 
+    text = " ".join(normalize(text or "").lower().split())
+    if not text:
+        return ""
+    return " ".join(t for t in tokenize([text]) if not t.isspace())
+
+def search_subwords(tokens):
+    """Thai sub-words of search_tokens() output, for matching inside words.
+
+    The tokenizer keeps compounds such as ไปเที่ยว whole, so the index also
+    holds every suffix of a Thai word that starts at a character cluster
+    boundary (เที่ยว). With search_history's prefix queries, any part of a
+    word that starts on a cluster boundary is found.
+    """
+    from language_id import has_thai
+    from pythainlp.tokenize import subword_tokenize
+
+    subwords = {}
+    for token in tokens.split():
+        if not has_thai(token):
+            continue
+        clusters = subword_tokenize(token, engine="tcc")
+        for i in range(1, len(clusters)):
+            suffix = "".join(clusters[i:])
+            if len(suffix) >= SUBWORD_MIN_CHARS:
+                subwords[suffix] = None
+    return " ".join(subwords)
+
+def search_index_row(hs_id, user_id, text):
+    """The history_fts row for a history entry."""
+    tokens = search_tokens(text)
+    return hs_id, user_id, tokens, search_subwords(tokens)
+
+def _unindexed_history(cur):
+    return cur.execute('''
+        SELECT hs_id, user_id, hs_input_text FROM history
+        WHERE hs_id NOT IN (SELECT hs_id FROM history_fts)
+    ''').fetchall()
+
+# ==============================
+# SCHEMA MIGRATIONS
+# ==============================
+
+def _migration_base_tables(cur):
+    """Create the users and history tables."""
     cur.execute('''
         CREATE TABLE IF NOT EXISTS users (
             user_id TEXT PRIMARY KEY,
@@ -40,19 +144,143 @@ def init_db():
         );
     ''')
 
-    conn.commit()
-    conn.close()
+def _migration_feedback_tracking(cur):
+    """Track when feedback was given and log incremental model updates.
+
+    hs_feedback_seq numbers verdicts in the order they were given; unlike
+    the one-second hs_feedback_at it never ties or goes backwards, so it is
+    the model's checkpoint.
+    """
+    # Databases created by init_db after feedback tracking was added already have it
+    columns = [row['name'] for row in cur.execute("PRAGMA table_info(history)")]
+    if 'hs_feedback_at' not in columns:
+        cur.execute("ALTER TABLE history ADD COLUMN hs_feedback_at DATETIME")
+        cur.execute('''
+            UPDATE history SET hs_feedback_at = hs_created_at
+            WHERE hs_user_feedback IS NOT NULL
+        ''')
+    if 'hs_feedback_seq' not in columns:
+        cur.execute("ALTER TABLE history ADD COLUMN hs_feedback_seq INTEGER")
+        cur.execute('''
+            UPDATE history SET hs_feedback_seq = rowid
+            WHERE hs_user_feedback IS NOT NULL
+        ''')
+
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS model_updates (
+            mu_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mu_version INTEGER NOT NULL,
+            mu_rows INTEGER NOT NULL,
+            mu_duration REAL NOT NULL,
+            mu_created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+
+def _migration_history_indexes(cur):
+    """Index the history lookups: per-user listing and the feedback checkpoint scan."""
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_user_created
+        ON history (user_id, hs_created_at DESC)
+    ''')
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_feedback
+        ON history (hs_feedback_seq)
+    ''')
+
+def _migration_history_preview(cur):
+    """Store a short preview so history lists never read the full input text."""
+    cur.execute("ALTER TABLE history ADD COLUMN hs_preview TEXT")
+    cur.execute(f"UPDATE history SET hs_preview = substr(hs_input_text, 1, {PREVIEW_CHARS})")
+
+    # hs_id breaks ties between entries saved in the same second, so the
+    # keyset pagination order has to be fully covered by the index
+    cur.execute("DROP INDEX IF EXISTS idx_history_user_created")
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_user_page
+        ON history (user_id, hs_created_at DESC, hs_id DESC)
+    ''')
+
+def _migration_history_search(cur):
+    """Full-text index over history input text.
+
+    user_id is indexed too, so a search intersects with the user's own
+    entries inside FTS5 instead of ranking every user's matches.
+
+    The index is written by save_input rather than by triggers: a trigger
+    calling search_tokens would break every write from a connection that
+    has not registered it (the sqlite3 shell, backup scripts) and tokenise
+    inside the write transaction. Deleting an entry removes its index row;
+    changing its text outside the app only drops the stale row, and
+    reindex_history() indexes it again.
+    """
+    cur.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+            hs_id UNINDEXED,
+            user_id,
+            tokens,
+            subwords,
+            tokenize = "{FTS_TOKENIZER}"
+        )
+    ''')
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+            DELETE FROM history_fts WHERE hs_id = old.hs_id;
+        END
+    ''')
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS history_fts_unindex AFTER UPDATE OF hs_input_text ON history BEGIN
+            DELETE FROM history_fts WHERE hs_id = old.hs_id;
+        END
+    ''')
+    cur.executemany(_FTS_INSERT, [search_index_row(*row) for row in _unindexed_history(cur)])
+
+def _migration_llm_status(cur):
+    """Record what happened to the Ollama stage of each analysis (see cascade.py)."""
+    cur.execute("ALTER TABLE history ADD COLUMN hs_llm_status TEXT")
+
+# Applied in order; PRAGMA user_version records how many have run.
+# Only ever append to this list.
+MIGRATIONS = [
+    _migration_base_tables,
+    _migration_feedback_tracking,
+    _migration_history_indexes,
+    _migration_history_preview,
+    _migration_history_search,
+    _migration_llm_status,
+]
+
+def migrate(conn):
+    """Bring the schema up to date; safe to run from several app instances at once."""
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+        for i, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(cur)
+            cur.execute(f"PRAGMA user_version = {i}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def init_db():
+    """Initialize the database and create tables if they don't exist."""
+    migrate(get_db_connection())
 
 # ==============================
 # USER FUNCTIONS
 # ==============================
 
-def hash_password(password):
+def hash_password(password, rounds=None):
     """Hash password using bcrypt."""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed
 
+def hash_rounds(hashed_password):
+    """Work factor a bcrypt hash was made with ($2b$<rounds>$...)."""
+    return int(hashed_password.split(b'$')[2])
+
 def verify_password(password, hashed_password):
     """Verify password against hashed password."""
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
@@ -60,87 +288,270 @@ def verify_password(password, hashed_password):
 def create_user(firstname, lastname, username, password, email=None):
     """Register a new user."""
     conn = get_db_connection()
-    cur = conn.cursor()
 
     user_id = str(uuid.uuid4())
     hashed_pw = hash_password(password)
 
     try:
-        cur.execute('''
-            INSERT INTO users (user_id, user_username, user_password, user_firstname, user_lastname, user_email)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, username, hashed_pw, firstname, lastname, email))
-
-        conn.commit()
+        with conn:
+            conn.execute('''
+                INSERT INTO users (user_id, user_username, user_password, user_firstname, user_lastname, user_email)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, username, hashed_pw, firstname, lastname, email))
         return True, "User registered successfully."
 
     except sqlite3.IntegrityError:
         return False, "Username already exists."
 
-    finally:
-        conn.close()
-
 def login(username, password):
     """Login user and return user data if success."""
     conn = get_db_connection()
-    cur = conn.cursor()
 
-    cur.execute('''
+    user = conn.execute('''
         SELECT * FROM users WHERE user_username = ?
-    ''', (username,))
-
-    user = cur.fetchone()
-    conn.close()
+    ''', (username,)).fetchone()
 
     if user and verify_password(password, user['user_password']):
-        return True, dict(user)
+        user = dict(user)
+        # Upgrade (or downgrade) the stored hash once BCRYPT_ROUNDS changes;
+        # this is the only time the plain password is available
+        if hash_rounds(user['user_password']) != BCRYPT_ROUNDS:
+            user['user_password'] = hash_password(password)
+            with conn:
+                conn.execute('''
+                    UPDATE users SET user_password = ? WHERE user_id = ?
+                ''', (user['user_password'], user['user_id']))
+        return True, user
     else:
         return False, "Invalid username or password."
 
 
-def save_input(user_id, input_text, result_ai, result_human):
-    """Save input data along with prediction results."""
+@metrics.timed("db.save_input")
+def save_input(user_id, input_text, result_ai, result_human, llm_status=None):
+    """Save input data along with prediction results and the Ollama stage's status."""
     conn = get_db_connection()
-    cur = conn.cursor()
 
     hs_id = str(uuid.uuid4())
+    # Tokenised before the transaction so the write lock is held briefly
+    index_row = search_index_row(hs_id, user_id, input_text)
 
-    cur.execute('''
-        INSERT INTO history (hs_id, user_id, hs_input_text, hs_result_ai, hs_result_human)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (hs_id, user_id, input_text, result_ai, result_human))
+    with conn:
+        conn.execute('''
+            INSERT INTO history (hs_id, user_id, hs_input_text, hs_preview, hs_result_ai, hs_result_human,
+                                 hs_llm_status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (hs_id, user_id, input_text, input_text[:PREVIEW_CHARS], result_ai, result_human, llm_status))
+        conn.execute(_FTS_INSERT, index_row)
 
-    conn.commit()
-    conn.close()
+    return hs_id
+
+@metrics.timed("db.update_llm_status")
+def update_llm_status(hs_id, status):
+    """Record how the Ollama stage of an analysis ended."""
+    conn = get_db_connection()
 
-    return hs_id 
+    with conn:
+        conn.execute('''
+            UPDATE history SET hs_llm_status = ? WHERE hs_id = ?
+        ''', (status, hs_id))
 
+@metrics.timed("db.update_feedback")
 def update_feedback(hs_id, feedback):
     """Update user feedback for specific input."""
     conn = get_db_connection()
-    cur = conn.cursor()
-
-    cur.execute('''
-        UPDATE history
-        SET hs_user_feedback = ?
-        WHERE hs_id = ?
-    ''', (feedback, hs_id))
 
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute('''
+            UPDATE history
+            SET hs_user_feedback = ?, hs_feedback_at = CURRENT_TIMESTAMP,
+                hs_feedback_seq = (SELECT COALESCE(MAX(hs_feedback_seq), 0) + 1 FROM history)
+            WHERE hs_id = ?
+        ''', (feedback, hs_id))
 
+@metrics.timed("db.get_user_history")
 def get_user_history(user_id):
     """Get all input history for a specific user."""
     conn = get_db_connection()
-    cur = conn.cursor()
 
-    cur.execute('''
+    results = conn.execute('''
         SELECT * FROM history
         WHERE user_id = ?
         ORDER BY hs_created_at DESC
-    ''', (user_id,))
+    ''', (user_id,)).fetchall()
+
+    return [dict(row) for row in results]
+
+@metrics.timed("db.get_history_page")
+def get_history_page(user_id, after=None, limit=HISTORY_PAGE_SIZE):
+    """Get one page of a user's history, newest first, without the full input text.
+
+    `after` is the (hs_created_at, hs_id) of the last row of the previous
+    page; None starts from the newest entry.
+    """
+    conn = get_db_connection()
+
+    query = '''
+        SELECT hs_id, hs_created_at, hs_preview, hs_result_ai, hs_result_human, hs_user_feedback
+        FROM history
+        WHERE user_id = ?
+    '''
+    params = [user_id]
+    if after is not None:
+        query += " AND (hs_created_at, hs_id) < (?, ?)"
+        params += list(after)
+    query += " ORDER BY hs_created_at DESC, hs_id DESC LIMIT ?"
+    params.append(limit)
+
+    results = conn.execute(query, params).fetchall()
+
+    return [dict(row) for row in results]
+
+@metrics.timed("db.get_history_entry")
+def get_history_entry(hs_id):
+    """Get one history entry including its full input text."""
+    conn = get_db_connection()
+
+    row = conn.execute('''
+        SELECT * FROM history WHERE hs_id = ?
+    ''', (hs_id,)).fetchone()
+
+    return dict(row) if row else None
+
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+@metrics.timed("db.search_history")
+def search_history(user_id, query, limit=HISTORY_PAGE_SIZE, offset=0):
+    """Search a user's history, best match first; same columns as get_history_page.
+
+    Every space-separated word of the query has to appear in the entry;
+    Thai words the tokenizer splits further must appear as a phrase. The
+    last token of each phrase also matches longer words, and Thai words
+    also match inside compounds (see search_subwords), so partial words
+    are found. Returns an empty list when the query has no searchable words.
+    """
+    phrases = [search_tokens(word) for word in query.split()]
+    phrases = [f"{{tokens subwords}} : {_fts_phrase(p)}*" for p in phrases if p]
+    if not phrases:
+        return []
+    match = f"user_id : {_fts_phrase(user_id)} AND {' AND '.join(phrases)}"
+
+    conn = get_db_connection()
 
-    results = cur.fetchall()
-    conn.close()
+    results = conn.execute('''
+        SELECT h.hs_id, h.hs_created_at, h.hs_preview, h.hs_result_ai, h.hs_result_human, h.hs_user_feedback
+        FROM (
+            SELECT hs_id, rank FROM history_fts
+            WHERE history_fts MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+        ) AS f
+        JOIN history h ON h.hs_id = f.hs_id
+        ORDER BY f.rank
+    ''', (match, limit, offset)).fetchall()
 
     return [dict(row) for row in results]
+
+# ==============================
+# MODEL UPDATE FUNCTIONS
+# ==============================
+
+def get_feedback_since(after_seq=0, limit=None):
+    """Get feedback rows given after the hs_feedback_seq checkpoint, oldest first."""
+    conn = get_db_connection()
+
+    query = '''
+        SELECT hs_id, hs_input_text, hs_user_feedback, hs_feedback_seq FROM history
+        WHERE hs_feedback_seq > ? AND hs_user_feedback IN ('ai', 'human')
+        ORDER BY hs_feedback_seq
+    '''
+    params = [after_seq]
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    results = conn.execute(query, params).fetchall()
+
+    return [dict(row) for row in results]
+
+def count_feedback_since(after_seq=0):
+    """Count feedback rows given after the hs_feedback_seq checkpoint."""
+    conn = get_db_connection()
+
+    row = conn.execute('''
+        SELECT COUNT(*) FROM history
+        WHERE hs_feedback_seq > ? AND hs_user_feedback IN ('ai', 'human')
+    ''', (after_seq,)).fetchone()
+
+    return row[0]
+
+def record_model_update(version, rows, duration):
+    """Log an incremental model update."""
+    conn = get_db_connection()
+
+    with conn:
+        conn.execute('''
+            INSERT INTO model_updates (mu_version, mu_rows, mu_duration)
+            VALUES (?, ?, ?)
+        ''', (version, rows, duration))
+
+# ==============================
+# MAINTENANCE
+# ==============================
+
+def reindex_history(batch_size=500):
+    """Add history entries missing from the full-text index.
+
+    These are rows written by other tools, and rows whose text was changed
+    outside the app.
+
+    Returns the number of entries indexed.
+    """
+    conn = get_db_connection()
+
+    rows = _unindexed_history(conn)
+
+    for start in range(0, len(rows), batch_size):
+        batch = [search_index_row(*row) for row in rows[start:start + batch_size]]
+        with conn:
+            conn.executemany(_FTS_INSERT, batch)
+
+    return len(rows)
+
+def calibrate_bcrypt_rounds(target_ms=250, min_rounds=4, max_rounds=16):
+    """Time bcrypt on this machine; return the highest cost within target_ms, and the timings."""
+    password = b"calibration-password"
+    timings = {}
+    best = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        salt = bcrypt.gensalt(rounds=rounds)
+        started = time.perf_counter()
+        bcrypt.hashpw(password, salt)
+        timings[rounds] = (time.perf_counter() - started) * 1000
+        if timings[rounds] > target_ms:
+            break
+        best = rounds
+    return best, timings
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Database maintenance.")
+    parser.add_argument("--calibrate-bcrypt", action="store_true",
+                        help="pick the bcrypt cost that hashes in about --target-ms on this machine")
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--reindex-search", action="store_true",
+                        help="add history entries written outside the app to the search index")
+    args = parser.parse_args()
+
+    if args.reindex_search:
+        init_db()
+        print(f"Indexed {reindex_history()} history entries for search.")
+    elif args.calibrate_bcrypt:
+        best, timings = calibrate_bcrypt_rounds(args.target_ms)
+        for rounds, ms in timings.items():
+            print(f"   rounds {rounds:>2}: {ms:8.1f} ms")
+        print(f"Recommended: TAUTHY_BCRYPT_ROUNDS={best} (currently {BCRYPT_ROUNDS})")
+    else:
+        init_db()
+        print(f"Database {DB_NAME} is at schema version {len(MIGRATIONS)}.")
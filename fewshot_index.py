@@ -0,0 +1,245 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from ref_index import get_index
+
+# Retrieval index over the training corpus, used to pick the reference
+# examples most similar to the text being analysed. Built offline with
+#     python fewshot_index.py
+# and loaded memory-mapped; scipy and the model are only needed to query.
+
+INDEX_DIR = "data/fewshot"
+INDEX_VERSION = "2"
+
+# Nearest examples per class put into a prompt
+K = int(os.environ.get("TAUTHY_FEWSHOT_K", 4))
+# Rough token allowance for all examples together
+TOKEN_BUDGET = int(os.environ.get("TAUTHY_FEWSHOT_TOKENS", 1200))
+
+# Rows at least this similar to the query are treated as the query itself
+DUPLICATE_SIMILARITY = 0.999
+
+LABELS = ("ai", "human")
+BUILD_BATCH = 2000
+
+
+def estimate_tokens(text):
+    """Cheap token estimate: about 4 bytes of UTF-8 per token."""
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, at a word boundary when there is one."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Grow the cut until the estimate is reached; avoids re-encoding per char
+    cut = 0
+    used = 0
+    for i, ch in enumerate(text):
+        used += len(ch.encode("utf-8"))
+        if used > max_tokens * 4:
+            cut = i
+            break
+    space = text.rfind(" ", 0, cut)
+    if space > cut // 2:
+        cut = space
+    return text[:cut].rstrip() + " ..."
+
+
+_vectorizer_keys = {}
+
+
+def vectorizer_key():
+    """Hash of the loaded model's vocabulary and idf weights.
+
+    The index only depends on the vectorizer, so it stays valid when
+    online_update refits the classifier alone.
+    """
+    import ai_checker
+    import compact_model
+
+    vectorizer, _ = ai_checker.load_model()
+    if id(vectorizer) not in _vectorizer_keys:
+        _vectorizer_keys.clear()
+        # The same for the pickled vectorizer and its compact copy
+        _vectorizer_keys[id(vectorizer)] = compact_model.vocabulary_key(vectorizer)
+    return _vectorizer_keys[id(vectorizer)]
+
+
+class FewShotIndex:
+    """TF-IDF rows of the training corpus, stored as .npy arrays.
+
+    The sparse matrix is kept as CSR data/indices/indptr files next to the
+    row labels, language tags and CSV byte offsets; all of them are opened
+    with mmap, so loading is instant and pages are shared between processes.
+    Example texts are read back from the CSV through the reference index.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self._arrays = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _expected_meta(self):
+        return {
+            "version": INDEX_VERSION,
+            "vectorizer": vectorizer_key(),
+            "csv_sha1": get_index().csv_sha1(),
+        }
+
+    def is_fresh(self):
+        try:
+            with open(self._path("meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        expected = self._expected_meta()
+        return all(meta.get(k) == v for k, v in expected.items())
+
+    def build(self, workers=1):
+        """Vectorise every indexed training row with the model's vectorizer."""
+        import scipy.sparse as sp
+        import ai_checker
+
+        started = time.time()
+        vectorizer, _ = ai_checker.load_model()
+        ref = get_index()
+        rows = [r for r in ref.rows() if r[0] in LABELS]
+
+        labels = np.array([LABELS.index(label) for label, _, _ in rows], dtype=np.int8)
+        langs = np.array([lang for _, lang, _ in rows], dtype="S16")
+        offsets = np.array([offset for _, _, offset in rows], dtype=np.int64)
+
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        matrices = []
+        try:
+            for start in range(0, len(rows), BUILD_BATCH):
+                texts = ref.read_texts(offsets[start:start + BUILD_BATCH])
+                if executor is not None:
+                    cleaned = list(executor.map(ai_checker.clean_text, texts, chunksize=64))
+                else:
+                    cleaned = [ai_checker.clean_text(t) for t in texts]
+                matrices.append(vectorizer.transform(cleaned))
+                print(f"\r  vectorised {min(start + BUILD_BATCH, len(rows))}/{len(rows)} rows", end="", flush=True)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        print()
+        X = sp.vstack(matrices, format="csr") if matrices else vectorizer.transform([""])[:0]
+        X = X.astype(np.float32)
+        # Rows are compared by cosine similarity
+        norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+        X = sp.diags(1 / np.maximum(norms, 1e-12)) @ X
+        X = X.tocsr()
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        arrays = {
+            "data": X.data.astype(np.float32),
+            "indices": X.indices.astype(np.int32),
+            "indptr": X.indptr.astype(np.int64),
+            "offsets": offsets,
+            "labels": labels,
+            "langs": langs,
+        }
+        for name, array in arrays.items():
+            np.save(self._path(name + ".tmp.npy"), array)
+            os.replace(self._path(name + ".tmp.npy"), self._path(name + ".npy"))
+
+        meta = dict(self._expected_meta(), rows=len(rows), n_features=X.shape[1])
+        with open(self._path("meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        with self._lock:
+            self._arrays = None
+        print(f"Few-shot index built: {len(rows)} rows, {X.nnz} non-zeros "
+              f"in {time.time() - started:.1f}s -> {self.index_dir}")
+
+    def _load(self):
+        with self._lock:
+            # Reopen after a rebuild by another process
+            stamp = os.stat(self._path("meta.json")).st_mtime_ns
+            if self._arrays is None or self._stamp != stamp:
+                import scipy.sparse as sp
+
+                self._stamp = stamp
+                with open(self._path("meta.json"), encoding="utf-8") as f:
+                    meta = json.load(f)
+                a = {name: np.load(self._path(name + ".npy"), mmap_mode="r")
+                     for name in ("data", "indices", "indptr", "offsets", "labels", "langs")}
+                matrix = sp.csr_matrix((a["data"], a["indices"], a["indptr"]),
+                                       shape=(meta["rows"], meta["n_features"]), copy=False)
+                self._arrays = (matrix, a["offsets"], a["labels"], a["langs"])
+            return self._arrays
+
+    def nearest(self, text, lang, k=K):
+        """Return {"ai": [texts], "human": [texts]}, the k most similar rows per class."""
+        import ai_checker
+
+        matrix, offsets, labels, langs = self._load()
+        vectorizer, _ = ai_checker.load_model()
+        query = vectorizer.transform([ai_checker.clean_text(text)]).toarray().ravel().astype(np.float32)
+
+        scores = matrix @ query
+        same_lang = langs == lang.encode("ascii", "replace")
+
+        # The text itself may be in the training data; never show it as its own example
+        eligible = same_lang & (scores < DUPLICATE_SIMILARITY)
+
+        chosen = {}
+        for label_id, label in enumerate(LABELS):
+            candidates = np.flatnonzero(eligible & (labels == label_id))
+            if len(candidates) > k:
+                top = np.argpartition(-scores[candidates], k - 1)[:k]
+                candidates = candidates[top]
+            # Most similar first
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            chosen[label] = get_index().read_texts(offsets[candidates])
+        return chosen
+
+
+_default_index = FewShotIndex()
+_warned = False
+
+
+def get_fewshot_index():
+    """Shared index, or None when it has not been built for the current vectorizer and data."""
+    global _warned
+    if not _default_index.is_fresh():
+        if not _warned:
+            print("Few-shot index missing or stale (run: python fewshot_index.py); "
+                  "using random reference examples")
+            _warned = True
+        return None
+    _warned = False
+    return _default_index
+
+
+def fit_to_budget(examples, token_budget=TOKEN_BUDGET):
+    """Truncate every example so that all of them together fit the token budget."""
+    total = sum(len(texts) for texts in examples.values())
+    if not total:
+        return examples
+    per_example = max(16, token_budget // total)
+    return {label: [truncate_to_tokens(t, per_example) for t in texts] for label, texts in examples.items()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the few-shot retrieval index for ollama_checker.")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the index is up to date")
+    parser.add_argument("--workers", type=int, default=1, help="processes for cleaning the corpus")
+    args = parser.parse_args()
+
+    index = FewShotIndex()
+    if args.force or not index.is_fresh():
+        index.build(args.workers)
+    else:
+        print(f"Few-shot index is up to date: {index.index_dir}")
@@ -1,6 +1,80 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QListWidget, QTextEdit
-from PyQt5.QtCore import Qt
-from database import get_user_history
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QListView, QTextEdit
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer
+from database import get_history_page, get_history_entry, search_history
+
+PREVIEW_CHARS = 50
+# Wait for a pause in typing before running a search
+SEARCH_DELAY_MS = 300
+
+# hs_llm_status values (see cascade.py); NULL for entries saved before it was tracked
+LLM_STATUS = {
+    None: "N/A",
+    "pending": "Not finished",
+    "done": "Analyzed",
+    "failed": "Failed",
+    "cancelled": "Cancelled",
+    "skipped:confident": "Skipped, model was confident",
+    "skipped:too_short": "Skipped, text too short",
+}
+
+class HistoryListModel(QAbstractListModel):
+    """A user's history, fetched a page at a time as the view scrolls.
+
+    With a search query set, the pages come from the full-text index,
+    best match first, instead of newest first.
+    """
+
+    def __init__(self, user_id, parent=None):
+        super().__init__(parent)
+        self.user_id = user_id
+        self.query = ""
+        self.entries = []
+        self.exhausted = False
+
+    def set_query(self, query):
+        self.beginResetModel()
+        self.query = query.strip()
+        self.entries = []
+        self.exhausted = False
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+        if role == Qt.DisplayRole:
+            short = (entry['hs_preview'] or "")[:PREVIEW_CHARS].replace('\n', ' ') + "..."
+            return f"[{entry['hs_created_at']}] {short}"
+        if role == Qt.UserRole:
+            return entry
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        if self.query:
+            page = search_history(self.user_id, self.query, offset=len(self.entries))
+        else:
+            after = None
+            if self.entries:
+                last = self.entries[-1]
+                after = (last['hs_created_at'], last['hs_id'])
+            page = get_history_page(self.user_id, after)
+
+        if not page:
+            self.exhausted = True
+            return
+
+        start = len(self.entries)
+        self.beginInsertRows(QModelIndex(), start, start + len(page) - 1)
+        self.entries.extend(page)
+        self.endInsertRows()
 
 class HistoryWindow(QWidget):
     def __init__(self, user_id):
@@ -12,11 +86,25 @@ class HistoryWindow(QWidget):
         main_layout = QVBoxLayout()
         self.setLayout(main_layout)
 
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search history...")
+        self.search_box.setClearButtonEnabled(True)
+        main_layout.addWidget(self.search_box)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_box.textChanged.connect(self.search_timer.start)
+
         main_layout.addWidget(QLabel("Select an entry to view its content:"))
 
-        self.list_widget = QListWidget()
-        self.list_widget.itemClicked.connect(self.show_detail)
-        main_layout.addWidget(self.list_widget)
+        self.model = HistoryListModel(user_id, self)
+        self.list_view = QListView()
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setModel(self.model)
+        self.list_view.selectionModel().currentChanged.connect(self.show_detail)
+        main_layout.addWidget(self.list_view)
 
         box_layout = QHBoxLayout()
         main_layout.addLayout(box_layout)
@@ -35,28 +123,41 @@ class HistoryWindow(QWidget):
         self.load_history()
 
     def load_history(self):
-        history = get_user_history(self.user_id)
-        self.entries = history
-        for entry in history:
-            short = entry['hs_input_text'][:50].replace('\n', ' ') + "..."
-            date = entry['hs_created_at']
-            self.list_widget.addItem(f"[{date}] {short}")
+        # Only the first page; the view asks for more as the user scrolls
+        self.model.fetchMore()
+        if self.model.rowCount():
+            self.list_view.setCurrentIndex(self.model.index(0))
 
-        if history:
-            self.show_detail_by_index(0)
+    def run_search(self):
+        self.model.set_query(self.search_box.text())
+        self.input_box.clear()
+        self.result_box.clear()
+        self.load_history()
 
-    def show_detail(self, item):
-        index = self.list_widget.currentRow()
-        self.show_detail_by_index(index)
+    def show_detail(self, current, previous=None):
+        if current.isValid():
+            self.show_detail_by_index(current.row())
 
     def show_detail_by_index(self, index):
-        entry = self.entries[index]
+        # The list only holds previews; load the full text for this entry
+        entry = get_history_entry(self.model.entries[index]['hs_id'])
+        if entry is None:
+            return
 
         self.input_box.setPlainText(entry['hs_input_text'])
 
+        if entry['hs_result_ai'] is None:
+            # Too short for the model to decide, nothing was scored
+            scores = "<b>AI Score:</b> N/A<br><b>Human Score:</b> N/A<br>"
+        else:
+            scores = (
+                f"<b>AI Score:</b> {entry['hs_result_ai']*100:.2f}%<br>"
+                f"<b>Human Score:</b> {entry['hs_result_human']*100:.2f}%<br>"
+            )
+
         result = (
-            f"<b>AI Score:</b> {entry['hs_result_ai']*100:.2f}%<br>"
-            f"<b>Human Score:</b> {entry['hs_result_human']*100:.2f}%<br>"
+            scores +
+            f"<b>Ollama:</b> {LLM_STATUS.get(entry['hs_llm_status'], entry['hs_llm_status'])}<br>"
             f"<b>Feedback:</b> {entry.get('hs_user_feedback', 'N/A')}<br>"
             f"<b>Time:</b> {entry['hs_created_at']}"
         )
@@ -0,0 +1,360 @@
+import argparse
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import metrics
+
+# Headless detector service for other local programs: the model is loaded
+# once, concurrent /v1/predict requests are scored together in micro-batches
+# (one vectorizer/predict_proba call per batch), and /v1/ollama analyses are
+# proxied with a cap on how many run at once.
+#
+#     python inference_server.py --port 8765
+#     python inference_server.py --unix /tmp/tauthy.sock
+#
+#     POST /v1/predict  {"text": "..."} or {"texts": ["...", ...]}
+#     POST /v1/ollama   {"text": "..."}
+#     GET  /healthz     queue depth and settings
+#     GET  /metrics     Prometheus text (see metrics.py)
+
+HOST = os.environ.get("TAUTHY_SERVER_HOST", "127.0.0.1")
+PORT = int(os.environ.get("TAUTHY_SERVER_PORT", 8765))
+# A batch is scored as soon as it has MAX_BATCH texts or its oldest text
+# has waited MAX_WAIT_MS
+MAX_BATCH = int(os.environ.get("TAUTHY_SERVER_MAX_BATCH", 32))
+MAX_WAIT_MS = float(os.environ.get("TAUTHY_SERVER_MAX_WAIT_MS", 5))
+# Texts waiting to be scored; beyond this requests get 503 instead of piling up
+MAX_QUEUE = int(os.environ.get("TAUTHY_SERVER_QUEUE", 1024))
+# Ollama analyses in flight, and how long a request may wait for a slot
+OLLAMA_CONCURRENCY = int(os.environ.get("TAUTHY_SERVER_OLLAMA_CONCURRENCY", 2))
+OLLAMA_WAIT = float(os.environ.get("TAUTHY_SERVER_OLLAMA_WAIT", 30))
+
+# How often an idle batcher checks whether it is being stopped
+STOP_POLL = 0.1
+
+MAX_BODY = 10 * 1024 * 1024
+MAX_TEXTS = 1000
+RETRY_AFTER = 1
+
+# Latency span per endpoint; every other path is counted as server.request.other
+REQUEST_SPANS = {
+    "/v1/predict": "server.request.v1.predict",
+    "/v1/ollama": "server.request.v1.ollama",
+}
+
+
+class Overloaded(Exception):
+    """The server cannot take more work right now; the client should retry later."""
+
+
+class MicroBatcher:
+    """Collects texts from many threads and scores them in batches on one thread."""
+
+    def __init__(self, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, max_queue=MAX_QUEUE, use_cache=True):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.use_cache = use_cache
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._stopping = False
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        try:
+            # Wakes the batcher at once; with a full queue it notices _stopping
+            # after the current batch instead
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join()
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, text):
+        """Future for text's result; raises Overloaded when the queue is full."""
+        future = Future()
+        if self.use_cache:
+            import ai_checker
+            from result_cache import get_cache
+
+            cached = get_cache().get("ml", ai_checker.model_version(), text)
+            if cached is not None:
+                future.set_result(cached)
+                return future
+        try:
+            self._queue.put_nowait((text, future, time.perf_counter()))
+        except queue.Full:
+            raise Overloaded(f"prediction queue is full ({self._queue.maxsize} texts)")
+        return future
+
+    def _collect(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=STOP_POLL)
+                break
+            except queue.Empty:
+                if self._stopping:
+                    return None
+        if item is None:
+            return None
+        batch = [item]
+        # Nobody else is waiting: a lone request would only lose time
+        if self._queue.empty():
+            return batch
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopping = True
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        import ai_checker
+        from result_cache import get_cache
+
+        while not self._stopping:
+            batch = self._collect()
+            if not batch:
+                break
+            texts = [text for text, _, _ in batch]
+            now = time.perf_counter()
+            for _, _, queued in batch:
+                metrics.observe("server.queue_wait", now - queued)
+            try:
+                with metrics.span("server.batch", size=len(batch)):
+                    results = list(ai_checker.predict_texts(texts, batch_size=len(texts)))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            metrics.record_value("server.batch_size", len(batch))
+            version = ai_checker.model_version() if self.use_cache else None
+            for (text, future, _), result in zip(batch, results):
+                future.set_result(result)
+                if self.use_cache:
+                    get_cache().put("ml", version, text, result)
+
+        # Texts still queued when the batcher stops get an answer too
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(Overloaded("server is shutting down"))
+
+
+class OllamaGate:
+    """Runs query_ollama for at most `limit` requests at a time."""
+
+    def __init__(self, limit=OLLAMA_CONCURRENCY, wait=OLLAMA_WAIT):
+        self.limit = limit
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def analyse(self, text):
+        from ollama_checker import query_ollama
+
+        if not self._slots.acquire(timeout=self.wait):
+            raise Overloaded(f"all {self.limit} Ollama slots busy for {self.wait:.0f}s")
+        try:
+            return query_ollama(text)
+        finally:
+            self._slots.release()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "tauthy"
+    # Headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACKs add ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message, **headers):
+        self._send(status, {"error": message}, headers=headers)
+
+    def do_GET(self):
+        app = self.server.app
+        if self.path == "/healthz":
+            self._send(200, {
+                "status": "ok",
+                "queue": app.batcher.depth,
+                "max_batch": app.batcher.max_batch,
+                "max_wait_ms": app.batcher.max_wait * 1000,
+                "ollama_concurrency": app.ollama.limit,
+            })
+        elif self.path == "/metrics":
+            self._send(200, metrics.prometheus_text().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._error(404, f"unknown endpoint {self.path}")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_BODY:
+            self.close_connection = True
+            self._error(413, f"request body over {MAX_BODY} bytes")
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._error(400, "invalid JSON")
+            return
+        if not isinstance(payload, dict):
+            self._error(400, "expected a JSON object")
+            return
+
+        started = time.perf_counter()
+        try:
+            if self.path == "/v1/predict":
+                self._predict(payload)
+            elif self.path == "/v1/ollama":
+                self._ollama(payload)
+            else:
+                self._error(404, f"unknown endpoint {self.path}")
+                return
+        except Overloaded as e:
+            self._error(503, str(e), **{"Retry-After": str(RETRY_AFTER)})
+        except Exception as e:
+            self._error(500, f"{type(e).__name__}: {e}")
+        finally:
+            # Fixed span names, so clients cannot add one per path they make up
+            span = REQUEST_SPANS.get(self.path, "server.request.other")
+            metrics.observe(span, time.perf_counter() - started)
+
+    def _predict(self, payload):
+        app = self.server.app
+        if isinstance(payload.get("text"), str):
+            self._send(200, {"result": app.batcher.submit(payload["text"]).result()})
+            return
+        texts = payload.get("texts")
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            self._error(400, 'expected "text" (string) or "texts" (list of strings)')
+            return
+        if len(texts) > MAX_TEXTS:
+            self._error(413, f"at most {MAX_TEXTS} texts per request")
+            return
+        futures = [app.batcher.submit(t) for t in texts]
+        self._send(200, {"results": [f.result() for f in futures]})
+
+    def _ollama(self, payload):
+        text = payload.get("text")
+        if not isinstance(text, str) or not text.strip():
+            self._error(400, 'expected "text" (non-empty string)')
+            return
+        try:
+            result = self.server.app.ollama.analyse(text)
+        except ValueError as e:
+            # query_ollama could not tell the language
+            self._error(422, str(e))
+            return
+        self._send(200, {"result": result})
+
+
+class _UnixHandler(_Handler):
+    # TCP_NODELAY does not exist for Unix sockets
+    disable_nagle_algorithm = False
+
+
+class _TCPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for bursts of new client connections
+    request_queue_size = 128
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+
+
+class InferenceServer:
+    """The HTTP (TCP or Unix socket) front end with its batcher and Ollama gate."""
+
+    def __init__(self, host=HOST, port=PORT, unix_path=None, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS,
+                 max_queue=MAX_QUEUE, ollama_concurrency=OLLAMA_CONCURRENCY, use_cache=True):
+        self.batcher = MicroBatcher(max_batch, max_wait_ms, max_queue, use_cache)
+        self.ollama = OllamaGate(ollama_concurrency)
+        if unix_path:
+            self.httpd = UnixHTTPServer(unix_path, _UnixHandler)
+        else:
+            self.httpd = _TCPServer((host, port), _Handler)
+        self.httpd.app = self
+
+    @property
+    def address(self):
+        if isinstance(self.httpd.server_address, str):
+            return f"unix:{self.httpd.server_address}"
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        import ai_checker
+
+        # Pay for the model, tokenizer and language profiles before taking requests
+        ai_checker.warm_up()
+        self.batcher.start()
+        print(f"Tauthy inference server listening on {self.address}", flush=True)
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+            self.batcher.stop()
+            if isinstance(self.httpd.server_address, str) and os.path.exists(self.httpd.server_address):
+                os.remove(self.httpd.server_address)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the AI text detector over HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT, help="0 picks a free port")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="texts per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="longest a text waits for its batch to fill")
+    parser.add_argument("--queue", type=int, default=MAX_QUEUE, help="texts waiting before requests get 503")
+    parser.add_argument("--ollama-concurrency", type=int, default=OLLAMA_CONCURRENCY,
+                        help="Ollama analyses run at once")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the shared result cache")
+    args = parser.parse_args()
+
+    server = InferenceServer(args.host, args.port, args.unix, args.max_batch, args.max_wait_ms,
+                             args.queue, args.ollama_concurrency, use_cache=not args.no_cache)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down", file=sys.stderr)
@@ -0,0 +1,217 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, namedtuple
+
+# Language identification shared by ai_checker, ollama_checker and the
+# reference index. Most texts are decided from their Unicode scripts alone
+# (one vectorised pass over the code points); only texts the scripts leave
+# open go to langdetect, seeded so that the same text always gets the same
+# answer.
+
+# Below this many letters a text is "unknown"
+MIN_LETTERS = 3
+# Share of letters in Thai script for a text to be Thai
+THAI_SHARE = 0.5
+# Share of letters in Latin script, and of words that are English function
+# words, for a text to be English without asking langdetect
+LATIN_SHARE = 0.9
+ENGLISH_SHARE = 0.2
+MIN_WORDS = 4
+# langdetect reads only this much of a text, and answers below this probability are "unknown"
+FALLBACK_CHARS = 1000
+FALLBACK_MIN_PROB = 0.9
+SEED = 0
+
+CACHE_SIZE = 4096
+
+ENGLISH_WORDS = frozenset("""
+the and of to is that with for was are this it be have from by not they which
+you we has were been their will would can an or but at as his her its our there
+what when who than then these those should could
+""".split())
+
+_WORD = re.compile(r"[a-z']+")
+_THAI_CHAR = re.compile(r"[\u0E00-\u0E7F]")
+
+# Script classes in the code point table
+_NONE, _THAI, _LATIN, _OTHER = range(4)
+
+Detection = namedtuple("Detection", "lang thai latin letters")
+
+_table = None
+_table_lock = threading.Lock()
+_langdetect_lock = threading.Lock()
+_seeded = False
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _script_table():
+    """uint8 script class for every BMP code point; built once (~50 ms)."""
+    global _table
+    with _table_lock:
+        if _table is None:
+            import numpy as np
+
+            table = np.zeros(0x10000, dtype=np.uint8)
+            for cp in range(0x10000):
+                if unicodedata.category(chr(cp))[0] in "LM":
+                    table[cp] = _OTHER
+            table[0x0E01:0x0E5C] = _THAI
+            for cp in range(0x0250):
+                if table[cp] == _OTHER:
+                    table[cp] = _LATIN
+            table[0x1E00:0x1F00] = _LATIN
+            # Combining marks only count inside Thai
+            for cp in range(0x0300, 0x0370):
+                table[cp] = _NONE
+            _table = table
+    return _table
+
+
+def _code_points(text):
+    import numpy as np
+
+    return np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+
+
+def _classes(points):
+    import numpy as np
+
+    table = _script_table()
+    # Astral planes are emoji and rare scripts; they do not decide anything here
+    return np.where(points < 0x10000, table[np.minimum(points, 0xFFFF)], _NONE)
+
+
+def script_counts(text):
+    """(Thai letters, Latin letters, all letters) in text."""
+    import numpy as np
+
+    counts = np.bincount(_classes(_code_points(text)), minlength=4)
+    return int(counts[_THAI]), int(counts[_LATIN]), int(counts[_THAI] + counts[_LATIN] + counts[_OTHER])
+
+
+def has_thai(text):
+    """Whether text contains any Thai character.
+
+    Stops at the first one, which makes it cheaper than script_counts()
+    when that is all a caller needs to know.
+    """
+    return _THAI_CHAR.search(text) is not None
+
+
+def _looks_english(text):
+    words = _WORD.findall(text[:FALLBACK_CHARS].lower())
+    if len(words) < MIN_WORDS:
+        return False
+    return sum(w in ENGLISH_WORDS for w in words) / len(words) >= ENGLISH_SHARE
+
+
+def _langdetect(text):
+    global _seeded
+    from langdetect import DetectorFactory, detect_langs
+    from langdetect.lang_detect_exception import LangDetectException
+
+    # The seed lives on the factory and each call builds a detector from it;
+    # serialise so a concurrent first call cannot run unseeded
+    with _langdetect_lock:
+        if not _seeded:
+            DetectorFactory.seed = SEED
+            _seeded = True
+        try:
+            langs = detect_langs(text[:FALLBACK_CHARS])
+        except LangDetectException:
+            return "unknown"
+    if langs and langs[0].prob >= FALLBACK_MIN_PROB:
+        return langs[0].lang
+    return "unknown"
+
+
+def _decide(text, thai, latin, letters):
+    if letters < MIN_LETTERS:
+        return "unknown"
+    if thai / letters >= THAI_SHARE:
+        return "th"
+    if latin / letters >= LATIN_SHARE and _looks_english(text):
+        return "en"
+    return _langdetect(text)
+
+
+def _key(text):
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def _cached(key):
+    with _cache_lock:
+        found = _cache.get(key)
+        if found is not None:
+            _cache.move_to_end(key)
+        return found
+
+
+def _remember(key, detection):
+    with _cache_lock:
+        _cache[key] = detection
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def identify(text):
+    """Detection(lang, thai, latin, letters) for text; results are cached."""
+    key = _key(text)
+    found = _cached(key)
+    if found is None:
+        thai, latin, letters = script_counts(text)
+        found = Detection(_decide(text, thai, latin, letters), thai, latin, letters)
+        _remember(key, found)
+    return found
+
+
+def detect(text):
+    """ISO 639-1 code of text's language ("th", "en", ...) or "unknown"."""
+    return identify(text).lang
+
+
+def identify_many(texts):
+    """identify() for a list of texts, counting scripts for all of them in one pass."""
+    import numpy as np
+
+    texts = list(texts)
+    keys = [_key(t) for t in texts]
+    results = [_cached(k) for k in keys]
+    todo = [i for i, r in enumerate(results) if r is None]
+    if todo:
+        points = [_code_points(texts[i]) for i in todo]
+        lengths = np.array([len(p) for p in points], dtype=np.int64)
+        # One trailing non-letter keeps every start index in range for reduceat
+        classes = np.append(_classes(np.concatenate(points)), np.uint8(_NONE))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        def per_text(mask):
+            sums = np.add.reduceat(mask.astype(np.int64), starts)
+            # reduceat yields the element at the start for empty ranges
+            sums[lengths == 0] = 0
+            return sums
+
+        thai = per_text(classes == _THAI)
+        latin = per_text(classes == _LATIN)
+        letters = thai + latin + per_text(classes == _OTHER)
+        for j, i in enumerate(todo):
+            t, l, n = int(thai[j]), int(latin[j]), int(letters[j])
+            results[i] = Detection(_decide(texts[i], t, l, n), t, l, n)
+            _remember(keys[i], results[i])
+    return results
+
+
+def detect_many(texts):
+    """detect() for a list of texts."""
+    return [r.lang for r in identify_many(texts)]
+
+
+def warm_up():
+    """Build the script table and load langdetect's profiles."""
+    _script_table()
+    _langdetect("warm up the language detector")
@@ -1,12 +1,28 @@
 import sys
+import threading
 import uuid
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit,
     QPushButton, QMessageBox, QHBoxLayout
 )
 from PyQt5.QtGui import QFont
-from database import create_user, login
+from database import create_user, init_db, login
 from PyQt5.QtCore import Qt
+from workers import Worker, start_worker
+
+def warm_up():
+    """Import the main window and load the models while the login window is up."""
+    try:
+        import mainapp  # noqa: F401
+        import ai_checker
+        import ollama_checker
+        ai_checker.warm_up()
+        ollama_checker.warm_up()
+        ollama_checker.warm_up_llm()
+        print("warm-up finished")
+    except Exception as e:
+        print("warm-up failed:", e)
+
 
 class LoginWindow(QWidget):
     def __init__(self):
@@ -28,8 +44,9 @@ class LoginWindow(QWidget):
         self.password_input.setPlaceholderText("Password")
         self.password_input.setEchoMode(QLineEdit.Password)
 
-        login_button = QPushButton("Login")
-        login_button.clicked.connect(self.login)
+        self.login_button = QPushButton("Login")
+        self.login_button.clicked.connect(self.login)
+        self.password_input.returnPressed.connect(self.login)
 
         switch_button = QPushButton("Register")
         switch_button.clicked.connect(self.switch_to_register)
@@ -37,19 +54,40 @@ class LoginWindow(QWidget):
         layout.addWidget(title)
         layout.addWidget(self.username_input)
         layout.addWidget(self.password_input)
-        layout.addWidget(login_button)
+        layout.addWidget(self.login_button)
         layout.addWidget(switch_button)
 
         self.setLayout(layout)
+        self.worker = None
 
 
     def login(self):
+        if self.worker is not None:
+            return
         username = self.username_input.text()
         password = self.password_input.text()
         print("📥 login clicked:", username)
 
-        success, data = login(username, password)
-        print("login result:", success, data)
+        # bcrypt takes a noticeable fraction of a second; keep the window responsive
+        self.login_button.setEnabled(False)
+        self.login_button.setText("Logging in...")
+        self.worker = Worker(login, username, password)
+        self.worker.signals.result.connect(self.on_login_result)
+        self.worker.signals.error.connect(self.on_login_error)
+        self.worker.signals.finished.connect(self.on_login_finished)
+        start_worker(self.worker)
+
+    def on_login_finished(self):
+        self.worker = None
+        self.login_button.setEnabled(True)
+        self.login_button.setText("Login")
+
+    def on_login_error(self, error):
+        QMessageBox.critical(self, "Login Failed", str(error))
+
+    def on_login_result(self, result):
+        success, data = result
+        print("login result:", success, data['user_id'] if success else data)
 
         if success:
             try:
@@ -101,8 +139,8 @@ class RegisterWindow(QWidget):
         self.email_input = QLineEdit()
         self.email_input.setPlaceholderText("Email (optional)")
 
-        register_button = QPushButton("Register")
-        register_button.clicked.connect(self.register)
+        self.register_button = QPushButton("Register")
+        self.register_button.clicked.connect(self.register)
 
         switch_button = QPushButton("Back to Login")
         switch_button.clicked.connect(self.switch_to_login)
@@ -113,19 +151,39 @@ class RegisterWindow(QWidget):
         layout.addWidget(self.username_input)
         layout.addWidget(self.password_input)
         layout.addWidget(self.email_input)
-        layout.addWidget(register_button)
+        layout.addWidget(self.register_button)
         layout.addWidget(switch_button)
 
         self.setLayout(layout)
+        self.worker = None
 
     def register(self):
+        if self.worker is not None:
+            return
         firstname = self.firstname_input.text()
         lastname = self.lastname_input.text()
         username = self.username_input.text()
         password = self.password_input.text()
         email = self.email_input.text()
 
-        success, message = create_user(firstname, lastname, username, password, email)
+        self.register_button.setEnabled(False)
+        self.register_button.setText("Registering...")
+        self.worker = Worker(create_user, firstname, lastname, username, password, email)
+        self.worker.signals.result.connect(self.on_register_result)
+        self.worker.signals.error.connect(self.on_register_error)
+        self.worker.signals.finished.connect(self.on_register_finished)
+        start_worker(self.worker)
+
+    def on_register_finished(self):
+        self.worker = None
+        self.register_button.setEnabled(True)
+        self.register_button.setText("Register")
+
+    def on_register_error(self, error):
+        QMessageBox.critical(self, "Error", str(error))
+
+    def on_register_result(self, result):
+        success, message = result
         if success:
             QMessageBox.information(self, "Success", "Registered successfully!")
             self.switch_to_login()
@@ -139,7 +197,9 @@ class RegisterWindow(QWidget):
 
 
 if __name__ == "__main__":
+    init_db()
     app = QApplication(sys.argv)
     window = LoginWindow()
     window.show()
+    threading.Thread(target=warm_up, daemon=True).start()
     sys.exit(app.exec_())
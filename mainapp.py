@@ -1,15 +1,25 @@
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QTextEdit,
     QPushButton, QFileDialog, QMessageBox, QHBoxLayout,
-    QListWidget, QPlainTextEdit
+    QListWidget, QPlainTextEdit, QCheckBox
 )
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QFont, QTextCursor
 from PyQt5.QtCore import Qt
-import fitz  # PyMuPDF
-from database import save_input, update_feedback, get_user_history
+from html import escape
+from database import save_input, update_feedback, update_llm_status
 from ai_checker import predict_text  # ML Model
 from ollama_checker import query_ollama  # Ollama API
 from history_window import HistoryWindow
+from workers import Worker, start_worker
+import cascade
+import metrics
+import os
+import time
+
+
+def _update_model_from_feedback():
+    from online_update import MIN_ROWS, update_model  # imports sklearn
+    return update_model(min_rows=MIN_ROWS)
 
 
 class MainAppWindow(QWidget):
@@ -20,6 +30,29 @@ class MainAppWindow(QWidget):
         self.setGeometry(1000, 100, 800, 800)
         self.setStyleSheet(open('qss/style.qss').read())
 
+        # Analysis state; every submit/reanalyze gets a new run id so late
+        # signals from cancelled workers are ignored
+        self._workers = set()
+        self._analysis_workers = set()
+        self._run_id = 0
+        self._running = set()
+        self._ml_result = None
+        self._ml_error = None
+        self._ollama_state = None
+        self._ollama_result = None
+        self._ollama_stream = []
+        # History entry whose Ollama status this run updates, and why Ollama was skipped
+        self._llm_hs_id = None
+        self._llm_skipped = None
+        self._feedback_hs_id = None
+        # PDF ingestion: one entry per document, pages filled in as they are scored
+        self._pdf_docs = []
+        # (text, hs_id) of the PDF document loaded into the input box, which
+        # ingestion already saved to history
+        self._pdf_entry = None
+        # Segment mode: (text, segments, document result) of the current run
+        self._segments = None
+
         layout = QVBoxLayout()
         self.setLayout(layout)
 
@@ -42,19 +75,35 @@ class MainAppWindow(QWidget):
         self.result_box.setMinimumWidth(500)
         content_layout.addWidget(self.result_box)
 
+        self.segment_checkbox = QCheckBox("Score long text in segments (heatmap, Ollama only on unclear parts)")
+        self.segment_checkbox.setChecked(True)
+        layout.addWidget(self.segment_checkbox)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
         button_layout = QHBoxLayout()
 
-        upload_button = QPushButton("Upload PDF")
-        upload_button.clicked.connect(self.upload_pdf)
-        button_layout.addWidget(upload_button)
+        self.upload_button = QPushButton("Upload PDF")
+        self.upload_button.clicked.connect(self.upload_pdf)
+        button_layout.addWidget(self.upload_button)
+
+        self.upload_folder_button = QPushButton("Upload Folder")
+        self.upload_folder_button.clicked.connect(self.upload_pdf_folder)
+        button_layout.addWidget(self.upload_folder_button)
 
-        submit_button = QPushButton("Submit")
-        submit_button.clicked.connect(self.submit_text)
-        button_layout.addWidget(submit_button)
+        self.submit_button = QPushButton("Submit")
+        self.submit_button.clicked.connect(self.submit_text)
+        button_layout.addWidget(self.submit_button)
 
-        reanalyze_button = QPushButton("Reanalyze with Ollama")
-        reanalyze_button.clicked.connect(self.reanalyze_ollama)
-        button_layout.addWidget(reanalyze_button)
+        self.reanalyze_button = QPushButton("Reanalyze with Ollama")
+        self.reanalyze_button.clicked.connect(self.reanalyze_ollama)
+        button_layout.addWidget(self.reanalyze_button)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_analysis)
+        button_layout.addWidget(self.cancel_button)
 
         layout.addLayout(button_layout)
 
@@ -62,23 +111,150 @@ class MainAppWindow(QWidget):
         history_button.clicked.connect(self.open_history_window)
         layout.addWidget(history_button)
 
+    # ==============================
+    # BACKGROUND JOBS
+    # ==============================
+
+    def _start(self, worker, analysis=False):
+        # Keep a reference until the worker is done so its signals stay alive
+        workers = self._analysis_workers if analysis else self._workers
+        workers.add(worker)
+        worker.signals.finished.connect(lambda: workers.discard(worker))
+        return start_worker(worker)
+
+    def _new_run(self, stages, text=None):
+        self._run_id += 1
+        self._running = set(stages)
+        # Timed from the click to the last stage; runs with text are recorded in metrics
+        self._run_kind = "+".join(sorted(stages))
+        self._run_text = text
+        self._run_started = time.perf_counter()
+        self._run_stages = {}
+        self._set_busy(True)
+        return self._run_id
+
+    def _set_busy(self, busy, status=""):
+        self.upload_button.setEnabled(not busy)
+        self.upload_folder_button.setEnabled(not busy)
+        self.submit_button.setEnabled(not busy)
+        self.reanalyze_button.setEnabled(not busy)
+        self.cancel_button.setEnabled(busy)
+        self.status_label.setText(status or ("Analyzing..." if busy else ""))
+
+    def _stage_finished(self, run_id, stage):
+        if run_id != self._run_id:
+            return
+        self._running.discard(stage)
+        self._run_stages[stage] = time.perf_counter() - self._run_started
+        if self._running:
+            return
+
+        if self._run_text is not None:
+            metrics.record_analysis(self._run_kind, time.perf_counter() - self._run_started,
+                                    self._run_text, self._run_stages)
+        self._set_busy(False)
+        if self._feedback_hs_id:
+            hs_id, self._feedback_hs_id = self._feedback_hs_id, None
+            self.ask_feedback(hs_id)
+
+    def cancel_analysis(self):
+        for worker in list(self._analysis_workers):
+            worker.cancel()
+        if not self._running:
+            return
+
+        self._run_id += 1
+        self._running = set()
+        self._feedback_hs_id = None
+        if self._ollama_state == "running":
+            self._ollama_state = "cancelled"
+            self._set_llm_status(cascade.CANCELLED)
+        self._set_busy(False, "Analysis cancelled.")
+        self._render_result()
+
+    def closeEvent(self, event):
+        self.cancel_analysis()
+        super().closeEvent(event)
+
+    # ==============================
+    # PDF
+    # ==============================
+
     def upload_pdf(self):
         options = QFileDialog.Options()
-        filename, _ = QFileDialog.getOpenFileName(self, "Open PDF File", "", "PDF Files (*.pdf)", options=options)
-
-        if filename:
-            try:
-                pdf_text = self.extract_text_from_pdf(filename)
-                self.text_input.setText(pdf_text)
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Failed to read PDF: {e}")
-
-    def extract_text_from_pdf(self, pdf_path):
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
+        filenames, _ = QFileDialog.getOpenFileNames(self, "Open PDF Files", "", "PDF Files (*.pdf)", options=options)
+        if filenames:
+            self.ingest_pdfs(filenames)
+
+    def upload_pdf_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Open Folder of PDF Files")
+        if folder:
+            self.ingest_pdfs([folder])
+
+    def ingest_pdfs(self, paths):
+        from pdf_ingest import find_pdfs
+
+        files = find_pdfs(paths)
+        if not files:
+            QMessageBox.warning(self, "Error", "No PDF files found.")
+            return
+
+        self.cancel_analysis()
+        run_id = self._new_run({"pdf"})
+        self._ml_result = None
+        self._ml_error = None
+        self._ollama_state = None
+        self._pdf_docs = []
+        self._pdf_entry = None
+        self._segments = None
+        self.status_label.setText(f"Reading {len(files)} PDF file(s)...")
+
+        worker = Worker(self._run_pdf_stage, files, with_worker=True)
+        worker.signals.progress.connect(lambda event: self._on_pdf_event(run_id, event))
+        worker.signals.error.connect(lambda e: self._on_pdf_error(run_id, e))
+        worker.signals.finished.connect(lambda: self._stage_finished(run_id, "pdf"))
+        self._start(worker, analysis=True)
+        self._render_result()
+
+    def _run_pdf_stage(self, worker, files):
+        from pdf_ingest import score_pdfs
+
+        # Pages are extracted and scored a batch at a time; every batch and
+        # every finished document goes out as a progress signal
+        for event in score_pdfs(files):
+            if event["type"] == "document":
+                details = event["result"]["details"]
+                event["hs_id"] = save_input(self.user_id, event["text"], details.get('ai'), details.get('human'))
+            worker.report(event)
+
+    def _on_pdf_event(self, run_id, event):
+        if run_id != self._run_id:
+            return
+        name = os.path.basename(event["file"])
+        if not self._pdf_docs or self._pdf_docs[-1]["file"] != event["file"]:
+            self._pdf_docs.append({"file": event["file"], "pages": [], "result": None})
+        doc = self._pdf_docs[-1]
+
+        if event["type"] == "pages":
+            doc["pages"].extend(event["pages"])
+            last = event["pages"][-1]
+            self.status_label.setText(f"Scoring {name}: page {last['page']} of {last['pages']}...")
+        else:
+            doc["result"] = event["result"]
+            if len(self._pdf_docs) == 1:
+                # Keep the text available for Submit / Reanalyze with Ollama
+                self.text_input.setPlainText(event["text"])
+                self._pdf_entry = (event["text"].strip(), event["hs_id"])
+        self._render_result()
+
+    def _on_pdf_error(self, run_id, error):
+        if run_id != self._run_id:
+            return
+        QMessageBox.warning(self, "Error", f"Failed to read PDF: {error}")
+
+    # ==============================
+    # ANALYSIS
+    # ==============================
 
     def submit_text(self):
         text = self.text_input.toPlainText().strip()
@@ -87,27 +263,31 @@ class MainAppWindow(QWidget):
             QMessageBox.warning(self, "Error", "Please enter or upload some text.")
             return
 
-        result = predict_text(text)
-        label = result["label"]
-        confidence = result["confidence"]
-        details = result["details"]  # {'ai': 88.0, 'human': 12.0}
-
-        # Ollama
-        ollama = query_ollama(text)
-
-        # Save to database
-        hs_id = save_input(self.user_id, text, details['ai'], details['human'])
+        # Submitting a loaded PDF's text adds to its history entry instead of saving it again
+        hs_id = self._pdf_entry[1] if self._pdf_entry and self._pdf_entry[0] == text else None
 
-        self.result_box.setText(
-            f"<b>System Prediction</b><br>"
-            f"<u>Final Label:</u> <b>{label.upper()}</b> ({confidence:.2f}% confident)<br>"
-            f"AI: {details['ai']:.2f}% | Human: {details['human']:.2f}%<br><br>"
-            f"<b>Ollama Analysis</b><br>"
-            f"AI: {ollama['ai']:.2f}% | Human: {ollama['human']:.2f}%<br>"
-            f"Reason: {ollama['reason']}"
-        )
+        self.cancel_analysis()
+        if self._use_segments(text):
+            self._start_segments(text, save=True, hs_id=hs_id)
+            return
 
-        self.ask_feedback(hs_id)
+        # The model runs first; Ollama is only added to the run when the
+        # cascade finds the model unsure (see _on_ml_result)
+        run_id = self._new_run({"ml"}, text)
+        self._ml_result = None
+        self._ml_error = None
+        self._ollama_state = None
+        self._llm_hs_id = None
+        self._llm_skipped = None
+        self._pdf_docs = []
+        self._segments = None
+
+        worker = Worker(self._run_ml_stage, text, hs_id)
+        worker.signals.result.connect(lambda res: self._on_ml_result(run_id, text, res))
+        worker.signals.error.connect(lambda e: self._on_ml_error(run_id, e))
+        worker.signals.finished.connect(lambda: self._stage_finished(run_id, "ml"))
+        self._start(worker, analysis=True)
+        self._render_result()
 
     def reanalyze_ollama(self):
         text = self.text_input.toPlainText().strip()
@@ -116,27 +296,245 @@ class MainAppWindow(QWidget):
             QMessageBox.warning(self, "Error", "No text to analyze.")
             return
 
-        try:
-            ollama = query_ollama(text)
+        self.cancel_analysis()
+        if self._use_segments(text):
+            self._start_segments(text, save=False)
+            return
 
-            lines = self.result_box.toPlainText().split("\n")
+        # An explicit request, so the cascade does not apply; this text has
+        # no history entry of its own
+        run_id = self._new_run({"ollama"}, text)
+        self._llm_hs_id = None
+        self._llm_skipped = None
+        self._feedback_hs_id = None
+        self._pdf_docs = []
+        self._segments = None
+        self._start_ollama(run_id, text)
+
+    # ==============================
+    # SEGMENT MODE
+    # ==============================
+
+    def _use_segments(self, text):
+        from segments import MAX_WINDOW_CHARS
+
+        # Text that fits in one window is analysed as a whole
+        return self.segment_checkbox.isChecked() and len(text) > MAX_WINDOW_CHARS
+
+    def _start_segments(self, text, save, hs_id=None):
+        run_id = self._new_run({"segments"}, text)
+        self._ml_result = None
+        self._ml_error = None
+        self._ollama_state = None
+        self._pdf_docs = []
+        self._segments = None
+
+        worker = Worker(self._run_segment_stage, text, save, hs_id, with_worker=True)
+        worker.signals.progress.connect(lambda update: self._on_segments_update(run_id, update))
+        worker.signals.error.connect(lambda e: self._on_ml_error(run_id, e))
+        worker.signals.finished.connect(lambda: self._stage_finished(run_id, "segments"))
+        self._start(worker, analysis=True)
+        self._render_result()
+
+    def _run_segment_stage(self, worker, text, save, hs_id):
+        from segments import document_score, refine_with_ollama, score_segments
+
+        # Every window goes through the model in one batch, and the model's
+        # document score is what history stores, as for unsegmented text
+        segments, doc = score_segments(text)
+        if save and hs_id is None:
+            hs_id = save_input(self.user_id, text, doc["details"].get('ai'), doc["details"].get('human'))
+        worker.report((text, [dict(s) for s in segments], doc, hs_id, 0))
+
+        # Then only the least certain windows go to Ollama, one at a time
+        checked = 0
+        for _ in refine_with_ollama(segments, on_token=lambda chunk: worker.check_cancelled()):
+            checked += 1
+            worker.report((text, [dict(s) for s in segments], document_score(segments), None, checked))
+
+    def _on_segments_update(self, run_id, update):
+        if run_id != self._run_id:
+            return
+        text, segments, doc, hs_id, checked = update
+        self._segments = (text, segments, doc)
+        if hs_id:
+            self._feedback_hs_id = hs_id
+        self.status_label.setText(f"Scored {len(segments)} segments; {checked} checked by Ollama...")
+        self._render_result()
+
+    def _run_ml_stage(self, text, hs_id=None):
+        result = predict_text(text)
+        details = result["details"]  # {'ai': 88.0, 'human': 12.0}
+        decision = cascade.decide(result, text)
+
+        # Save to database, or record the Ollama status on the existing entry
+        status = cascade.PENDING if decision.run_llm else decision.reason
+        if hs_id is None:
+            hs_id = save_input(self.user_id, text, details.get('ai'), details.get('human'), status)
+        else:
+            update_llm_status(hs_id, status)
+        return result, hs_id, decision
+
+    def _run_ollama_stage(self, worker, text):
+        # Every streamed token goes out as a progress signal; report() raises
+        # Cancelled once the job is cancelled, which aborts the stream
+        return query_ollama(text, on_token=worker.report)
+
+    def _start_ollama(self, run_id, text):
+        self._ollama_state = "running"
+        self._ollama_result = None
+        self._ollama_stream = []
+
+        worker = Worker(self._run_ollama_stage, text, with_worker=True)
+        worker.signals.progress.connect(lambda chunk: self._on_ollama_token(run_id, chunk))
+        worker.signals.result.connect(lambda res: self._on_ollama_result(run_id, res))
+        worker.signals.error.connect(lambda e: self._on_ollama_error(run_id, e))
+        worker.signals.finished.connect(lambda: self._stage_finished(run_id, "ollama"))
+        self._start(worker, analysis=True)
+        self._render_result()
+
+    def _set_llm_status(self, status):
+        if self._llm_hs_id:
+            hs_id, self._llm_hs_id = self._llm_hs_id, None
+            update_llm_status(hs_id, status)
+
+    def _on_ml_result(self, run_id, text, payload):
+        if run_id != self._run_id:
+            return
+        self._ml_result, self._feedback_hs_id, decision = payload
+        if decision.run_llm:
+            # Emitted before the ml stage's finished signal, so the run stays open
+            self._running.add("ollama")
+            self._run_kind = "ml+ollama"
+            self._llm_hs_id = self._feedback_hs_id
+            self.status_label.setText("Model prediction ready, waiting for Ollama...")
+            self._start_ollama(run_id, text)
+        else:
+            self._llm_skipped = decision
+            self._ollama_state = "skipped"
+            self._render_result()
+
+    def _on_ml_error(self, run_id, error):
+        if run_id != self._run_id:
+            return
+        self._ml_error = str(error)
+        self._render_result()
 
-            ollama_text = (
-                f"Ollama Analysis\n"
-                f"AI: {ollama['ai']:.2f}% | Human: {ollama['human']:.2f}%\n"
-                f"Reason: {ollama['reason']}"
-            )
+    def _on_ollama_token(self, run_id, chunk):
+        if run_id != self._run_id:
+            return
+        self._ollama_stream.append(chunk)
+        # The streamed text ends the page, so append the token rather than
+        # rebuilding the whole page for every one
+        cursor = QTextCursor(self.result_box.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(chunk)
+
+    def _on_ollama_result(self, run_id, result):
+        if run_id != self._run_id:
+            return
+        self._ollama_state = "done"
+        self._ollama_result = result
+        self._set_llm_status(cascade.DONE)
+        self._render_result()
 
-            if any("Ollama Analysis" in line for line in lines):
-                start = next(i for i, l in enumerate(lines) if "Ollama Analysis" in l)
-                new_lines = lines[:start] + ollama_text.split("\n")
+    def _on_ollama_error(self, run_id, error):
+        if run_id != self._run_id:
+            return
+        self._ollama_state = "error"
+        self._ollama_result = {"reason": str(error)}
+        self._set_llm_status(cascade.FAILED)
+        self._render_result()
+
+    def _describe_score(self, result):
+        if result["label"] == "undecided":
+            return "UNDECIDED"
+        details = result["details"]
+        return f"<b>{result['label'].upper()}</b> (AI: {details['ai']:.2f}% | Human: {details['human']:.2f}%)"
+
+    def _render_pdf_docs(self):
+        from ai_checker import weighted_document_score
+
+        html = ""
+        for doc in self._pdf_docs:
+            pages = doc["pages"]
+            total = pages[-1]["pages"] if pages else 0
+            if doc["result"] is not None:
+                summary = self._describe_score(doc["result"])
             else:
-                new_lines = lines + ["", ollama_text]
+                # Running aggregate over the pages scored so far
+                partial = weighted_document_score([p["result"] for p in pages], [p["chars"] for p in pages])
+                summary = f"{self._describe_score(partial)} so far, {len(pages)} of {total} pages"
+            html += f"<b>{escape(os.path.basename(doc['file']))}</b>: {summary}<br>"
+            for p in pages:
+                html += f"&nbsp;&nbsp;Page {p['page']}: {self._describe_score(p['result'])}<br>"
+            html += "<br>"
+        return html
+
+    def _render_segments(self):
+        from segments import heatmap_html
+
+        text, segments, doc = self._segments
+        checked = sum(1 for s in segments if s["llm"] and s["llm"]["ai"] + s["llm"]["human"] > 0)
+        return (
+            f"<b>Segment Analysis</b><br>"
+            f"<u>Document:</u> {self._describe_score(doc)}<br>"
+            f"{len(segments)} segments, {checked} checked by Ollama. "
+            f"Green = human, red = AI, grey = too short to score.<br><br>"
+            f"{heatmap_html(text, segments)}"
+        )
 
-            self.result_box.setText("\n".join(new_lines))
+    def _render_result(self):
+        html = self._render_pdf_docs() if self._pdf_docs else ""
+        if self._segments is not None:
+            html += self._render_segments()
+        elif "segments" in self._running:
+            html += "<b>Segment Analysis</b><br>Analyzing...<br><br>"
+
+        if self._ml_result is not None:
+            result = self._ml_result
+            label = result["label"]
+            confidence = result["confidence"]
+            details = result["details"]
+
+            if label == "undecided":
+                html += (
+                    f"<b>System Prediction</b><br>"
+                    f"<u>Final Label:</u> <b>UNDECIDED</b> (text is too short for the model)<br><br>"
+                )
+            else:
+                html += (
+                    f"<b>System Prediction</b><br>"
+                    f"<u>Final Label:</u> <b>{label.upper()}</b> ({confidence:.2f}% confident)<br>"
+                    f"AI: {details['ai']:.2f}% | Human: {details['human']:.2f}%<br><br>"
+                )
+        elif self._ml_error is not None:
+            html += f"<b>System Prediction</b><br>Error: {escape(self._ml_error)}<br><br>"
+        elif "ml" in self._running:
+            html += "<b>System Prediction</b><br>Analyzing...<br><br>"
+
+        if self._ollama_state == "running":
+            streamed = escape("".join(self._ollama_stream)).replace("\n", "<br>")
+            html += f"<b>Ollama Analysis</b> (generating...)<br>{streamed}"
+        elif self._ollama_state == "done":
+            ollama = self._ollama_result
+            html += (
+                f"<b>Ollama Analysis</b><br>"
+                f"AI: {ollama['ai']:.2f}% | Human: {ollama['human']:.2f}%<br>"
+                f"Reason: {escape(ollama['reason'])}"
+            )
+        elif self._ollama_state == "error":
+            html += f"<b>Ollama Analysis</b><br>Failed to analyze: {escape(self._ollama_result['reason'])}"
+        elif self._ollama_state == "cancelled":
+            html += "<b>Ollama Analysis</b><br>Cancelled."
+        elif self._ollama_state == "skipped":
+            if self._llm_skipped.reason == cascade.SKIPPED_SHORT:
+                why = "the text is too short for a reliable verdict"
+            else:
+                why = "the model is confident enough"
+            html += f"<b>Ollama Analysis</b><br>Skipped: {why}. Use Reanalyze with Ollama to run it anyway."
 
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Failed to reanalyze: {e}")
+        self.result_box.setHtml(html)
 
     def ask_feedback(self, hs_id):
         msg = QMessageBox(self)
@@ -151,6 +549,20 @@ class MainAppWindow(QWidget):
             update_feedback(hs_id, "ai")
         elif msg.clickedButton() == human_button:
             update_feedback(hs_id, "human")
+        else:
+            return
+
+        # Fold new verdicts into the model in the background once enough have piled up
+        worker = Worker(_update_model_from_feedback)
+        worker.signals.result.connect(self._on_model_updated)
+        self._start(worker)
+
+    def _on_model_updated(self, update):
+        if update:
+            self.status_label.setText(
+                f"Model updated to version {update['version']} "
+                f"with {update['rows']} feedback entries ({update['duration']:.1f}s)."
+            )
 
     def open_history_window(self):
         self.history_window = HistoryWindow(self.user_id)
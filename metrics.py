@@ -0,0 +1,279 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# In-process latency metrics. Code is timed with span()/timed(); each span
+# name keeps a histogram of recent durations for p50/p95/p99. Quantities
+# that are not durations (batch sizes) go through record_value() and are
+# kept and exported separately. Optionally:
+#   TAUTHY_METRICS_PROM   Prometheus text file, rewritten after every analysis
+#                         (for node_exporter's textfile collector)
+#   TAUTHY_METRICS_JSONL  one JSON line per span, for offline analysis
+#   TAUTHY_SLOW_LOG       JSON lines for analyses slower than TAUTHY_SLOW_MS
+
+ENABLED = os.environ.get("TAUTHY_METRICS", "1") != "0"
+PROM_PATH = os.environ.get("TAUTHY_METRICS_PROM") or None
+JSONL_PATH = os.environ.get("TAUTHY_METRICS_JSONL") or None
+SLOW_LOG = os.environ.get("TAUTHY_SLOW_LOG", "logs/slow_requests.jsonl")
+SLOW_MS = float(os.environ.get("TAUTHY_SLOW_MS", 5000))
+
+# Percentiles are taken over the most recent samples of each span
+WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Count and sum of all observations plus a window of recent ones."""
+
+    def __init__(self, window=WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def quantile(self, q):
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+_histograms = {}
+_values = {}
+_lock = threading.Lock()
+_jsonl = None
+
+
+def observe(name, seconds, **fields):
+    """Record one duration under name; extra fields only go to the JSON lines export."""
+    if not ENABLED:
+        return
+    global _jsonl
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram()
+        hist.observe(seconds)
+        if JSONL_PATH:
+            if _jsonl is None:
+                _makedirs(JSONL_PATH)
+                _jsonl = open(JSONL_PATH, "a", encoding="utf-8")
+            _jsonl.write(json.dumps({"ts": round(time.time(), 3), "span": name,
+                                     "ms": round(seconds * 1000, 3), **fields}) + "\n")
+
+
+@contextmanager
+def span(name, **fields):
+    """Time the enclosed block as one observation of name."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **fields)
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_value(name, value):
+    """Record one observation of a quantity that is not a duration, e.g. a batch size."""
+    if not ENABLED:
+        return
+    with _lock:
+        hist = _values.get(name)
+        if hist is None:
+            hist = _values[name] = Histogram()
+        hist.observe(value)
+
+
+def peak_memory_mb():
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _summarize(hists):
+    return {
+        name: {"count": h.count, "sum": h.total,
+               **{f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES}}
+        for name, h in sorted(hists.items())
+    }
+
+
+def snapshot():
+    """{span: {"count", "sum", "p50", "p95", "p99"}}, durations in seconds."""
+    with _lock:
+        return _summarize(_histograms)
+
+
+def value_snapshot():
+    """Same as snapshot() for the quantities recorded with record_value()."""
+    with _lock:
+        return _summarize(_values)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _values.clear()
+
+
+def format_table(stats=None):
+    stats = snapshot() if stats is None else stats
+    lines = [f"{'span':<28} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'total s':>9}"]
+    for name, s in stats.items():
+        lines.append(f"{name:<28} {s['count']:>7} {s['p50'] * 1000:>9.2f} {s['p95'] * 1000:>9.2f} "
+                     f"{s['p99'] * 1000:>9.2f} {s['sum']:>9.2f}")
+    return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(stats=None, values=None):
+    """All spans as one Prometheus summary family, tauthy_span_seconds{span=...},
+    and recorded values as another, tauthy_value{name=...}."""
+    if stats is None:
+        stats = snapshot()
+        values = value_snapshot() if values is None else values
+    lines = [
+        "# HELP tauthy_span_seconds Duration of instrumented Tauthy stages.",
+        "# TYPE tauthy_span_seconds summary",
+    ]
+    for name, s in stats.items():
+        label = f'span="{_escape(name)}"'
+        for q in QUANTILES:
+            lines.append(f'tauthy_span_seconds{{{label},quantile="{q}"}} {s[f"p{int(q * 100)}"]:.6f}')
+        lines.append(f"tauthy_span_seconds_sum{{{label}}} {s['sum']:.6f}")
+        lines.append(f"tauthy_span_seconds_count{{{label}}} {s['count']}")
+    if values:
+        lines += [
+            "# HELP tauthy_value Distribution of instrumented Tauthy quantities other than durations.",
+            "# TYPE tauthy_value summary",
+        ]
+        for name, s in values.items():
+            label = f'name="{_escape(name)}"'
+            for q in QUANTILES:
+                lines.append(f'tauthy_value{{{label},quantile="{q}"}} {s[f"p{int(q * 100)}"]:g}')
+            lines.append(f"tauthy_value_sum{{{label}}} {s['sum']:g}")
+            lines.append(f"tauthy_value_count{{{label}}} {s['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _makedirs(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def write_prometheus(path=None):
+    """Atomically rewrite the Prometheus text file, if one is configured."""
+    path = path or PROM_PATH
+    if not path:
+        return
+    _makedirs(path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+def flush():
+    """Write out the exports; called after each analysis and at exit."""
+    with _lock:
+        if _jsonl is not None:
+            _jsonl.flush()
+    try:
+        write_prometheus()
+    except OSError as e:
+        print(f"Could not write metrics to {PROM_PATH}: {e}")
+
+
+def record_analysis(kind, seconds, text, stages=None):
+    """Observe a finished analysis and log it when it was slow.
+
+    `stages` maps stage names to seconds from the start of the analysis to
+    that stage's end. The slow log holds the input length and language, not
+    the text.
+    """
+    if not ENABLED:
+        return
+    observe(f"analysis.{kind}", seconds, chars=len(text))
+    if seconds * 1000 >= SLOW_MS and SLOW_LOG:
+        from language_id import detect
+
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "kind": kind,
+            "ms": round(seconds * 1000, 1),
+            "chars": len(text),
+            "lang": detect(text),
+            "stages": {k: round(v * 1000, 1) for k, v in (stages or {}).items()},
+        }
+        try:
+            _makedirs(SLOW_LOG)
+            with _lock, open(SLOW_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Could not write slow request log: {e}")
+    flush()
+
+
+def summarize_jsonl(path):
+    """Rebuild per-span statistics from a TAUTHY_METRICS_JSONL file."""
+    hists = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            hists.setdefault(event["span"], Histogram(window=None)).observe(event["ms"] / 1000)
+    return {
+        name: {"count": h.count, "sum": h.total, **{f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES}}
+        for name, h in sorted(hists.items())
+    }
+
+
+atexit.register(flush)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarise span latencies from a metrics JSON lines file.")
+    parser.add_argument("jsonl", nargs="?", default=JSONL_PATH, help="file written via TAUTHY_METRICS_JSONL")
+    parser.add_argument("--prometheus", action="store_true", help="print in Prometheus text format")
+    args = parser.parse_args()
+    if not args.jsonl:
+        parser.error("no file given and TAUTHY_METRICS_JSONL is not set")
+
+    stats = summarize_jsonl(args.jsonl)
+    print(prometheus_text(stats) if args.prometheus else format_table(stats))
@@ -1,18 +1,47 @@
-import requests
+import hashlib
 import json
+import os
 import re
-import pandas as pd
-import random
-from langdetect import detect_langs
+import time
+from functools import lru_cache
+import language_id
+import metrics
+from ollama_client import OllamaError, get_client
+from ref_index import get_index
+from result_cache import get_cache
+
+# "nearest": few-shot examples retrieved by similarity (falls back to random
+# when the index is not built); "random": the fixed random sample per language;
+# "pinned": one fixed example set per language, taken from PINNED_EXAMPLES when
+# that file exists, so the whole prompt up to the target text is reusable by
+# Ollama's prompt cache
+FEWSHOT_MODE = os.environ.get("TAUTHY_FEWSHOT_MODE", "nearest")
+# {"th": {"ai": [...], "human": [...]}, "en": {...}}
+PINNED_EXAMPLES = os.environ.get("TAUTHY_PINNED_EXAMPLES", "data/pinned_examples.json")
+# Load the model and prefill the system prompt when the app starts
+WARM_UP_LLM = os.environ.get("TAUTHY_OLLAMA_WARM_UP", "1") != "0"
 
 def detect_language(text):
+    return language_id.detect(text)
+
+def warm_up():
+    """Load the language detector ahead of the first analysis."""
+    language_id.warm_up()
+
+def warm_up_llm():
+    """Have Ollama load the model and evaluate the system prompt.
+
+    A one-token chat with only the system message leaves the model resident
+    for the client's keep_alive and the instructions in Ollama's prompt
+    cache, so the first real analysis only pays for its own examples and
+    text. Failures are reported and ignored; the app works without it.
+    """
+    if not WARM_UP_LLM:
+        return
     try:
-        langs = detect_langs(text)
-        if langs and langs[0].prob >= 0.9:
-            return langs[0].lang
-    except:
-        pass
-    return "unknown"
+        get_client().chat([{"role": "system", "content": SYSTEM_PROMPT}], options={"num_predict": 1})
+    except OllamaError as e:
+        print(f"Ollama warm-up skipped: {e}")
 
 def clamp_confidence(ai, human):
     total = ai + human
@@ -23,112 +52,139 @@ def clamp_confidence(ai, human):
     human_clamped = 100.0 - ai_clamped
     return round(ai_clamped, 2), round(human_clamped, 2)
 
-def filter_by_language(df, lang, n_each=20):
-    # 🔹 สุ่มเยอะๆ แล้วเลือกเฉพาะที่ตรงกับ lang
-    ai_pool = df[df['label'] == 'ai'].sample(n=100, random_state=1)['text'].tolist()
-    human_pool = df[df['label'] == 'human'].sample(n=100, random_state=2)['text'].tolist()
-
-    def filter_lang(pool):
-        filtered = []
-        for t in pool:
-            if detect_language(t) == lang:
-                filtered.append(t)
-            if len(filtered) >= n_each:
-                break
-        return filtered
-
-    ai_filtered = filter_lang(ai_pool)
-    human_filtered = filter_lang(human_pool)
+def filter_by_language(lang, n_each=20):
+    # 🔹 ดึงตัวอย่างจาก index ที่แยกภาษาไว้แล้ว (ไม่ต้องอ่าน train.csv ทั้งไฟล์)
+    index = get_index()
+    ai_filtered = index.sample(lang, "ai", n_each, seed=1)
+    human_filtered = index.sample(lang, "human", n_each, seed=2)
 
     if len(ai_filtered) < n_each or len(human_filtered) < n_each:
         raise ValueError(f"Not enough {lang} examples in train.csv")
 
     return ai_filtered, human_filtered
 
-def query_ollama(text):
-    # 🔹 ตรวจภาษาต้นทาง
-    lang_input = detect_language(text)
-    print(f"Detected input language: {lang_input}")
-
-    if lang_input == "unknown":
-        raise ValueError("Cannot detect language confidently.")
-
-    df = pd.read_csv("data/train.csv")
-
-    ai_examples, human_examples = filter_by_language(df, lang_input)
+@lru_cache(maxsize=None)
+def pinned_examples(lang):
+    """The fixed example set for a language, identical on every call."""
+    from fewshot_index import K, fit_to_budget
 
+    examples = None
+    try:
+        with open(PINNED_EXAMPLES, encoding="utf-8") as f:
+            examples = json.load(f).get(lang)
+    except (OSError, ValueError):
+        pass
+    if not examples or not examples.get("ai") or not examples.get("human"):
+        ai_examples, human_examples = filter_by_language(lang, n_each=K)
+        examples = {"ai": ai_examples, "human": human_examples}
+
+    examples = fit_to_budget({"ai": list(examples["ai"]), "human": list(examples["human"])})
+    return tuple(examples["ai"]), tuple(examples["human"])
+
+def select_examples(text, lang):
+    """Reference examples for the prompt, fitted to the few-shot token budget.
+
+    The k training examples per class most similar to the text when the
+    few-shot index is built, otherwise k random ones of the same language.
+    In "pinned" mode, the language's fixed example set.
+    """
+    from fewshot_index import K, fit_to_budget, get_fewshot_index
+
+    if FEWSHOT_MODE == "pinned":
+        ai_examples, human_examples = pinned_examples(lang)
+        return list(ai_examples), list(human_examples)
+
+    index = get_fewshot_index() if FEWSHOT_MODE == "nearest" else None
+    examples = None
+    if index is not None:
+        examples = index.nearest(text, lang, K)
+    if examples is None or len(examples["ai"]) < K or len(examples["human"]) < K:
+        ai_examples, human_examples = filter_by_language(lang, n_each=K)
+        examples = {"ai": ai_examples, "human": human_examples}
+
+    examples = fit_to_budget(examples)
+    return examples["ai"], examples["human"]
+
+# Everything that does not depend on the analysed text comes first and is sent
+# as the system message, so Ollama can reuse its evaluated prefix between requests
+SYSTEM_PROMPT = (
+    "You are an advanced linguistic analyst specializing in detecting whether texts are human-written "
+    "or generated by Large Language Models (such as GPT, LLaMA, Mistral, Claude, etc.). Your analysis "
+    "will directly influence critical decisions on a global platform used by millions of users.\n\n"
+
+    "You will receive REFERENCE EXAMPLES carefully selected to represent linguistic patterns typical "
+    "of human writing and AI-generated texts IN THE SAME LANGUAGE as the TARGET TEXT. Examine them thoroughly.\n\n"
+
+    "==================\n"
+    "ANALYSIS INSTRUCTIONS\n"
+    "==================\n"
+    "Analyze the TARGET TEXT focusing strictly on the following linguistic and stylistic indicators:\n\n"
+
+    "1. **Syntactic Patterns and Structure:**\n"
+    "   - AI-generated texts often exhibit overly uniform or repetitive sentence structures and perfect grammar.\n"
+    "   - Human texts typically show natural variability, including occasional informal phrasing, grammatical errors, and mixed sentence lengths.\n\n"
+
+    "2. **Lexical Appropriateness and Vocabulary Usage:**\n"
+    "   - AI-generated texts frequently misuse advanced, technical, or formal vocabulary in inappropriate contexts or may repeat unusual terms excessively.\n"
+    "   - Human writers use contextually appropriate vocabulary, idiomatic expressions, slang, and subtle word variations naturally.\n\n"
+
+    "3. **Semantic Coherence and Logical Flow:**\n"
+    "   - AI-generated texts can display unnatural topic shifts, repeated filler content, overly explicit clarifications, or logically coherent but contextually irrelevant details.\n"
+    "   - Human texts, even if tangential, maintain contextual relevance and logical consistency at a deeper level.\n\n"
+
+    "4. **Style, Intent, and Pragmatic Purpose:**\n"
+    "   - Human-written texts exhibit clear communicative intent, context-driven emotions, humor, irony, or pragmatically purposeful language.\n"
+    "   - AI-generated texts might imitate stylistic elements superficially but often lack genuine pragmatic purpose, emotional authenticity, or nuance.\n\n"
+
+    "5. **Special Cases and Edge Scenarios:**\n"
+    "   - Extremely short texts (less than one sentence) or texts composed mostly of emojis or special characters may indicate human authorship unless unusually uniform or repetitive.\n"
+    "   - Texts with overt hallucinations, factual inconsistencies, or clearly unnatural repetitions strongly suggest AI generation.\n\n"
+
+    "==================\n"
+    "CONFIDENCE THRESHOLD & EDGE CASE HANDLING\n"
+    "==================\n"
+    "- Only return a definitive classification if you have at least 75% confidence in your analysis.\n"
+    "- Never return exactly 0% or 100% for either class. Even if you are highly confident, keep values within the range of 1.00% to 99.00%.\n"
+    "- If you are unsure (confidence less than 75%), label confidence percentages accordingly and mention uncertainty in the reason.\n"
+
+    "==================\n"
+    "EXAMPLE OUTPUT FORMAT\n"
+    "==================\n"
+    "Example:\n"
+    "{\n"
+    "  \"ai\": 88.5,\n"
+    "  \"human\": 11.5,\n"
+    "  \"reason\": \"Text shows robotic phrasing and consistent structure (Point 1). Vocabulary was overly formal (Point 2).\"\n"
+    "}\n\n"
+
+    "==================\n"
+    "RESPONSE FORMAT (STRICT)\n"
+    "==================\n"
+    "Respond strictly with ONLY a JSON object following this exact format, without ANY additional text or explanation:\n\n"
+    "{\n"
+    "  \"ai\": <confidence_percentage>,\n"
+    "  \"human\": <confidence_percentage>,\n"
+    "  \"reason\": \"Detailed linguistic explanation explicitly referencing the analysis indicators above.\"\n"
+    "}"
+)
+
+def build_user_message(text, ai_examples, human_examples):
+    """Reference examples followed by the target text.
+
+    The examples come first: with pinned examples they are the same for
+    every text of a language and extend the cached prefix.
+    """
     reference_examples = "\n\n".join(
         [f"[AI EXAMPLE {i+1}]: {ex}" for i, ex in enumerate(ai_examples)] +
         [f"[HUMAN EXAMPLE {i+1}]: {ex}" for i, ex in enumerate(human_examples)]
     )
-    
-    print(reference_examples)
-
-    prompt = (
-        "You are an advanced linguistic analyst specializing in detecting whether texts are human-written "
-        "or generated by Large Language Models (such as GPT, LLaMA, Mistral, Claude, etc.). Your analysis "
-        "will directly influence critical decisions on a global platform used by millions of users.\n\n"
-
-        "You will receive REFERENCE EXAMPLES carefully selected to represent linguistic patterns typical "
-        "of human writing and AI-generated texts IN THE SAME LANGUAGE as the TARGET TEXT. Examine them thoroughly.\n\n"
 
+    return (
         "==================\n"
         "REFERENCE EXAMPLES\n"
         "==================\n\n"
         f"{reference_examples}\n\n"
 
-        "==================\n"
-        "ANALYSIS INSTRUCTIONS\n"
-        "==================\n"
-        "Analyze the TARGET TEXT focusing strictly on the following linguistic and stylistic indicators:\n\n"
-
-        "1. **Syntactic Patterns and Structure:**\n"
-        "   - AI-generated texts often exhibit overly uniform or repetitive sentence structures and perfect grammar.\n"
-        "   - Human texts typically show natural variability, including occasional informal phrasing, grammatical errors, and mixed sentence lengths.\n\n"
-
-        "2. **Lexical Appropriateness and Vocabulary Usage:**\n"
-        "   - AI-generated texts frequently misuse advanced, technical, or formal vocabulary in inappropriate contexts or may repeat unusual terms excessively.\n"
-        "   - Human writers use contextually appropriate vocabulary, idiomatic expressions, slang, and subtle word variations naturally.\n\n"
-
-        "3. **Semantic Coherence and Logical Flow:**\n"
-        "   - AI-generated texts can display unnatural topic shifts, repeated filler content, overly explicit clarifications, or logically coherent but contextually irrelevant details.\n"
-        "   - Human texts, even if tangential, maintain contextual relevance and logical consistency at a deeper level.\n\n"
-
-        "4. **Style, Intent, and Pragmatic Purpose:**\n"
-        "   - Human-written texts exhibit clear communicative intent, context-driven emotions, humor, irony, or pragmatically purposeful language.\n"
-        "   - AI-generated texts might imitate stylistic elements superficially but often lack genuine pragmatic purpose, emotional authenticity, or nuance.\n\n"
-
-        "5. **Special Cases and Edge Scenarios:**\n"
-        "   - Extremely short texts (less than one sentence) or texts composed mostly of emojis or special characters may indicate human authorship unless unusually uniform or repetitive.\n"
-        "   - Texts with overt hallucinations, factual inconsistencies, or clearly unnatural repetitions strongly suggest AI generation.\n\n"
-
-        "==================\n"
-        "CONFIDENCE THRESHOLD & EDGE CASE HANDLING\n"
-        "==================\n"
-        "- Only return a definitive classification if you have at least 75% confidence in your analysis.\n"
-        "- Never return exactly 0% or 100% for either class. Even if you are highly confident, keep values within the range of 1.00% to 99.00%.\n"
-        "- If you are unsure (confidence less than 75%), label confidence percentages accordingly and mention uncertainty in the reason.\n"
-
-        "==================\n"
-        "EXAMPLE OUTPUT FORMAT\n"
-        "==================\n"
-        "Example:\n"
-        "{\n"
-        "  \"ai\": 88.5,\n"
-        "  \"human\": 11.5,\n"
-        "  \"reason\": \"Text shows robotic phrasing and consistent structure (Point 1). Vocabulary was overly formal (Point 2).\"\n"
-        "}\n\n"
-
-        "==================\n"
-        "RESPONSE FORMAT (STRICT)\n"
-        "==================\n"
-        "Respond strictly with ONLY a JSON object following this exact format, without ANY additional text or explanation:\n\n"
-        "{\n"
-        "  \"ai\": <confidence_percentage>,\n"
-        "  \"human\": <confidence_percentage>,\n"
-        "  \"reason\": \"Detailed linguistic explanation explicitly referencing the analysis indicators above.\"\n"
-        "}\n\n"
-
         "==================\n"
         "TARGET TEXT TO ANALYZE\n"
         "==================\n"
@@ -137,18 +193,20 @@ def query_ollama(text):
         "Now, respond ONLY with the JSON object as specified."
     )
 
+def build_messages(text, ai_examples, human_examples):
+    """Chat messages for /api/chat: the fixed system prompt, then the request."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_message(text, ai_examples, human_examples)},
+    ]
 
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "llama3.2",
-                "prompt": prompt,
-                "stream": False
-            }
-        )
+def build_prompt(text, ai_examples, human_examples):
+    """The same request as a single /api/generate prompt."""
+    return SYSTEM_PROMPT + "\n\n" + build_user_message(text, ai_examples, human_examples)
 
-        raw = response.json().get("response", "").strip()
+def parse_response(raw):
+    try:
+        raw = raw.strip()
         json_str = re.search(r'\{.*\}', raw, re.DOTALL)
 
         if json_str:
@@ -181,5 +239,67 @@ def query_ollama(text):
             "ai": 0.0,
             "human": 0.0,
             "reason": f"Error or malformed JSON: {e}",
+            "raw": raw
+        }
+
+@lru_cache(maxsize=1)
+def prompt_version():
+    """Hash of the model name and prompt template; changes invalidate cached results."""
+    from fewshot_index import K, TOKEN_BUDGET
+
+    template = json.dumps(build_messages("{text}", ["{ai}"], ["{human}"]))
+    selection = f"{FEWSHOT_MODE}:{K}:{TOKEN_BUDGET}"
+    return hashlib.sha1(f"{get_client().model}\0{template}\0{selection}".encode("utf-8")).hexdigest()[:16]
+
+@metrics.timed("ollama.query")
+def query_ollama(text, on_token=None, use_cache=True):
+    cache = get_cache()
+    if use_cache:
+        cached = cache.get("ollama", prompt_version(), text)
+        if cached is not None:
+            print("Ollama result served from cache")
+            return cached
+
+    # 🔹 ตรวจภาษาต้นทาง
+    with metrics.span("ollama.detect_language"):
+        lang_input = detect_language(text)
+    print(f"Detected input language: {lang_input}")
+
+    if lang_input == "unknown":
+        raise ValueError("Cannot detect language confidently.")
+
+    with metrics.span("ollama.select_examples"):
+        ai_examples, human_examples = select_examples(text, lang_input)
+        messages = build_messages(text, ai_examples, human_examples)
+
+    try:
+        client = get_client()
+        with metrics.span("ollama.request", chars=len(text), lang=lang_input):
+            if on_token is None:
+                raw = client.chat(messages)
+            else:
+                # 🔹 stream ทีละ token ให้ UI แสดงผลระหว่างรอ
+                started = time.perf_counter()
+                parts = []
+                for chunk in client.stream_chat(messages):
+                    if not parts:
+                        metrics.observe("ollama.first_token", time.perf_counter() - started)
+                    parts.append(chunk)
+                    on_token(chunk)
+                raw = "".join(parts)
+    except OllamaError as e:
+        return {
+            "ai": 0.0,
+            "human": 0.0,
+            "reason": f"Ollama request failed: {e}",
             "raw": ""
         }
+
+    with metrics.span("ollama.parse"):
+        result = parse_response(raw)
+
+    # 🔹 เก็บเฉพาะผลที่ parse ได้จริง
+    if use_cache and result["ai"] + result["human"] > 0:
+        cache.put("ollama", prompt_version(), text, result)
+
+    return result
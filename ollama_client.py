@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2")
+
+CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", 3.0))
+# Per-read timeout: for streaming this is the longest allowed gap between tokens
+READ_TIMEOUT = float(os.environ.get("OLLAMA_READ_TIMEOUT", 300.0))
+MAX_RETRIES = int(os.environ.get("OLLAMA_MAX_RETRIES", 2))
+# How long Ollama keeps the model loaded after a request ("30m", "1h", seconds,
+# -1 = forever); empty leaves it to the server's default
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m") or None
+if KEEP_ALIVE and KEEP_ALIVE.lstrip("-").isdigit():
+    KEEP_ALIVE = int(KEEP_ALIVE)
+RETRY_BACKOFF = 0.5
+POOL_SIZE = 4
+
+
+class OllamaError(Exception):
+    """Raised when the Ollama server cannot be reached or returns an error."""
+
+
+class OllamaClient:
+    """Keep-alive HTTP client for the Ollama REST API.
+
+    Connections are pooled in a requests.Session, every request has a
+    connect and read timeout, and connection failures / 5xx responses are
+    retried a bounded number of times with exponential backoff. Retries only
+    happen before the first byte of a response is consumed, so a stream is
+    never replayed halfway through.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, model=OLLAMA_MODEL,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_retries=MAX_RETRIES, backoff=RETRY_BACKOFF, pool_size=POOL_SIZE,
+                 keep_alive=KEEP_ALIVE):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def _post(self, path, payload, stream=False):
+        url = f"{self.base_url}{path}"
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, stream=stream)
+                if response.status_code < 500 or attempt >= self.max_retries:
+                    if response.status_code >= 400:
+                        body = response.text[:200]
+                        response.close()
+                        raise OllamaError(f"Ollama returned HTTP {response.status_code}: {body}")
+                    return response
+                response.close()
+                error = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise OllamaError(f"Ollama request to {url} failed: {e}") from e
+                error = str(e)
+
+            attempt += 1
+            delay = self.backoff * (2 ** (attempt - 1))
+            print(f"Ollama request failed ({error}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def _payload(self, stream, **fields):
+        payload = {"model": self.model, "stream": stream, **fields}
+        if self.keep_alive is not None:
+            payload.setdefault("keep_alive", self.keep_alive)
+        return payload
+
+    def _read(self, path, payload, key):
+        response = self._post(path, payload)
+        try:
+            return key(response.json())
+        except ValueError as e:
+            raise OllamaError(f"Malformed response from Ollama: {e}") from e
+        finally:
+            response.close()
+
+    def _stream(self, path, payload, key):
+        response = self._post(path, payload, stream=True)
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise OllamaError(chunk["error"])
+                text = key(chunk)
+                if text:
+                    yield text
+                if chunk.get("done"):
+                    break
+        except (requests.RequestException, ValueError) as e:
+            raise OllamaError(f"Ollama stream interrupted: {e}") from e
+        finally:
+            response.close()
+
+    def generate(self, prompt, **options):
+        """Run a non-streaming generation and return the full response text."""
+        payload = self._payload(False, prompt=prompt, **options)
+        return self._read("/api/generate", payload, lambda body: body.get("response", ""))
+
+    def stream_generate(self, prompt, **options):
+        """Yield response fragments as Ollama produces them."""
+        payload = self._payload(True, prompt=prompt, **options)
+        return self._stream("/api/generate", payload, lambda chunk: chunk.get("response"))
+
+    def chat(self, messages, **options):
+        """Run a non-streaming chat completion and return the reply text."""
+        payload = self._payload(False, messages=messages, **options)
+        return self._read("/api/chat", payload, lambda body: (body.get("message") or {}).get("content", ""))
+
+    def stream_chat(self, messages, **options):
+        """Yield chat reply fragments as Ollama produces them.
+
+        Keeping the system message and any other fixed leading messages
+        identical between calls lets Ollama reuse their cached prefix.
+        """
+        payload = self._payload(True, messages=messages, **options)
+        return self._stream("/api/chat", payload, lambda chunk: (chunk.get("message") or {}).get("content"))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Shared client so every analysis reuses the same connection pool."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
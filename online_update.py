@@ -0,0 +1,186 @@
+import copy
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+import joblib
+from sklearn.linear_model import SGDClassifier
+import ai_checker
+import compact_model
+from database import count_feedback_since, get_feedback_since, init_db, record_model_update
+from result_cache import file_fingerprint
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+BATCH_SIZE = 32
+# Feedback rows read from the database at a time
+PAGE_ROWS = 1000
+# The app only starts a background update once this many new verdicts exist
+MIN_ROWS = int(os.environ.get("TAUTHY_ONLINE_MIN_ROWS", 10))
+# Small constant step so a handful of verdicts nudges the model rather than overwriting it
+LEARNING_RATE = 0.01
+
+# Guards updates within this process; _model_file_lock guards them across app instances
+_update_lock = threading.Lock()
+
+
+def _to_online(model):
+    """Return an SGD copy of the classifier that supports partial_fit."""
+    if isinstance(model, SGDClassifier):
+        online = copy.deepcopy(model)
+        online.set_params(learning_rate="constant", eta0=LEARNING_RATE)
+        return online
+
+    if not hasattr(model, "coef_"):
+        raise TypeError(f"Cannot update {type(model).__name__} incrementally.")
+
+    # A binary LogisticRegression and a log-loss SGDClassifier with the same
+    # weights give identical probabilities, so the model can continue as SGD
+    online = SGDClassifier(loss="log_loss", alpha=1e-6, learning_rate="constant", eta0=LEARNING_RATE)
+    online.classes_ = model.classes_.copy()
+    online.coef_ = model.coef_.copy()
+    online.intercept_ = model.intercept_.copy()
+    online.n_features_in_ = model.n_features_in_
+    return online
+
+
+def _save_atomic(model_data, path):
+    tmp_path = path + ".tmp"
+    joblib.dump(model_data, tmp_path)
+    os.replace(tmp_path, path)
+
+    # Keep the compact copy in step, or ai_checker falls back to the pickle
+    compact_path = compact_model.path_for(path)
+    try:
+        compact_model.export(model_data, compact_path, source=path)
+    except ValueError:
+        if os.path.exists(compact_path):
+            os.remove(compact_path)
+
+
+def checkpoint_path_for(model_path):
+    """Sidecar holding the model's feedback checkpoint: models/ai_model.feedback.json."""
+    root, _ = os.path.splitext(model_path)
+    return root + ".feedback.json"
+
+
+def _read_checkpoint(model_path):
+    """The model's feedback_seq without unpickling it, or None when unknown.
+
+    The sidecar records the fingerprint of the pickle it was written for, so
+    a model replaced by the trainer is never matched with an old checkpoint.
+    """
+    try:
+        with open(checkpoint_path_for(model_path), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("model") != file_fingerprint(model_path):
+        return None
+    return data.get("feedback_seq")
+
+
+def _write_checkpoint(model_path, feedback_seq):
+    path = checkpoint_path_for(model_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"model": file_fingerprint(model_path), "feedback_seq": feedback_seq}, f)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _model_file_lock(model_path):
+    """Exclusive lock on the model across processes; yields False when another holds it."""
+    with open(model_path + ".lock", "a+b") as f:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            yield False
+            return
+        # Released when the file is closed
+        yield True
+
+
+def update_model(model_path=None, batch_size=BATCH_SIZE, min_rows=1):
+    """Absorb feedback given since the model's checkpoint, in small partial_fit batches.
+
+    Returns {'version', 'rows', 'duration'} or None when there was not enough
+    new feedback or another update (in this or another process) is running.
+    """
+    if not _update_lock.acquire(blocking=False):
+        return None
+    try:
+        model_path = model_path or ai_checker.model_path
+        with _model_file_lock(model_path) as locked:
+            if not locked:
+                return None
+            return _update_locked(model_path, batch_size, min_rows)
+    finally:
+        _update_lock.release()
+
+
+def _update_locked(model_path, batch_size, min_rows):
+    started = time.time()
+
+    # Most calls find too little new feedback; answer those without loading the model
+    feedback_seq = _read_checkpoint(model_path)
+    if feedback_seq is not None and count_feedback_since(feedback_seq) < min_rows:
+        return None
+
+    model_data = joblib.load(model_path)
+    vectorizer = model_data['vectorizer']
+    feedback_seq = model_data.get('feedback_seq', 0)
+
+    if count_feedback_since(feedback_seq) < min_rows:
+        _write_checkpoint(model_path, feedback_seq)
+        return None
+
+    model = _to_online(model_data['model'])
+    total = 0
+    # Read a page at a time so a large backlog of feedback is never all in memory
+    while True:
+        rows = get_feedback_since(feedback_seq, limit=PAGE_ROWS)
+        if not rows:
+            break
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            texts = [ai_checker.clean_text(r['hs_input_text']) for r in batch]
+            labels = [r['hs_user_feedback'] for r in batch]
+            model.partial_fit(vectorizer.transform(texts), labels)
+        feedback_seq = rows[-1]['hs_feedback_seq']
+        total += len(rows)
+
+    version = model_data.get('version', 0) + 1
+    _save_atomic(dict(model_data, model=model, version=version, feedback_seq=feedback_seq), model_path)
+    _write_checkpoint(model_path, feedback_seq)
+
+    duration = time.time() - started
+    record_model_update(version, total, duration)
+    if os.path.abspath(model_path) == os.path.abspath(ai_checker.model_path):
+        ai_checker.reload_model()
+
+    print(f"Model updated to version {version}: {total} feedback rows in {duration:.2f}s")
+    return {"version": version, "rows": total, "duration": duration}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Update the classifier from user feedback in history.")
+    parser.add_argument("--model", default=ai_checker.model_path)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--min-rows", type=int, default=1, help="skip the update below this many new rows")
+    args = parser.parse_args()
+
+    init_db()
+    if update_model(args.model, args.batch_size, args.min_rows) is None:
+        print("No new feedback to learn from.")
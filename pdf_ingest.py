@@ -0,0 +1,150 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import ai_checker
+
+# PyMuPDF is imported on first use; it is only needed once a PDF is opened.
+
+# Documents with at least this many pages are extracted by the process pool
+PARALLEL_MIN_PAGES = int(os.environ.get("TAUTHY_PDF_PARALLEL_MIN_PAGES", 40))
+PAGES_PER_TASK = 16
+WORKERS = int(os.environ.get("TAUTHY_PDF_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+# Pages scored together in one predict_proba call, and reported together
+SCORE_BATCH = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def find_pdfs(paths):
+    """Expand files and folders (recursively) into a sorted list of PDF files."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".pdf"))
+        elif path.lower().endswith(".pdf"):
+            found.append(path)
+    return list(dict.fromkeys(found))
+
+
+def _extract_range(path, start, stop):
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as doc:
+        return [doc.load_page(i).get_text() for i in range(start, stop)]
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: extraction is started from GUI worker threads, where fork is unsafe
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def iter_pages(path, workers=None):
+    """Yield (page_number, page_count, text) for every page, in order.
+
+    Small documents are read page by page in this process. Large ones are
+    split into page ranges that the process pool extracts in parallel; pages
+    are still yielded in order as soon as their range is done.
+    """
+    import fitz  # PyMuPDF
+
+    workers = WORKERS if workers is None else workers
+    with fitz.open(path) as doc:
+        count = doc.page_count
+        if workers <= 1 or count < PARALLEL_MIN_PAGES or multiprocessing.parent_process() is not None:
+            for i in range(count):
+                yield i + 1, count, doc.load_page(i).get_text()
+            return
+
+    pool = _get_pool()
+    starts = range(0, count, PAGES_PER_TASK)
+    futures = [pool.submit(_extract_range, path, s, min(s + PAGES_PER_TASK, count)) for s in starts]
+    try:
+        for start, future in zip(starts, futures):
+            for offset, text in enumerate(future.result()):
+                yield start + offset + 1, count, text
+    finally:
+        # Stopped early (cancelled or failed): drop the ranges not started yet
+        for future in futures:
+            future.cancel()
+
+
+def _score_pages(path, pages):
+    results = ai_checker.predict_texts([text for _, _, text in pages], batch_size=len(pages))
+    return [
+        {"file": path, "page": page, "pages": count, "chars": len(text.strip()), "result": result}
+        for (page, count, text), result in zip(pages, results)
+    ]
+
+
+def score_pdf(path, workers=None):
+    """Score a PDF page by page, yielding events as they become available.
+
+    {"type": "pages", "file", "pages": [page results]} for every batch of
+    pages, then {"type": "document", "file", "pages", "text", "result"} with
+    the length-weighted aggregate over all pages.
+    """
+    page_results = []
+    texts = []
+    batch = []
+
+    def flush():
+        scored = _score_pages(path, batch)
+        page_results.extend(scored)
+        batch.clear()
+        return {"type": "pages", "file": path, "pages": scored}
+
+    for page in iter_pages(path, workers):
+        batch.append(page)
+        texts.append(page[2])
+        if len(batch) >= SCORE_BATCH:
+            yield flush()
+    if batch:
+        yield flush()
+
+    yield {
+        "type": "document",
+        "file": path,
+        "pages": len(page_results),
+        "text": "\n".join(texts),
+        "result": ai_checker.weighted_document_score(
+            [p["result"] for p in page_results], [p["chars"] for p in page_results]
+        ),
+    }
+
+
+def score_pdfs(paths, workers=None):
+    """score_pdf over every PDF in the given files and folders, one after another."""
+    for path in find_pdfs(paths):
+        yield from score_pdf(path, workers)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score PDF files page by page with the sklearn model.")
+    parser.add_argument("paths", nargs="+", help="PDF files or folders")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="processes for extracting large PDFs")
+    parser.add_argument("--pages", action="store_true", help="print every page's score")
+    args = parser.parse_args()
+
+    def describe(result):
+        if result["label"] == "undecided":
+            return "undecided"
+        return f"{result['label']} ({result['confidence']:.2f}%)"
+
+    for event in score_pdfs(args.paths, args.workers):
+        if event["type"] == "pages" and args.pages:
+            for p in event["pages"]:
+                print(f"   page {p['page']}/{p['pages']}: {describe(p['result'])}, {p['chars']} chars")
+        elif event["type"] == "document":
+            print(f"{event['file']}: {describe(event['result'])} over {event['pages']} pages")
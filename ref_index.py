@@ -0,0 +1,304 @@
+import csv
+import hashlib
+import io
+import os
+import random
+import sqlite3
+import threading
+import time
+
+TRAIN_CSV = "data/train.csv"
+INDEX_VERSION = "2"
+
+# The head of a document is enough to decide its language
+DETECT_CHARS = 1000
+
+
+def default_index_path(csv_path):
+    root, _ = os.path.splitext(csv_path)
+    return root + ".idx.sqlite"
+
+
+def _iter_records(f):
+    """Yield (offset, raw_bytes) for each CSV record, honouring quoted newlines."""
+    pos = 0
+    start = 0
+    buf = []
+    quotes = 0
+    for line in f:
+        if not buf:
+            start = pos
+        pos += len(line)
+        buf.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            yield start, b"".join(buf)
+            buf = []
+            quotes = 0
+    if buf:
+        yield start, b"".join(buf)
+
+
+def _parse_record(raw):
+    rows = list(csv.reader(io.StringIO(raw.decode("utf-8", errors="replace"))))
+    return rows[0] if rows else []
+
+
+class ReferenceIndex:
+    """On-disk index of train.csv rows by language and label.
+
+    The CSV itself stays the source of truth; the index only keeps the
+    language tag, label, text length and byte offset of every row so
+    reference examples can be pulled without parsing the whole file.
+    """
+
+    def __init__(self, csv_path=TRAIN_CSV, index_path=None):
+        self.csv_path = csv_path
+        self.index_path = index_path or default_index_path(csv_path)
+        self._lock = threading.Lock()
+        self._checked = None
+
+    def _connect(self, path=None):
+        conn = sqlite3.connect(path or self.index_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _read_meta(self):
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute("SELECT key, value FROM meta").fetchall()
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            return None
+        return {row["key"]: row["value"] for row in rows}
+
+    def _file_hash(self):
+        h = hashlib.sha1()
+        with open(self.csv_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    def is_fresh(self):
+        """Return True if the index matches the current CSV on disk."""
+        meta = self._read_meta()
+        if not meta or meta.get("version") != INDEX_VERSION:
+            return False
+
+        st = os.stat(self.csv_path)
+        if meta.get("csv_size") != str(st.st_size):
+            return False
+        if meta.get("csv_mtime_ns") == str(st.st_mtime_ns):
+            return True
+
+        # mtime moved (copy, touch, checkout) - only rebuild if content changed
+        if meta.get("csv_sha1") != self._file_hash():
+            return False
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE meta SET value = ? WHERE key = 'csv_mtime_ns'",
+                    (str(st.st_mtime_ns),),
+                )
+        finally:
+            conn.close()
+        return True
+
+    def ensure_fresh(self):
+        """Build or rebuild the index if the CSV changed since the last build."""
+        with self._lock:
+            if not os.path.exists(self.csv_path):
+                raise FileNotFoundError(f"Training data not found: {self.csv_path}")
+
+            st = os.stat(self.csv_path)
+            stamp = (st.st_size, st.st_mtime_ns)
+            if self._checked == stamp:
+                return
+
+            if not self.is_fresh():
+                self.build()
+            self._checked = stamp
+
+    def build(self):
+        """Scan the CSV once and write a fresh index next to it."""
+        from language_id import detect_many
+
+        started = time.time()
+        st = os.stat(self.csv_path)
+        tmp_path = self.index_path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        conn = self._connect(tmp_path)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute('''
+            CREATE TABLE examples (
+                row_id INTEGER PRIMARY KEY,
+                label TEXT NOT NULL,
+                lang TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                offset INTEGER NOT NULL
+            )
+        ''')
+
+        sha1 = hashlib.sha1()
+        count = 0
+        batch = []
+
+        def flush():
+            langs = detect_many([head for _, _, head, _, _ in batch])
+            conn.executemany("INSERT INTO examples VALUES (?, ?, ?, ?, ?)",
+                             [(row_id, label, lang, length, offset)
+                              for (row_id, label, _, length, offset), lang in zip(batch, langs)])
+            batch.clear()
+
+        with open(self.csv_path, "rb") as f:
+            records = _iter_records(f)
+            try:
+                _, header_raw = next(records)
+            except StopIteration:
+                raise ValueError(f"Empty CSV: {self.csv_path}")
+            sha1.update(header_raw)
+
+            header = [h.strip().lstrip("\ufeff") for h in _parse_record(header_raw)]
+            if "text" not in header or "label" not in header:
+                raise ValueError("CSV must contain 'text' and 'label' columns.")
+            text_col = header.index("text")
+            label_col = header.index("label")
+
+            for offset, raw in records:
+                sha1.update(raw)
+                row = _parse_record(raw)
+                if len(row) <= max(text_col, label_col):
+                    continue
+                text = row[text_col]
+                label = row[label_col].strip()
+                if not text.strip() or not label:
+                    continue
+
+                batch.append((count, label, text[:DETECT_CHARS], len(text), offset))
+                count += 1
+
+                if len(batch) >= 10000:
+                    flush()
+
+        if batch:
+            flush()
+
+        conn.execute("CREATE INDEX idx_examples_lang_label ON examples (lang, label)")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", INDEX_VERSION),
+            ("csv_size", str(st.st_size)),
+            ("csv_mtime_ns", str(st.st_mtime_ns)),
+            ("csv_sha1", sha1.hexdigest()),
+            ("text_col", str(text_col)),
+            ("label_col", str(label_col)),
+        ])
+        conn.commit()
+        conn.close()
+
+        os.replace(tmp_path, self.index_path)
+        print(f"Reference index built: {count} rows in {time.time() - started:.1f}s -> {self.index_path}")
+
+    def _read_texts(self, offsets, text_col):
+        texts = []
+        with open(self.csv_path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                _, raw = next(_iter_records(f))
+                texts.append(_parse_record(raw)[text_col])
+        return texts
+
+    def csv_sha1(self):
+        """Content hash of the indexed CSV."""
+        self.ensure_fresh()
+        return self._read_meta()["csv_sha1"]
+
+    def rows(self):
+        """Return (label, lang, offset) for every indexed row, in file order."""
+        self.ensure_fresh()
+        conn = self._connect()
+        try:
+            return [tuple(row) for row in conn.execute(
+                "SELECT label, lang, offset FROM examples ORDER BY row_id"
+            )]
+        finally:
+            conn.close()
+
+    def read_texts(self, offsets):
+        """Return the text column of the rows starting at the given byte offsets."""
+        self.ensure_fresh()
+        text_col = int(self._read_meta()["text_col"])
+        return self._read_texts(offsets, text_col)
+
+    def sample(self, lang, label, n, seed=0, max_length=None):
+        """Return up to n texts of the given language and label, chosen deterministically."""
+        self.ensure_fresh()
+
+        conn = self._connect()
+        try:
+            text_col = int(conn.execute(
+                "SELECT value FROM meta WHERE key = 'text_col'"
+            ).fetchone()["value"])
+            query = "SELECT offset FROM examples WHERE lang = ? AND label = ?"
+            params = [lang, label]
+            if max_length is not None:
+                query += " AND length <= ?"
+                params.append(max_length)
+            offsets = [row["offset"] for row in conn.execute(query + " ORDER BY row_id", params)]
+        finally:
+            conn.close()
+
+        if len(offsets) > n:
+            offsets = random.Random(seed).sample(offsets, n)
+        return self._read_texts(offsets, text_col)
+
+    def counts(self):
+        """Return {(lang, label): rows} for the indexed corpus."""
+        self.ensure_fresh()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT lang, label, COUNT(*) AS n FROM examples GROUP BY lang, label"
+            ).fetchall()
+        finally:
+            conn.close()
+        return {(row["lang"], row["label"]): row["n"] for row in rows}
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_index():
+    """Shared index over the default training CSV."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = ReferenceIndex()
+        return _default_index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the reference-example index for ollama_checker.")
+    parser.add_argument("--csv", default=TRAIN_CSV, help="training CSV with 'text' and 'label' columns")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the index is up to date")
+    args = parser.parse_args()
+
+    index = ReferenceIndex(args.csv)
+    if args.force or not index.is_fresh():
+        index.build()
+    else:
+        print(f"Index is up to date: {index.index_path}")
+
+    for (lang, label), n in sorted(index.counts().items()):
+        print(f"   - {lang} / {label}: {n} rows")
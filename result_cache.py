@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+CACHE_DB = "db/result_cache.db"
+MAX_ENTRIES = int(os.environ.get("TAUTHY_CACHE_MAX_ENTRIES", 50000))
+MAX_AGE_SECONDS = float(os.environ.get("TAUTHY_CACHE_MAX_AGE_DAYS", 30)) * 86400
+MEMORY_ENTRIES = 256
+
+# Run size/age eviction once every this many writes
+EVICT_EVERY = 100
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Canonical form used for cache keys: NFC, collapsed whitespace, stripped."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def file_fingerprint(path):
+    """Cheap fingerprint of a file that changes whenever it is rewritten."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return "missing"
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+class ResultCache:
+    """Two-level cache of analysis results: in-memory LRU over SQLite.
+
+    Entries are keyed by a hash of (namespace, version, normalised text).
+    Callers put everything that should invalidate a result - model file
+    fingerprint, prompt template hash - into `version`, so stale entries are
+    simply never looked up again and age out through eviction.
+    """
+
+    def __init__(self, path=CACHE_DB, max_entries=MAX_ENTRIES, max_age=MAX_AGE_SECONDS,
+                 memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.memory_entries = memory_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(namespace, version, text):
+        data = f"{namespace}\0{version}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, namespace, version, text):
+        """Return the cached result or None."""
+        key = self.make_key(namespace, version, text)
+        now = time.time()
+
+        with self._lock:
+            if key in self._memory:
+                value, created_at = self._memory[key]
+                if now - created_at <= self.max_age:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+
+            with conn:
+                conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._remember(key, row[0], row[1])
+            self.disk_hits += 1
+            return json.loads(row[0])
+
+    def put(self, namespace, version, text, result):
+        key = self.make_key(namespace, version, text)
+        value = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, value, now)
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                    (key, namespace, value, now, now),
+                )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        with conn:
+            conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.max_age,))
+            conn.execute('''
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+
+    def evict(self):
+        """Drop expired entries and trim the store to max_entries."""
+        with self._lock:
+            self._evict(self._connect(), time.time())
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM results")
+
+    def stats(self):
+        with self._lock:
+            conn = self._connect()
+            rows = dict(conn.execute(
+                "SELECT namespace, COUNT(*) FROM results GROUP BY namespace"
+            ).fetchall())
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "stored_entries": rows,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Shared cache used by ai_checker and ollama_checker."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the analysis result cache.")
+    parser.add_argument("--clear", action="store_true", help="delete every cached result")
+    parser.add_argument("--evict", action="store_true", help="drop expired entries and trim to the size limit")
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if args.clear:
+        cache.clear()
+        print("Cache cleared.")
+    if args.evict:
+        cache.evict()
+    for namespace, count in sorted(cache.stats()["stored_entries"].items()):
+        print(f"   - {namespace}: {count} entries")
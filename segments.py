@@ -0,0 +1,157 @@
+import os
+import re
+from html import escape
+import ai_checker
+
+# Windows are packed from whole paragraphs/sentences up to this many characters
+MAX_WINDOW_CHARS = int(os.environ.get("TAUTHY_SEGMENT_CHARS", 1500))
+# At most this many windows per document are sent to Ollama, whatever its length
+LLM_MAX_SEGMENTS = int(os.environ.get("TAUTHY_LLM_MAX_SEGMENTS", 3))
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Sentence ends, plus the spaces Thai uses between sentences
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+|(?<=[\u0E00-\u0E7F])[ \t]+(?=[\u0E00-\u0E7F])")
+_SPACE = re.compile(r"\s")
+
+
+def _units(text, by):
+    """(start, end) spans of paragraphs or sentences, whitespace trimmed."""
+    pattern = _PARAGRAPH_BREAK if by == "paragraph" else _SENTENCE_BREAK
+    spans = []
+    start = 0
+    for m in pattern.finditer(text):
+        spans.append((start, m.start()))
+        start = m.end()
+    spans.append((start, len(text)))
+
+    units = []
+    for start, end in spans:
+        piece = text[start:end]
+        stripped = piece.strip()
+        if stripped:
+            start += len(piece) - len(piece.lstrip())
+            units.append((start, start + len(stripped)))
+    return units
+
+
+def _cut(text, start, end, max_chars):
+    """Split one over-long unit at whitespace (or hard, if there is none)."""
+    while end - start > max_chars:
+        cut = max((m.start() for m in _SPACE.finditer(text, start + 1, start + max_chars)), default=-1)
+        if cut <= start:
+            cut = start + max_chars
+        yield start, cut
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if start < end:
+        yield start, end
+
+
+def split_segments(text, by="paragraph", max_chars=MAX_WINDOW_CHARS):
+    """Split text into windows of whole paragraphs or sentences, each at most max_chars.
+
+    Returns (start, end) offsets into text, so callers can map scores back
+    onto the original.
+    """
+    windows = []
+    current = None
+    for u_start, u_end in _units(text, by):
+        for start, end in _cut(text, u_start, u_end, max_chars):
+            if current is not None and end - current[0] <= max_chars:
+                current = (current[0], end)
+            else:
+                if current is not None:
+                    windows.append(current)
+                current = (start, end)
+    if current is not None:
+        windows.append(current)
+    return windows
+
+
+def score_segments(text, by="paragraph", max_chars=MAX_WINDOW_CHARS):
+    """Score every window with one batched model call.
+
+    Returns a list of {"start", "end", "text", "result", "llm"} plus the
+    length-weighted document result.
+    """
+    windows = split_segments(text, by, max_chars)
+    texts = [text[start:end] for start, end in windows]
+    results = list(ai_checker.predict_texts(texts, batch_size=max(1, len(texts))))
+
+    segments = [
+        {"start": start, "end": end, "text": t, "result": r, "llm": None}
+        for (start, end), t, r in zip(windows, texts, results)
+    ]
+    return segments, document_score(segments)
+
+
+def segment_result(segment):
+    """The segment's final result: Ollama's verdict when it gave one, else the model's."""
+    llm = segment.get("llm")
+    if llm and llm["ai"] + llm["human"] > 0:
+        label = "ai" if llm["ai"] >= llm["human"] else "human"
+        return {"label": label, "confidence": max(llm["ai"], llm["human"]),
+                "details": {"ai": llm["ai"], "human": llm["human"]}}
+    return segment["result"]
+
+
+def document_score(segments):
+    return ai_checker.weighted_document_score(
+        [segment_result(s) for s in segments], [s["end"] - s["start"] for s in segments]
+    )
+
+
+def most_ambiguous(segments, limit=LLM_MAX_SEGMENTS):
+    """Indexes of the decided windows closest to 50/50, longest first on ties."""
+    decided = [i for i, s in enumerate(segments) if s["result"]["label"] != "undecided"]
+    decided.sort(key=lambda i: (abs(segments[i]["result"]["details"]["ai"] - 50.0),
+                                -(segments[i]["end"] - segments[i]["start"])))
+    return sorted(decided[:limit])
+
+
+def refine_with_ollama(segments, limit=LLM_MAX_SEGMENTS, on_token=None):
+    """Ask Ollama about the most ambiguous windows only, so LLM cost stays capped.
+
+    Stores each verdict under the segment's "llm" key and yields the
+    segment's index as it arrives. Windows the cascade would not send to
+    the LLM on their own (see cascade.py) are left with the model's score.
+    """
+    import cascade
+    from ollama_checker import query_ollama
+
+    unsure = [i for i, s in enumerate(segments) if cascade.decide(s["result"], s["text"]).run_llm]
+    for i in [unsure[j] for j in most_ambiguous([segments[i] for i in unsure], limit)]:
+        try:
+            segments[i]["llm"] = query_ollama(segments[i]["text"], on_token=on_token)
+        except ValueError as e:
+            # Language not detected for this window; keep the model's score
+            segments[i]["llm"] = {"ai": 0.0, "human": 0.0, "reason": str(e), "raw": ""}
+        yield i
+
+
+def _heat_colour(ai):
+    # 0% AI -> green, 50% -> yellow, 100% AI -> red, pastel so the text stays readable
+    ai = min(max(ai, 0.0), 100.0) / 100.0
+    red, green, blue = 255 * min(1.0, 2 * ai), 255 * min(1.0, 2 * (1 - ai)), 0
+    return "#" + "".join(f"{int(255 + (c - 255) * 0.4):02x}" for c in (red, green, blue))
+
+
+def heatmap_html(text, segments):
+    """The text with each window shaded by its AI score (grey when undecided)."""
+    html = []
+    pos = 0
+    for s in segments:
+        html.append(escape(text[pos:s["start"]]))
+        result = segment_result(s)
+        if result["label"] == "undecided":
+            colour, title = "#e0e0e0", "undecided"
+        else:
+            ai = result["details"]["ai"]
+            colour = _heat_colour(ai)
+            title = f"AI {ai:.1f}%" + (" (Ollama)" if s.get("llm") else "")
+        html.append(f'<span style="background-color: {colour}" title="{title}">'
+                    f'{escape(text[s["start"]:s["end"]])}</span>')
+        pos = s["end"]
+    html.append(escape(text[pos:]))
+    return "".join(html).replace("\n", "<br>")
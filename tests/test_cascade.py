@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+import cascade
+
+LONG_TEXT = "This sentence is long enough for the language model to judge on its own merits."
+
+
+def ml(label, confidence):
+    return {"label": label, "confidence": confidence, "details": {}}
+
+
+@pytest.fixture
+def policies(tmp_path, monkeypatch):
+    monkeypatch.setattr(cascade, "ENABLED", True)
+    path = tmp_path / "cascade.json"
+    path.write_text(json.dumps({
+        "default": {"confidence": 90, "min_chars": 40},
+        "th": {"confidence": 80},
+    }), encoding="utf-8")
+    return cascade.load_policies(str(path))
+
+
+def test_confidence_boundary(policies):
+    policy = cascade.policy_for("en", policies)
+    assert cascade.decide(ml("ai", 90.0), LONG_TEXT, policy, "en") == (False, cascade.SKIPPED_CONFIDENT, "en")
+    assert cascade.decide(ml("ai", 89.99), LONG_TEXT, policy, "en") == (True, "uncertain", "en")
+
+
+def test_per_language_policy(policies):
+    th = cascade.policy_for("th", policies)
+    # Thai overrides the confidence and inherits min_chars from "default"
+    assert th == cascade.Policy(80.0, 40)
+    assert cascade.policy_for("xx", policies) == cascade.Policy(90.0, 40)
+    assert not cascade.decide(ml("human", 85.0), LONG_TEXT, th, "th").run_llm
+    assert cascade.decide(ml("human", 85.0), LONG_TEXT, cascade.policy_for("en", policies), "en").run_llm
+
+
+def test_min_chars_applies_before_undecided(policies):
+    policy = cascade.policy_for("en", policies)
+    short = "x" * 39
+    assert cascade.decide(ml("undecided", 0.0), short, policy, "en") == (False, cascade.SKIPPED_SHORT, "en")
+    # Surrounding whitespace does not count towards the length
+    assert cascade.decide(ml("ai", 50.0), f"  {short}  ", policy, "en").reason == cascade.SKIPPED_SHORT
+    assert cascade.decide(ml("undecided", 0.0), "x" * 40, policy, "en") == (True, "undecided", "en")
+
+
+def test_disabled_always_runs(policies, monkeypatch):
+    monkeypatch.setattr(cascade, "ENABLED", False)
+    assert cascade.decide(ml("ai", 99.0), "short", cascade.policy_for("en", policies), "en").run_llm
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.naive_bayes import MultinomialNB
+
+import compact_model
+
+TRAIN = [
+    ("furthermore the results demonstrate significant improvements in overall performance", "ai"),
+    ("in conclusion it is important to note that these findings are consistent", "ai"),
+    ("additionally the proposed approach provides a comprehensive overview of the topic", "ai"),
+    ("ผลการศึกษาแสดงให้เห็นว่า วิธีการที่นำเสนอ มีประสิทธิภาพ สูงกว่า", "ai"),
+    ("we went to the beach yesterday and the water was freezing but fun", "human"),
+    ("my brother burnt the toast again so we just had coffee instead", "human"),
+    ("the bus was late so i walked home in the rain and got soaked", "human"),
+    ("เมื่อวาน ไปเที่ยว ทะเล มา อากาศ ดีมาก แต่ แดด ร้อน สุดๆ", "human"),
+]
+# Seen and unseen terms, repeats, Thai, and texts with no known term at all
+TEXTS = [text for text, _ in TRAIN] + [
+    "the results were freezing and the findings were late",
+    "furthermore furthermore furthermore the beach",
+    "ไปเที่ยว ทะเล ผลการศึกษา coffee",
+    "completely unseen vocabulary here",
+    "",
+]
+
+VECTORIZERS = {
+    "tfidf": lambda: TfidfVectorizer(),
+    "tfidf-bigrams": lambda: TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, norm="l1"),
+    "counts": lambda: CountVectorizer(),
+}
+MODELS = {
+    "logistic_regression": lambda: LogisticRegression(),
+    "sgd": lambda: SGDClassifier(loss="log_loss", random_state=0),
+    "multinomial_nb": lambda: MultinomialNB(),
+}
+
+
+@pytest.mark.parametrize("vectorizer_name", VECTORIZERS)
+@pytest.mark.parametrize("model_name", MODELS)
+def test_probabilities_match_sklearn(tmp_path, vectorizer_name, model_name):
+    vectorizer = VECTORIZERS[vectorizer_name]()
+    X = vectorizer.fit_transform([text for text, _ in TRAIN])
+    model = MODELS[model_name]().fit(X, [label for _, label in TRAIN])
+    path = str(tmp_path / "ai_model.compact")
+    compact_model.export({"vectorizer": vectorizer, "model": model}, path)
+
+    compact_vectorizer, compact_classifier = compact_model.load(path)
+    expected = model.predict_proba(vectorizer.transform(TEXTS))
+    actual = compact_classifier.predict_proba(compact_vectorizer.transform(TEXTS))
+
+    assert list(compact_classifier.classes_) == list(model.classes_)
+    # Bit-identical, not merely close
+    assert np.array_equal(actual, expected)
+
+
+def test_unsupported_models_are_refused(tmp_path):
+    vectorizer = TfidfVectorizer()
+    X = vectorizer.fit_transform([text for text, _ in TRAIN])
+    model = SGDClassifier(loss="hinge").fit(X, [label for _, label in TRAIN])
+    with pytest.raises(ValueError):
+        compact_model.export({"vectorizer": vectorizer, "model": model}, str(tmp_path / "ai_model.compact"))
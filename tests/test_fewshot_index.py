@@ -0,0 +1,66 @@
+import csv
+import os
+
+import joblib
+import pytest
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+import ai_checker
+import compact_model
+import fewshot_index
+import ref_index
+
+AI_WORDS = "furthermore the results demonstrate a significant and comprehensive improvement of the framework".split()
+HUMAN_WORDS = "i think we went to the park with my friends and it was kind of fun".split()
+
+
+def sentence(words, i):
+    return " ".join(words[(i + j) % len(words)] for j in range(12))
+
+
+@pytest.fixture
+def hashing_model(tmp_path, monkeypatch):
+    """A model as trained by `trainer.py --streaming`, with a small training CSV."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    os.makedirs("models")
+    rows = [(sentence(AI_WORDS, i), "ai") for i in range(8)] + [(sentence(HUMAN_WORDS, i), "human") for i in range(8)]
+    with open("data/train.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["text", "label"])
+        writer.writerows(rows)
+
+    vectorizer = HashingVectorizer(n_features=2 ** 12, alternate_sign=False, norm="l2")
+    model = SGDClassifier(loss="log_loss", random_state=42)
+    model.fit(vectorizer.transform([t for t, _ in rows]), [label for _, label in rows])
+    joblib.dump({"vectorizer": vectorizer, "model": model}, "models/ai_model.pkl")
+
+    monkeypatch.setattr(ref_index, "_default_index", None)
+    monkeypatch.setattr(fewshot_index, "_default_index", fewshot_index.FewShotIndex())
+    monkeypatch.setattr(fewshot_index, "_vectorizer_keys", {})
+    ai_checker.reload_model()
+    yield
+    ai_checker.reload_model()
+
+
+def test_index_with_hashing_vectorizer(hashing_model):
+    assert fewshot_index.get_fewshot_index() is None
+
+    fewshot_index.FewShotIndex().build()
+    index = fewshot_index.get_fewshot_index()
+    assert index is not None
+
+    examples = index.nearest(sentence(AI_WORDS, 3) + " extra", "en", k=2)
+    assert len(examples["ai"]) == 2 and len(examples["human"]) == 2
+    assert all(set(text.split()) <= set(AI_WORDS) for text in examples["ai"])
+
+
+def test_hashing_vectorizer_key_is_stable(hashing_model):
+    key = fewshot_index.vectorizer_key()
+    fewshot_index._vectorizer_keys.clear()
+    ai_checker.reload_model()
+    assert fewshot_index.vectorizer_key() == key
+
+    other = HashingVectorizer(n_features=2 ** 13, alternate_sign=False, norm="l2")
+    assert compact_model.vocabulary_key(other) != key
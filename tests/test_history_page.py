@@ -0,0 +1,40 @@
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.db")
+    monkeypatch.setattr(database, "DB_NAME", path)
+    database.init_db()
+    yield path
+    database.close_db_connection()
+
+
+def test_pages_return_every_entry_once(db_path):
+    hs_ids = [database.save_input("user-1", f"entry {i}", 10.0, 90.0) for i in range(23)]
+    database.save_input("user-2", "someone else's entry", 10.0, 90.0)
+    # Several entries share a timestamp; only hs_id tells them apart
+    conn = database.get_db_connection()
+    with conn:
+        for i, hs_id in enumerate(hs_ids):
+            conn.execute("UPDATE history SET hs_created_at = ? WHERE hs_id = ?",
+                         (f"2026-01-01 00:00:{i // 4:02d}", hs_id))
+
+    pages = []
+    after = None
+    while True:
+        page = database.get_history_page("user-1", after, limit=5)
+        if not page:
+            break
+        pages.append(page)
+        after = (page[-1]["hs_created_at"], page[-1]["hs_id"])
+
+    assert [len(p) for p in pages] == [5, 5, 5, 5, 3]
+    rows = [row for page in pages for row in page]
+    assert sorted(row["hs_id"] for row in rows) == sorted(hs_ids)
+    # Newest first, ties by descending hs_id
+    keys = [(row["hs_created_at"], row["hs_id"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+    assert "hs_input_text" not in rows[0]
@@ -0,0 +1,58 @@
+import sqlite3
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.db")
+    monkeypatch.setattr(database, "DB_NAME", path)
+    database.init_db()
+    yield path
+    database.close_db_connection()
+
+
+def test_saved_entries_are_searchable(db_path):
+    hs_id = database.save_input("user-1", "The quick brown fox jumps", 10.0, 90.0)
+    database.save_input("user-2", "The quick brown fox jumps", 10.0, 90.0)
+
+    assert [r["hs_id"] for r in database.search_history("user-1", "fox")] == [hs_id]
+    assert database.search_history("user-1", "elephant") == []
+
+
+def test_plain_connections_can_write_history(db_path):
+    database.save_input("user-1", "written by the app", 10.0, 90.0)
+
+    # No search_tokens function registered, like the sqlite3 shell
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute('''
+            INSERT INTO history (hs_id, user_id, hs_input_text) VALUES ('cli-1', 'user-1', 'written by a script')
+        ''')
+        conn.execute("UPDATE history SET hs_input_text = 'edited by a script' WHERE hs_id != 'cli-1'")
+        conn.execute("DELETE FROM history WHERE hs_id = 'cli-1'")
+        conn.execute('''
+            INSERT INTO history (hs_id, user_id, hs_input_text) VALUES ('cli-2', 'user-1', 'another script row')
+        ''')
+    conn.close()
+
+    assert database.search_history("user-1", "written") == []
+    assert database.reindex_history() == 2
+    assert len(database.search_history("user-1", "script")) == 2
+    assert len(database.search_history("user-1", "edited")) == 1
+    assert [r["hs_id"] for r in database.search_history("user-1", "another")] == ["cli-2"]
+    assert database.reindex_history() == 0
+
+
+def test_thai_partial_words_are_found(db_path):
+    hs_id = database.save_input("user-1", "ฉันไปเที่ยว ทะเลมา วิวสวยงาม อากาศดีมาก", 10.0, 90.0)
+    database.save_input("user-1", "วันนี้ทำงานที่บ้าน", 10.0, 90.0)
+
+    for query in ["เที่ยว", "สวย", "งาม", "อากาศดี", "เที่ยว ทะเล", "ไปเที่ยว"]:
+        assert [r["hs_id"] for r in database.search_history("user-1", query)] == [hs_id], query
+    assert database.search_history("user-1", "ภูเขา") == []
+    # Prefixes of English words match too
+    english = database.save_input("user-1", "Searching works", 10.0, 90.0)
+    assert [r["hs_id"] for r in database.search_history("user-1", "search")] == [english]
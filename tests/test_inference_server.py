@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import ai_checker
+import inference_server
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    """Replaces the model: records every batch, and blocks while `gate` is clear.
+
+    `started` is set once a batch is being scored.
+    """
+    batches = []
+    gate = threading.Event()
+    gate.set()
+    started = threading.Event()
+
+    def predict_texts(texts, batch_size=256, workers=1):
+        started.set()
+        gate.wait(10)
+        batches.append(list(texts))
+        return [{"label": "ai", "confidence": 99.0, "text": t} for t in texts]
+
+    monkeypatch.setattr(ai_checker, "predict_texts", predict_texts)
+    return batches, gate, started
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_queued_texts_are_scored_together(scored):
+    batches, _, _ = scored
+    batcher = inference_server.MicroBatcher(max_batch=4, max_wait_ms=200, use_cache=False)
+    futures = [batcher.submit(f"text {i}") for i in range(6)]
+    batcher.start()
+    try:
+        results = [f.result(timeout=5) for f in futures]
+    finally:
+        batcher.stop()
+
+    assert [r["text"] for r in results] == [f"text {i}" for i in range(6)]
+    assert [len(b) for b in batches] == [4, 2]
+
+
+def test_stop_with_a_full_queue(scored):
+    _, gate, started = scored
+    gate.clear()
+    batcher = inference_server.MicroBatcher(max_batch=1, max_queue=2, use_cache=False).start()
+    running = batcher.submit("running")
+    assert started.wait(5)
+    queued = [batcher.submit("queued 1"), batcher.submit("queued 2")]
+    with pytest.raises(inference_server.Overloaded):
+        batcher.submit("one too many")
+
+    stopper = threading.Thread(target=batcher.stop)
+    stopper.start()
+    gate.set()
+    stopper.join(5)
+
+    assert not stopper.is_alive()
+    assert running.result(timeout=1)["text"] == "running"
+    for future in queued:
+        with pytest.raises(inference_server.Overloaded):
+            future.result(timeout=1)
+
+
+def test_full_queue_answers_503_with_retry_after(scored):
+    _, gate, started = scored
+    gate.clear()
+    server = inference_server.InferenceServer(port=0, max_batch=1, max_queue=1, use_cache=False)
+    server.batcher.start()
+    threading.Thread(target=server.httpd.serve_forever, daemon=True).start()
+
+    def post(text):
+        request = urllib.request.Request(f"{server.address}/v1/predict", json.dumps({"text": text}).encode())
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.load(response)
+
+    try:
+        # One text being scored, one waiting: the queue is full
+        waiting = [threading.Thread(target=post, args=(f"text {i}",)) for i in range(2)]
+        waiting[0].start()
+        assert started.wait(5)
+        waiting[1].start()
+        wait_for(lambda: server.batcher.depth == 1)
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post("one too many")
+        assert error.value.code == 503
+        assert error.value.headers["Retry-After"] == str(inference_server.RETRY_AFTER)
+
+        gate.set()
+        for thread in waiting:
+            thread.join(5)
+        assert post("after the burst")["result"]["text"] == "after the burst"
+    finally:
+        gate.set()
+        server.httpd.shutdown()
+        server.httpd.server_close()
+        server.batcher.stop()
@@ -0,0 +1,53 @@
+import pytest
+
+import language_id
+
+THAI = "วันนี้อากาศดีมาก เราไปเที่ยวทะเลกับครอบครัว"
+ENGLISH = "The weather was lovely today, so we went to the beach with the whole family."
+# Mostly Thai with an English name in it, and the other way round
+MIXED_THAI = "เมื่อวานเราไปดูหนังเรื่อง Star Wars ที่โรงหนังใกล้บ้าน สนุกมาก"
+MIXED_ENGLISH = "We had dinner at a Thai place and ordered the ต้มยำ, which was the best part of the evening."
+
+CASES = [
+    (THAI, "th"),
+    (ENGLISH, "en"),
+    (MIXED_THAI, "th"),
+    (MIXED_ENGLISH, "en"),
+    ("", "unknown"),
+    ("12345 !!! ...", "unknown"),
+    ("ab", "unknown"),
+]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    language_id._cache.clear()
+    yield
+    language_id._cache.clear()
+
+
+@pytest.mark.parametrize("text, lang", CASES)
+def test_detect(text, lang):
+    assert language_id.detect(text) == lang
+
+
+def test_detect_many_matches_detect():
+    # Empty texts between others are the edge case of the reduceat batch path
+    texts = [text for text, _ in CASES] + ["", THAI, ""]
+    expected = [language_id.detect(t) for t in texts]
+    language_id._cache.clear()
+
+    assert language_id.detect_many(texts) == expected
+    assert language_id.identify_many(texts) == [language_id.identify(t) for t in texts]
+
+
+def test_counts_match_script_counts():
+    language_id._cache.clear()
+    for text, detection in zip([THAI, MIXED_ENGLISH, ""], language_id.identify_many([THAI, MIXED_ENGLISH, ""])):
+        assert (detection.thai, detection.latin, detection.letters) == language_id.script_counts(text)
+    assert language_id.identify(MIXED_THAI).latin == len("StarWars")
+
+
+def test_has_thai():
+    assert language_id.has_thai(MIXED_ENGLISH)
+    assert not language_id.has_thai(ENGLISH)
@@ -0,0 +1,15 @@
+import metrics
+
+
+def test_values_are_exported_apart_from_durations():
+    metrics.reset()
+    metrics.observe("server.batch", 0.25)
+    for size in (1, 4, 8):
+        metrics.record_value("server.batch_size", size)
+
+    text = metrics.prometheus_text()
+    assert 'tauthy_span_seconds_count{span="server.batch"} 1' in text
+    assert "server.batch_size" not in "".join(l for l in text.splitlines() if l.startswith("tauthy_span"))
+    assert 'tauthy_value_count{name="server.batch_size"} 3' in text
+    assert 'tauthy_value_sum{name="server.batch_size"} 13' in text
+    metrics.reset()
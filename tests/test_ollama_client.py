@@ -0,0 +1,92 @@
+import json
+import time
+
+import pytest
+
+from fake_ollama import DEFAULT_RESPONSE, FakeOllamaServer
+from ollama_client import OllamaClient, OllamaError
+
+
+def make_client(server, **kwargs):
+    kwargs.setdefault("backoff", 0.01)
+    return OllamaClient(base_url=server.url, model="test", keep_alive=None, **kwargs)
+
+
+def test_generate_returns_full_response():
+    with FakeOllamaServer() as server:
+        client = make_client(server)
+        assert client.generate("hello") == DEFAULT_RESPONSE
+        assert server.requests[0]["stream"] is False
+        assert server.requests[0]["prompt"] == "hello"
+
+
+def test_retries_after_server_errors():
+    with FakeOllamaServer(fail_first=2) as server:
+        client = make_client(server, max_retries=2)
+        assert client.generate("hello") == DEFAULT_RESPONSE
+        assert len(server.requests) == 3
+
+
+def test_backoff_doubles_between_retries():
+    with FakeOllamaServer(fail_first=2) as server:
+        client = make_client(server, max_retries=2, backoff=0.1)
+        started = time.monotonic()
+        client.generate("hello")
+        # 0.1s before the first retry, 0.2s before the second
+        assert time.monotonic() - started >= 0.3
+
+
+def test_gives_up_after_max_retries():
+    with FakeOllamaServer(fail_first=5) as server:
+        client = make_client(server, max_retries=1)
+        with pytest.raises(OllamaError, match="HTTP 503"):
+            client.generate("hello")
+        assert len(server.requests) == 2
+
+
+def test_connection_refused_raises_ollama_error():
+    server = FakeOllamaServer()
+    url = server.url
+    server.httpd.server_close()
+    client = OllamaClient(base_url=url, keep_alive=None, max_retries=1, backoff=0.01)
+    with pytest.raises(OllamaError, match="failed"):
+        client.generate("hello")
+
+
+def test_stream_generate_yields_tokens_as_they_arrive():
+    with FakeOllamaServer(token_delay=0.05) as server:
+        client = make_client(server)
+        started = time.monotonic()
+        fragments = client.stream_generate("hello")
+        first = next(fragments)
+        first_at = time.monotonic() - started
+        rest = list(fragments)
+        total = time.monotonic() - started
+
+        assert first + "".join(rest) == DEFAULT_RESPONSE
+        assert len(rest) > 1
+        # The first fragment is not held back until the whole reply is generated
+        assert first_at < total / 2
+        assert server.requests[0]["stream"] is True
+
+
+def test_stream_chat_after_retry():
+    with FakeOllamaServer(fail_first=1) as server:
+        client = make_client(server)
+        reply = "".join(client.stream_chat([{"role": "user", "content": "hello"}]))
+        assert json.loads(reply) == json.loads(DEFAULT_RESPONSE)
+        assert len(server.requests) == 2
+
+
+def test_read_timeout_between_tokens():
+    with FakeOllamaServer(token_delay=0.5) as server:
+        client = make_client(server, read_timeout=0.1, max_retries=0)
+        with pytest.raises(OllamaError, match="interrupted"):
+            list(client.stream_generate("hello"))
+
+
+def test_keep_alive_is_sent():
+    with FakeOllamaServer() as server:
+        client = OllamaClient(base_url=server.url, keep_alive="30m")
+        client.generate("hello")
+        assert server.requests[0]["keep_alive"] == "30m"
@@ -0,0 +1,93 @@
+import joblib
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+import database
+import online_update
+
+AI_TEXT = "furthermore it is important to note that the results demonstrate significant improvements"
+HUMAN_TEXT = "honestly i dunno lol it was kinda weird but we had fun at the beach yesterday"
+
+
+@pytest.fixture
+def model_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "history.db"))
+    database.init_db()
+
+    vectorizer = TfidfVectorizer()
+    model = LogisticRegression().fit(vectorizer.fit_transform([AI_TEXT, HUMAN_TEXT]), ["ai", "human"])
+    path = str(tmp_path / "ai_model.pkl")
+    joblib.dump({"vectorizer": vectorizer, "model": model}, path)
+    yield path
+    database.close_db_connection()
+
+
+def give_feedback(n):
+    hs_ids = []
+    for i in range(n):
+        hs_id = database.save_input("user", f"{HUMAN_TEXT} {i}", 50.0, 50.0)
+        database.update_feedback(hs_id, "human")
+        hs_ids.append(hs_id)
+    return hs_ids
+
+
+def test_skips_loading_the_model_below_min_rows(model_path, monkeypatch):
+    give_feedback(2)
+    assert online_update.update_model(model_path, min_rows=3) is None
+
+    # The sidecar checkpoint now answers without unpickling the model
+    monkeypatch.setattr(online_update.joblib, "load", lambda path: pytest.fail("model was loaded"))
+    assert online_update.update_model(model_path, min_rows=3) is None
+
+
+def test_updates_once_enough_feedback_exists(model_path):
+    give_feedback(2)
+    assert online_update.update_model(model_path, min_rows=3) is None
+    give_feedback(1)
+
+    update = online_update.update_model(model_path, min_rows=3)
+    assert update["version"] == 1 and update["rows"] == 3
+    assert online_update._read_checkpoint(model_path) == joblib.load(model_path)["feedback_seq"]
+    assert online_update.update_model(model_path, min_rows=1) is None
+
+
+def test_replaced_model_invalidates_the_checkpoint(model_path):
+    give_feedback(3)
+    online_update.update_model(model_path, min_rows=3)
+
+    # A retrained model starts without a checkpoint, so all feedback is new to it
+    model_data = joblib.load(model_path)
+    del model_data["feedback_seq"]
+    joblib.dump(model_data, model_path)
+    assert online_update._read_checkpoint(model_path) is None
+    assert online_update.update_model(model_path, min_rows=3)["rows"] == 3
+
+
+def test_another_process_holding_the_lock(model_path):
+    give_feedback(3)
+    with online_update._model_file_lock(model_path) as locked:
+        assert locked
+        assert online_update.update_model(model_path, min_rows=1) is None
+
+
+def test_reads_feedback_in_pages(model_path, monkeypatch):
+    # All given within the same second, so only the sequence orders them
+    give_feedback(7)
+    monkeypatch.setattr(online_update, "PAGE_ROWS", 3)
+    pages = []
+    get_feedback_since = online_update.get_feedback_since
+    monkeypatch.setattr(online_update, "get_feedback_since",
+                        lambda *a, **kw: pages.append(get_feedback_since(*a, **kw)) or pages[-1])
+
+    assert online_update.update_model(model_path, min_rows=1)["rows"] == 7
+    assert [len(p) for p in pages] == [3, 3, 1, 0]
+    assert len({r["hs_id"] for p in pages for r in p}) == 7
+
+
+def test_changed_verdict_on_an_old_entry_is_learned(model_path):
+    first, _ = give_feedback(2)
+    online_update.update_model(model_path, min_rows=1)
+
+    database.update_feedback(first, "ai")
+    assert online_update.update_model(model_path, min_rows=1)["rows"] == 1
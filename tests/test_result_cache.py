@@ -0,0 +1,31 @@
+from result_cache import ResultCache
+
+
+def test_memory_layer_honours_max_age(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("result_cache.time.time", lambda: now[0])
+    cache = ResultCache(path=str(tmp_path / "cache.db"), max_age=60)
+
+    cache.put("ml", "v1", "some text", {"label": "ai"})
+    assert cache.get("ml", "v1", "some  text") == {"label": "ai"}
+    assert cache.memory_hits == 1
+
+    now[0] += 61
+    assert cache.get("ml", "v1", "some text") is None
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_disk_hit_keeps_original_age(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("result_cache.time.time", lambda: now[0])
+    path = str(tmp_path / "cache.db")
+    ResultCache(path=path, max_age=60).put("ml", "v1", "some text", {"label": "ai"})
+
+    cache = ResultCache(path=path, max_age=60)
+    now[0] += 50
+    assert cache.get("ml", "v1", "some text") == {"label": "ai"}
+    assert cache.disk_hits == 1
+
+    # Promoted to memory at 50s old, so it still expires 10s later
+    now[0] += 11
+    assert cache.get("ml", "v1", "some text") is None
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+import segments
+
+
+def windows_text(text, windows):
+    return [text[start:end] for start, end in windows]
+
+
+@pytest.mark.parametrize("max_chars, expected", [
+    (20, [(0, 20)]),             # both paragraphs fit exactly
+    (19, [(0, 10), (12, 20)]),   # one character short: two windows
+])
+def test_paragraphs_are_packed_up_to_max_chars(max_chars, expected):
+    text = "a" * 10 + "\n\n" + "b" * 8
+    assert segments.split_segments(text, max_chars=max_chars) == expected
+
+
+def test_long_units_are_cut_at_whitespace_or_hard():
+    text = "aaaa bbbb cccc"
+    assert windows_text(text, segments.split_segments(text, max_chars=10)) == ["aaaa bbbb", "cccc"]
+    assert segments.split_segments("x" * 25, max_chars=10) == [(0, 10), (10, 20), (20, 25)]
+
+
+def test_sentences_including_thai_spaces():
+    text = "One. Two. Three."
+    assert windows_text(text, segments.split_segments(text, by="sentence", max_chars=9)) == ["One. Two.", "Three."]
+
+    thai = "วันนี้อากาศดีมาก เราไปเที่ยวทะเลกัน"
+    assert windows_text(thai, segments.split_segments(thai, by="sentence", max_chars=20)) == [
+        "วันนี้อากาศดีมาก", "เราไปเที่ยวทะเลกัน"]
+
+
+@pytest.mark.parametrize("by", ["paragraph", "sentence"])
+def test_windows_cover_the_text_within_bounds(by):
+    rng = random.Random(0)
+    words = ["word", "longerword", "ข้อความ", "ภาษาไทย", "x" * 60]
+    paragraphs = [". ".join(" ".join(rng.choices(words, k=rng.randint(1, 15))) for _ in range(rng.randint(1, 4)))
+                  for _ in range(30)]
+    text = "\n\n".join(paragraphs)
+
+    windows = segments.split_segments(text, by=by, max_chars=50)
+    assert all(0 < end - start <= 50 for start, end in windows)
+    assert all(a_end <= b_start for (_, a_end), (b_start, _) in zip(windows, windows[1:]))
+    # Only whitespace is left between windows
+    assert "".join("".join(w.split()) for w in windows_text(text, windows)) == "".join(text.split())
+
+
+def segment(start, end, ai, label=None):
+    label = label or ("ai" if ai >= 50 else "human")
+    return {"start": start, "end": end, "text": "", "llm": None,
+            "result": {"label": label, "confidence": max(ai, 100 - ai), "details": {"ai": ai, "human": 100 - ai}}}
+
+
+def test_most_ambiguous_is_capped():
+    found = [
+        segment(0, 10, 95.0),
+        segment(10, 20, 48.0),
+        segment(20, 30, 50.0, label="undecided"),
+        segment(30, 60, 55.0),
+        segment(60, 70, 55.0),
+        segment(70, 80, 5.0),
+    ]
+    # Closest to 50/50 first, the longer window on ties, returned in document order
+    assert segments.most_ambiguous(found, limit=2) == [1, 3]
+    assert segments.most_ambiguous(found, limit=3) == [1, 3, 4]
+    assert len(segments.most_ambiguous(found * 5)) == segments.LLM_MAX_SEGMENTS
+    assert segments.most_ambiguous([segment(0, 10, 50.0, label="undecided")]) == []
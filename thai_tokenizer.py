@@ -0,0 +1,147 @@
+import atexit
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# ==============================
+# CONFIG
+# ==============================
+
+# Any pythainlp word_tokenize engine ("newmm", "longest", ...) or
+# "newmm-custom" for newmm with the custom dictionary below merged in.
+ENGINE = os.environ.get("TAUTHY_TOKENIZER_ENGINE", "newmm")
+CUSTOM_DICT_PATH = os.environ.get("TAUTHY_CUSTOM_DICT", "data/custom_dict.txt")
+
+# Paragraphs longer than this are split at whitespace before tokenising
+CHUNK_CHARS = 2000
+# Only fan out to the process pool when this much text needs tokenising
+PARALLEL_MIN_CHARS = int(os.environ.get("TAUTHY_TOKENIZER_PARALLEL_MIN_CHARS", 50000))
+WORKERS = int(os.environ.get("TAUTHY_TOKENIZER_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+MEMO_ENTRIES = 4096
+
+_URL = re.compile(r"http\S+")
+_DIGITS = re.compile(r"\d+")
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+_tries = {}
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def normalize_paragraphs(text):
+    """Apply clean_text's normalisation, returning the non-empty paragraphs.
+
+    Joining the result with single spaces gives exactly what the old
+    whole-document regex passes produced.
+    """
+    from pythainlp.util import normalize
+
+    paragraphs = []
+    for para in _PARAGRAPHS.split(normalize(text.strip())):
+        para = _URL.sub("", para)
+        para = _DIGITS.sub("", para)
+        para = _NON_WORD.sub("", para)
+        para = _SPACES.sub(" ", para).lower().strip()
+        if para:
+            paragraphs.append(para)
+    return paragraphs
+
+
+def split_chunks(paragraph, max_chars=CHUNK_CHARS):
+    """Split a normalised paragraph at spaces into pieces of at most max_chars.
+
+    A run with no space at all is cut hard at max_chars; that is the only
+    case where chunking can change the tokens newmm would have produced.
+    """
+    chunks = []
+    while len(paragraph) > max_chars:
+        cut = paragraph.rfind(" ", 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        chunks.append(paragraph[:cut])
+        paragraph = paragraph[cut:].lstrip(" ")
+    if paragraph:
+        chunks.append(paragraph)
+    return chunks
+
+
+def _custom_trie():
+    if "newmm-custom" not in _tries:
+        from pythainlp.corpus.common import thai_words
+        from pythainlp.util import dict_trie
+
+        words = set(thai_words())
+        if os.path.exists(CUSTOM_DICT_PATH):
+            with open(CUSTOM_DICT_PATH, encoding="utf-8") as f:
+                words.update(line.strip() for line in f if line.strip())
+        _tries["newmm-custom"] = dict_trie(words)
+    return _tries["newmm-custom"]
+
+
+def tokenize_chunk(chunk, engine=ENGINE):
+    """Tokenise one chunk with the configured engine (no memoisation)."""
+    from pythainlp.tokenize import word_tokenize
+
+    if engine == "newmm-custom":
+        return word_tokenize(chunk, custom_dict=_custom_trie(), engine="newmm")
+    return word_tokenize(chunk, engine=engine)
+
+
+def _tokenize_many(chunks, engine):
+    return [tokenize_chunk(c, engine) for c in chunks]
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the GUI runs this from worker threads, where fork is unsafe
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def tokenize(paragraphs, engine=ENGINE, workers=None):
+    """Tokenise normalised paragraphs, returning one flat token list.
+
+    Chunks seen before come from an in-process LRU memo; large batches of
+    new chunks are spread over a process pool.
+    """
+    workers = WORKERS if workers is None else workers
+    chunks = [c for para in paragraphs for c in split_chunks(para)]
+
+    results = {}
+    with _memo_lock:
+        for c in chunks:
+            if (engine, c) in _memo:
+                _memo.move_to_end((engine, c))
+                results[c] = _memo[(engine, c)]
+    missing = list(dict.fromkeys(c for c in chunks if c not in results))
+
+    if missing:
+        # Never fan out from inside another pool's worker process
+        parallel = workers > 1 and multiprocessing.parent_process() is None
+        if parallel and len(missing) > 1 and sum(map(len, missing)) >= PARALLEL_MIN_CHARS:
+            # Send several chunks per task so IPC does not dominate
+            per_task = max(1, len(missing) // (workers * 4))
+            groups = [missing[i:i + per_task] for i in range(0, len(missing), per_task)]
+            pool = _get_pool()
+            token_lists = [t for group in pool.map(_tokenize_many, groups, [engine] * len(groups)) for t in group]
+        else:
+            token_lists = _tokenize_many(missing, engine)
+
+        with _memo_lock:
+            for c, tokens in zip(missing, token_lists):
+                results[c] = tokens
+                _memo[(engine, c)] = tokens
+            while len(_memo) > MEMO_ENTRIES:
+                _memo.popitem(last=False)
+
+    return [t for c in chunks for t in results[c]]
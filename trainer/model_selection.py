@@ -0,0 +1,199 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from trainer import clean_text as basic_clean_text, export_compact  # noqa: E402
+
+CACHE_DIR = os.path.join(ROOT_DIR, "data", "cache")
+
+# Bump when a cleaning function changes, to invalidate cached token streams
+CLEANING_VERSIONS = {
+    "basic": "1",  # trainer.clean_text: strip + lowercase
+    "full": "1",   # ai_checker.clean_text: the pipeline used at prediction time
+}
+
+VECTORIZER_GRID = {
+    "ngram_range": [(1, 1), (1, 2)],
+    "min_df": [1, 2],
+}
+SUBLINEAR_TF = [False, True]
+CLASSIFIERS = {
+    "logreg C=0.5": lambda: LogisticRegression(C=0.5, max_iter=1000),
+    "logreg C=1": lambda: LogisticRegression(C=1.0, max_iter=1000),
+    "logreg C=4": lambda: LogisticRegression(C=4.0, max_iter=1000),
+    "nb alpha=0.1": lambda: MultinomialNB(alpha=0.1),
+    "nb alpha=1": lambda: MultinomialNB(alpha=1.0),
+}
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _params_key(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def _full_clean_text(text):
+    from ai_checker import clean_text
+    return clean_text(text)
+
+
+def load_cleaned(csv_path, cleaning="basic", n_jobs=-1):
+    """Cleaned texts and labels for csv_path, from cache when the data and cleaning are unchanged."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    key = f"{file_hash(csv_path)[:16]}-{cleaning}-v{CLEANING_VERSIONS[cleaning]}"
+    parquet_path = os.path.join(CACHE_DIR, f"cleaned-{key}.parquet")
+    pickle_path = os.path.join(CACHE_DIR, f"cleaned-{key}.pkl")
+
+    if os.path.exists(parquet_path):
+        return pd.read_parquet(parquet_path), key
+    if os.path.exists(pickle_path):
+        return pd.read_pickle(pickle_path), key
+
+    started = time.time()
+    df = pd.read_csv(csv_path, usecols=["text", "label"]).dropna()
+    df = df[df["label"].isin(["ai", "human"])]
+    texts = df["text"].astype(str).tolist()
+
+    if cleaning == "full":
+        cleaned = Parallel(n_jobs=n_jobs, batch_size=256)(delayed(_full_clean_text)(t) for t in texts)
+    else:
+        cleaned = [basic_clean_text(t) for t in texts]
+    df = pd.DataFrame({"text": cleaned, "label": df["label"].to_numpy()})
+
+    try:
+        df.to_parquet(parquet_path, index=False)
+    except ImportError:
+        # No pyarrow/fastparquet installed
+        df.to_pickle(pickle_path)
+    print(f"Cleaned {len(df)} rows ({cleaning}) in {time.time() - started:.1f}s")
+    return df, key
+
+
+def fold_splits(y, folds):
+    """(train indices, test indices) of each stratified CV fold."""
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    return list(cv.split(np.zeros(len(y)), y))
+
+
+def load_fold_counts(texts, data_key, params, folds, fold, train_idx, test_idx):
+    """Term-count matrices (train, test) of one CV fold for one vectorizer setting, cached as .npz.
+
+    The vocabulary and min_df filtering come from the training rows only, so
+    the held-out fold is scored with terms the model could have known.
+    """
+    prefix = os.path.join(CACHE_DIR, f"counts-{data_key}-{_params_key(params)}-cv{folds}-{fold}")
+    train_path, test_path = prefix + "-train.npz", prefix + "-test.npz"
+    if os.path.exists(train_path) and os.path.exists(test_path):
+        return sp.load_npz(train_path), sp.load_npz(test_path)
+
+    started = time.time()
+    vectorizer = CountVectorizer(**params)
+    X_train = vectorizer.fit_transform(texts.iloc[train_idx])
+    X_test = vectorizer.transform(texts.iloc[test_idx])
+    sp.save_npz(train_path, X_train)
+    sp.save_npz(test_path, X_test)
+    print(f"Vectorised {params} fold {fold + 1}/{folds} -> {X_train.shape[1]} features "
+          f"in {time.time() - started:.1f}s")
+    return X_train, X_test
+
+
+def _evaluate(fold_counts, y, splits, vec_params, sublinear_tf, clf_name):
+    scores, fit_times, predict_times = [], [], []
+    for (X_train, X_test), (train_idx, test_idx) in zip(fold_counts, splits):
+        pipe = Pipeline([
+            ("tfidf", TfidfTransformer(sublinear_tf=sublinear_tf)),
+            ("clf", CLASSIFIERS[clf_name]()),
+        ])
+        started = time.perf_counter()
+        pipe.fit(X_train, y[train_idx])
+        fitted = time.perf_counter()
+        predicted = pipe.predict(X_test)
+        predict_times.append((time.perf_counter() - fitted) / len(test_idx))
+        fit_times.append(fitted - started)
+        scores.append(np.mean(predicted == y[test_idx]))
+    return {
+        "vectorizer": vec_params,
+        "sublinear_tf": sublinear_tf,
+        "classifier": clf_name,
+        "accuracy": float(np.mean(scores)),
+        "accuracy_std": float(np.std(scores)),
+        "fit_time_s": float(np.mean(fit_times)),
+        "predict_us_per_row": float(np.mean(predict_times) * 1e6),
+    }
+
+
+def select_model(csv_path, cleaning="basic", folds=5, n_jobs=-1, save_best=None):
+    """Cross-validate every candidate in parallel and print a leaderboard."""
+    df, data_key = load_cleaned(csv_path, cleaning, n_jobs)
+    y = df["label"].to_numpy()
+
+    splits = fold_splits(y, folds)
+
+    vec_grid = [dict(zip(VECTORIZER_GRID, values)) for values in itertools.product(*VECTORIZER_GRID.values())]
+    jobs = []
+    for vec_params in vec_grid:
+        fold_counts = [load_fold_counts(df["text"], data_key, vec_params, folds, fold, train_idx, test_idx)
+                       for fold, (train_idx, test_idx) in enumerate(splits)]
+        for sublinear_tf, clf_name in itertools.product(SUBLINEAR_TF, CLASSIFIERS):
+            jobs.append(delayed(_evaluate)(fold_counts, y, splits, vec_params, sublinear_tf, clf_name))
+
+    started = time.time()
+    results = Parallel(n_jobs=n_jobs)(jobs)
+    results.sort(key=lambda r: r["accuracy"], reverse=True)
+    print(f"Evaluated {len(results)} candidates with {folds}-fold CV in {time.time() - started:.1f}s\n")
+
+    print(f"{'#':>3} {'accuracy':>14} {'fit s':>8} {'predict us/row':>15}  candidate")
+    for i, r in enumerate(results, 1):
+        vec = r["vectorizer"]
+        candidate = (f"ngram={vec['ngram_range']} min_df={vec['min_df']} "
+                     f"sublinear_tf={r['sublinear_tf']} {r['classifier']}")
+        print(f"{i:>3} {r['accuracy'] * 100:>7.2f}±{r['accuracy_std'] * 100:<5.2f} "
+              f"{r['fit_time_s']:>8.2f} {r['predict_us_per_row']:>15.1f}  {candidate}")
+
+    if save_best:
+        best = results[0]
+        vectorizer = TfidfVectorizer(sublinear_tf=best["sublinear_tf"], **best["vectorizer"])
+        model = CLASSIFIERS[best["classifier"]]()
+        model.fit(vectorizer.fit_transform(df["text"]), y)
+        model_data = {"vectorizer": vectorizer, "model": model}
+        joblib.dump(model_data, save_best)
+        print(f"\nBest model refitted on all {len(df)} rows and saved to: {save_best}")
+        export_compact(model_data, save_best)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validated model selection with cached features.")
+    parser.add_argument("--csv", default=os.path.join(ROOT_DIR, "data", "train_cleaned.csv"))
+    parser.add_argument("--cleaning", choices=sorted(CLEANING_VERSIONS), default="basic",
+                        help="basic = trainer.clean_text, full = ai_checker.clean_text")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel jobs (default: all cores)")
+    parser.add_argument("--save-best", metavar="PATH", help="refit the winner on all data and save it here")
+    args = parser.parse_args()
+
+    select_model(args.csv, args.cleaning, args.folds, args.jobs, args.save_best)
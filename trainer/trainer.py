@@ -1,15 +1,43 @@
+import argparse
 import os
+import sys
+import time
+import numpy as np
 import pandas as pd
 import joblib
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+import compact_model  # noqa: E402
+from metrics import peak_memory_mb  # noqa: E402
+
+LABELS = np.array(['ai', 'human'])
+
 def clean_text(text):
     """Basic text cleaning: lowercase and strip."""
     return text.strip().lower()
 
+def export_compact(model_data, model_output_path):
+    """Write the memory-mappable copy ai_checker loads instead of the pickle, when the model allows."""
+    compact_path = compact_model.path_for(model_output_path)
+    started = time.time()
+    try:
+        compact_model.export(model_data, compact_path, source=model_output_path)
+    except ValueError as e:
+        # A compact file from an earlier model would only be reported as stale
+        if os.path.exists(compact_path):
+            os.remove(compact_path)
+        print(f"Compact model not written ({e}); the app will load the pickle.")
+        return None
+    size = os.path.getsize(compact_path) / (1024 * 1024)
+    print(f"Compact model saved to: {compact_path} ({size:.1f} MB in {time.time() - started:.1f}s)")
+    return compact_path
+
 def train_model(csv_path, model_output_path):
     """Train AI Text Classifier and save model."""
 
@@ -41,6 +69,7 @@ def train_model(csv_path, model_output_path):
     }
     joblib.dump(model_data, model_output_path)
     print(f"Model saved to: {model_output_path}")
+    export_compact(model_data, model_output_path)
 
     # ✅ 8. Report number of training rows
     print(f"Total training samples used: {X_train_vec.shape[0]}")
@@ -59,10 +88,107 @@ def train_model(csv_path, model_output_path):
         print(f"   - {label.upper()}: {count} samples")
 
 
-if __name__ == "__main__":
-    ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+def _iter_chunks(csv_path, chunksize, test_percent):
+    """Yield (train_df, test_df) per CSV chunk with a stable hash-based holdout."""
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, usecols=['text', 'label']):
+        chunk = chunk.dropna(subset=['text', 'label'])
+        chunk = chunk[chunk['label'].isin(LABELS)]
+        chunk = chunk.assign(text=chunk['text'].astype(str).str.strip().str.lower())
+
+        # The same text always lands on the same side, whatever the chunking
+        bucket = pd.util.hash_pandas_object(chunk['text'], index=False) % 100
+        is_test = (bucket < test_percent).to_numpy()
+        yield chunk[~is_test], chunk[is_test]
+
+def train_model_streaming(csv_path, model_output_path, chunksize=50000,
+                          n_features=2 ** 20, test_size=0.2, epochs=1):
+    """Train out-of-core: hashed features and an SGD logistic model, one CSV chunk at a time."""
+    vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm='l2')
+    model = SGDClassifier(loss='log_loss', alpha=1e-6, random_state=42)
+    test_percent = int(test_size * 100)
+
+    started = time.time()
+    train_rows = 0
+    train_label_counts = pd.Series(0, index=LABELS)
+
+    for epoch in range(epochs):
+        for train_df, _ in _iter_chunks(csv_path, chunksize, test_percent):
+            if train_df.empty:
+                continue
+            # Chunks of a sorted CSV can be all one label; shuffle within the chunk
+            train_df = train_df.sample(frac=1, random_state=epoch)
+            X = vectorizer.transform(train_df['text'])
+            model.partial_fit(X, train_df['label'], classes=LABELS)
+
+            train_rows += len(train_df)
+            if epoch == 0:
+                train_label_counts = train_label_counts.add(train_df['label'].value_counts(), fill_value=0)
+            elapsed = time.time() - started
+            print(f"Epoch {epoch + 1}/{epochs}: {train_rows} rows, {train_rows / elapsed:.0f} rows/sec")
+
+    if train_rows == 0:
+        raise ValueError("CSV must contain 'text' and 'label' rows labelled 'ai' or 'human'.")
+    train_elapsed = time.time() - started
+
+    # Second pass over the held-out rows only, so the test set never sits in memory
+    correct = 0
+    test_rows = 0
+    test_label_counts = pd.Series(0, index=LABELS)
+    for _, test_df in _iter_chunks(csv_path, chunksize, test_percent):
+        if test_df.empty:
+            continue
+        y_pred = model.predict(vectorizer.transform(test_df['text']))
+        correct += int((y_pred == test_df['label'].to_numpy()).sum())
+        test_rows += len(test_df)
+        test_label_counts = test_label_counts.add(test_df['label'].value_counts(), fill_value=0)
+
+    if test_rows:
+        print(f"Validation Accuracy: {correct / test_rows * 100:.2f}%")
 
+    model_data = {
+        'vectorizer': vectorizer,
+        'model': model
+    }
+    joblib.dump(model_data, model_output_path)
+    print(f"Model saved to: {model_output_path}")
+    export_compact(model_data, model_output_path)
+
+    print(f"Total training samples used: {train_rows // epochs} ({epochs} epochs)")
+    print(f"Training throughput: {train_rows / train_elapsed:.0f} rows/sec")
+    peak = peak_memory_mb()
+    if peak is not None:
+        print(f"Peak memory: {peak:.0f} MB")
+
+    print("Training label distribution:")
+    for label in LABELS:
+        print(f"   - {label.upper()}: {int(train_label_counts.get(label, 0))} samples")
+
+    print("Testing label distribution:")
+    for label in LABELS:
+        print(f"   - {label.upper()}: {int(test_label_counts.get(label, 0))} samples")
+
+
+if __name__ == "__main__":
     CSV_PATH = os.path.join(ROOT_DIR, "data", "train_cleaned.csv")
     MODEL_PATH = os.path.join(ROOT_DIR, "models", "ai_model.pkl")
 
-    train_model(csv_path=CSV_PATH, model_output_path=MODEL_PATH)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the AI text classifier.")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--output", default=MODEL_PATH)
+    parser.add_argument("--streaming", action="store_true",
+                        help="train out-of-core for corpora larger than RAM")
+    parser.add_argument("--chunksize", type=int, default=50000, help="rows per chunk in streaming mode")
+    parser.add_argument("--n-features", type=int, default=2 ** 20, help="hashed feature space in streaming mode")
+    parser.add_argument("--epochs", type=int, default=1, help="passes over the data in streaming mode")
+    parser.add_argument("--export-compact", action="store_true",
+                        help="only write the compact copy of the existing --output model, no training")
+    args = parser.parse_args()
+
+    if args.export_compact:
+        if export_compact(joblib.load(args.output), args.output) is None:
+            sys.exit(1)
+    elif args.streaming:
+        train_model_streaming(args.csv, args.output, chunksize=args.chunksize,
+                              n_features=args.n_features, epochs=args.epochs)
+    else:
+        train_model(csv_path=args.csv, model_output_path=args.output)
@@ -0,0 +1,77 @@
+import threading
+import traceback
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+
+class Cancelled(Exception):
+    """Raised inside a task to stop it after its worker was cancelled."""
+
+
+class WorkerSignals(QObject):
+    """Signals emitted by a Worker; delivered on the GUI thread."""
+    started = pyqtSignal()
+    progress = pyqtSignal(object)
+    result = pyqtSignal(object)
+    error = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """Run fn(*args, **kwargs) on a QThreadPool and report back through signals.
+
+    With with_worker=True the worker itself is passed as the first argument,
+    so long tasks can call report() for progress and check_cancelled()
+    between steps. Cancelling never interrupts a running call; the task stops
+    at its next check and its result is dropped.
+    """
+
+    def __init__(self, fn, *args, with_worker=False, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.with_worker = with_worker
+        self.signals = WorkerSignals()
+        self._cancel = threading.Event()
+
+    @property
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def report(self, payload):
+        self.check_cancelled()
+        self.signals.progress.emit(payload)
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            self.check_cancelled()
+            self.signals.started.emit()
+            if self.with_worker:
+                result = self.fn(self, *self.args, **self.kwargs)
+            else:
+                result = self.fn(*self.args, **self.kwargs)
+            self.check_cancelled()
+        except Cancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(e)
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+def start_worker(worker, pool=None):
+    """Queue a worker on the given pool (the global pool by default)."""
+    (pool or QThreadPool.globalInstance()).start(worker)
+    return worker